@@ -0,0 +1,124 @@
+"""
+Benchmark: recall@k and latency of HNSW settings vs. exact search.
+
+Runs against PostgreSQL. Query vectors are stored embeddings blended with
+another random review's embedding, so they don't match a stored vector
+exactly. Ground truth comes from an exact scan (index scans disabled).
+For each ``ef_search`` value the normal retrieval query is timed.
+
+``--build`` rebuilds ``idx_reviews_embedding`` with each ``m:ef_construction``
+pair before measuring. This replaces the live index, so finish with the
+setting you want to keep.
+
+Usage:
+    python -m scripts.bench_hnsw --ef-search 10 20 40 80 160
+    python -m scripts.bench_hnsw --build 16:64 32:128 --k 5 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def sample_queries(n: int, seed: float = 0.42):
+    import json
+    import numpy as np
+    from sqlalchemy import text
+    from src.database.connection import get_shared_engine
+
+    with get_shared_engine().connect() as conn:
+        conn.execute(text("SELECT setseed(:seed)"), {"seed": seed})
+        rows = conn.execute(text("""
+            SELECT CAST(embedding AS text) FROM reviews
+            WHERE embedding IS NOT NULL
+            ORDER BY random()
+            LIMIT :n
+        """), {"n": 2 * n}).scalars().all()
+
+    vectors = np.array([json.loads(v) for v in rows], dtype=np.float32)
+    n = len(vectors) // 2
+    queries = vectors[:n] + 0.3 * vectors[n:2 * n]
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_ids(queries, k: int) -> list[set]:
+    from sqlalchemy import text
+    from src.database.connection import get_shared_engine
+
+    truth = []
+    with get_shared_engine().connect() as conn:
+        for q in queries:
+            conn.execute(text("SET LOCAL enable_indexscan = off"))
+            ids = conn.execute(text("""
+                SELECT id FROM reviews
+                WHERE embedding IS NOT NULL
+                ORDER BY embedding <=> CAST(:q AS vector)
+                LIMIT :k
+            """), {"q": str(q.tolist()), "k": k}).scalars().all()
+            truth.append(set(ids))
+            conn.rollback()
+    return truth
+
+
+def measure(queries, truth: list[set], k: int, ef_search: int) -> dict:
+    import numpy as np
+    from src.database.queries import search_similar_reviews
+
+    latencies, recalls = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        rows = search_similar_reviews(q.tolist(), top_k=k, ef_search=ef_search)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & set(rows.column("id"))) / max(len(expected), 1))
+
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW recall/latency benchmark")
+    parser.add_argument("--build", nargs="*", default=[], metavar="M:EF_CONSTRUCTION",
+                        help="Rebuild the index with these settings before measuring")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160],
+                        help="hnsw.ef_search values to measure")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10], help="Recall cutoffs")
+    args = parser.parse_args()
+
+    from src.database.schema import create_vector_index
+    from src.utils.config import config
+
+    builds = [tuple(int(x) for x in b.split(":")) for b in args.build] or [None]
+    queries = sample_queries(args.queries)
+    truth = {k: exact_ids(queries, k) for k in args.k}
+    print(f"\n📏 {len(queries)} queries, exact ground truth for k = {', '.join(map(str, args.k))}\n")
+
+    for build in builds:
+        if build is None:
+            label = f"m={config.db.hnsw_m},efc={config.db.hnsw_ef_construction} (current)"
+        else:
+            m, ef_construction = build
+            start = time.perf_counter()
+            create_vector_index(m=m, ef_construction=ef_construction)
+            label = f"m={m},efc={ef_construction}"
+            print(f"   built in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'index':<32}{'ef_search':>10}{'k':>4}{'recall@k':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for ef_search in args.ef_search:
+            for k in args.k:
+                r = measure(queries, truth[k], k, ef_search)
+                print(f"{label:<32}{ef_search:>10}{k:>4}{r['recall']:>10.3f}"
+                      f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
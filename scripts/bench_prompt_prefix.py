@@ -0,0 +1,149 @@
+"""
+Benchmark: time-to-first-token on follow-up turns, stateless prompts vs. ChatSession.
+
+Runs against a stub Ollama server that models prompt caching the way
+llama.cpp does. It keeps the token sequence of the last request. Each new
+request (the ``context`` tokens followed by the prompt) only pays prefill for
+the part that differs from that sequence. Prefill and decode costs per token
+are set by flags. No model, GPU or database is needed; reviews are synthetic.
+
+Usage:
+    python -m scripts.bench_prompt_prefix
+    python -m scripts.bench_prompt_prefix --turns 8 --prefill-ms 0.8 --top-k 8
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANSWER = ("Based on the reviews, customers mostly like it. Review 1 mentions the flavor "
+          "and Review 2 notes the price. A few reviewers disagree about freshness.")
+
+
+def tokenize(text: str) -> list[int]:
+    return [zlib.crc32(t.encode()) for t in re.findall(r"\S+|\s+", text)]
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """/api/generate with longest-common-prefix KV reuse and simulated timings."""
+    cached = []
+    prefill_ms = 0.5
+    decode_ms = 20.0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        tokens = list(body.get("context") or []) + tokenize(body["prompt"])
+        with self.lock:
+            reused = 0
+            for a, b in zip(tokens, self.cached):
+                if a != b:
+                    break
+                reused += 1
+            new = len(tokens) - reused
+            time.sleep(new * self.prefill_ms / 1000)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            answer = re.findall(r"\S+\s*", ANSWER)
+            for word in answer:
+                time.sleep(self.decode_ms / 1000)
+                self.wfile.write(json.dumps({"response": word, "done": False}).encode() + b"\n")
+                self.wfile.flush()
+            context = tokens + tokenize(ANSWER)
+            StubOllama.cached = context
+            self.wfile.write(json.dumps({
+                "response": "", "done": True, "context": context,
+                "prompt_eval_count": new, "prompt_eval_duration": int(new * self.prefill_ms * 1e6),
+                "eval_count": len(answer),
+            }).encode() + b"\n")
+
+
+def synthetic_contexts(turn: int, top_k: int) -> list[dict]:
+    # Consecutive turns share part of their hits, as follow-up questions do
+    return [{
+        "id": turn * (top_k // 2) + i,
+        "summary": f"Review summary {turn}-{i}",
+        "score": 1 + (i % 5),
+        "review_text": " ".join(f"Sentence {j} of review {turn}-{i} about taste and value." for j in range(8)),
+        "helpfulness_num": i, "helpfulness_den": i + 1,
+        "product_id": f"B00{turn}{i:03d}",
+        "similarity": 0.9 - 0.01 * i,
+    } for i in range(top_k)]
+
+
+def first_token_ms(stream) -> float:
+    start = time.perf_counter()
+    ttft = None
+    for _ in stream:
+        if ttft is None:
+            ttft = (time.perf_counter() - start) * 1000
+    return ttft or 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stable-prefix / session TTFT benchmark")
+    parser.add_argument("--turns", type=int, default=6, help="Turns per conversation")
+    parser.add_argument("--top-k", type=int, default=5, help="Reviews per turn")
+    parser.add_argument("--prefill-ms", type=float, default=0.5, help="Simulated prefill cost per token")
+    parser.add_argument("--decode-ms", type=float, default=5.0, help="Simulated decode cost per token")
+    parser.add_argument("--tokenizer", type=str, default="",
+                        help="Tokenizer for prompt packing (default: character estimate)")
+    args = parser.parse_args()
+
+    os.environ["OLLAMA_TOKENIZER"] = args.tokenizer
+    from src.llm.ollama_client import OllamaClient
+    from src.llm.prompts import pack_rag_prompt
+    from src.rag.session import ChatSession
+
+    StubOllama.prefill_ms, StubOllama.decode_ms = args.prefill_ms, args.decode_ms
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OllamaClient()
+    client.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    questions = [f"Follow-up question number {t} about these snacks?" for t in range(args.turns)]
+
+    # Stateless: every turn re-packs rules + history + fresh reviews + question
+    StubOllama.cached = []
+    stateless, history = [], []
+    for t, question in enumerate(questions):
+        prompt = pack_rag_prompt(question, synthetic_contexts(t, args.top_k), history).prompt
+        stateless.append(first_token_ms(client.generate_stream(prompt)))
+        history.append([question, ANSWER])
+
+    # Session: continue Ollama's context, appending only new reviews + question
+    StubOllama.cached = []
+    session = ChatSession(SimpleNamespace(llm=client, temperature=0.3))
+    continued = []
+    for t, question in enumerate(questions):
+        result = session.ask(question, stream=True, contexts=synthetic_contexts(t, args.top_k))
+        continued.append(first_token_ms(result["stream"]))
+
+    server.shutdown()
+    print(f"\n⏱️ Time to first token (ms), {args.top_k} reviews/turn, "
+          f"{args.prefill_ms} ms/token prefill\n")
+    print(f"{'turn':>5}{'stateless':>12}{'session':>10}")
+    for t, (a, b) in enumerate(zip(stateless, continued), 1):
+        print(f"{t:>5}{a:>12.1f}{b:>10.1f}")
+    follow_a = sum(stateless[1:]) / max(len(stateless) - 1, 1)
+    follow_b = sum(continued[1:]) / max(len(continued) - 1, 1)
+    print(f"\nFollow-up mean: stateless {follow_a:.1f} ms, session {follow_b:.1f} ms "
+          f"({follow_a / max(follow_b, 1e-9):.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
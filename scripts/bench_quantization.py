@@ -0,0 +1,70 @@
+"""
+Benchmark: recall@k and latency of quantized index settings vs. exact search.
+
+Runs against the exported memory-mapped index (``--export-index``). Query
+vectors are sampled from the index itself and blended with a random neighbour,
+so they look like real queries without matching a stored vector exactly.
+
+Usage:
+    python -m scripts.bench_quantization --build int8 pq
+    python -m scripts.bench_quantization --k 5 10 --rerank 1 5 10 20
+"""
+
+import argparse
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def sample_queries(vectors, n: int, seed: int = 0):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    a = np.asarray(vectors[np.sort(rng.choice(len(vectors), n, replace=False))], dtype=np.float32)
+    b = np.asarray(vectors[np.sort(rng.choice(len(vectors), n, replace=False))], dtype=np.float32)
+    queries = a + 0.3 * b
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantization recall benchmark")
+    parser.add_argument("--path", type=str, help="Index directory (default: RAG_INDEX_PATH)")
+    parser.add_argument("--build", nargs="*", choices=["int8", "pq"], default=[],
+                        help="(Re)build these quantizers before measuring")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-spaces (must divide the dimension)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10], help="Recall cutoffs")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="Rerank factors (candidates = factor * k)")
+    args = parser.parse_args()
+
+    from src.embeddings.index import VectorIndex
+    from src.embeddings.quantization import build_quantizer, evaluate_recall
+    from src.utils.config import config
+
+    path = args.path or config.rag.index_path
+    for kind in args.build:
+        print(f"Building {kind} codes in {path}...")
+        build_quantizer(path, kind, pq_m=args.pq_m or config.rag.index_pq_m)
+
+    available = ["none"] + [k for k, f in (("int8", "sq_codes.npy"), ("pq", "pq_codes.npy"))
+                            if os.path.exists(os.path.join(path, f))]
+    base = VectorIndex(path, quantization="none")
+    queries = sample_queries(base.vectors, min(args.queries, len(base)))
+
+    print(f"\n📏 {len(base):,} vectors, {len(queries)} queries\n")
+    print(f"{'setting':<22}{'k':>4}{'recall@k':>10}{'mean ms':>10}{'p95 ms':>9}{'bytes/vec':>11}{'ratio':>8}")
+    for kind in available:
+        factors = [1] if kind == "none" else args.rerank
+        for factor in factors:
+            index = VectorIndex(path, quantization=kind, rerank_factor=factor)
+            for k in args.k:
+                r = evaluate_recall(index, queries, k=k)
+                label = kind if kind == "none" else f"{kind} (rerank {factor}x)"
+                print(f"{label:<22}{k:>4}{r['recall']:>10.3f}{r['mean_ms']:>10.2f}{r['p95_ms']:>9.2f}"
+                      f"{r['bytes_per_vector']:>11}{r['compression']:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: per-query encoding vs. micro-batched encoding under concurrent load.
+
+Each of N client threads issues queries back to back. The per-query path calls
+the model once per query (the current ``encode_query`` behaviour); the batched
+path goes through ``QueryBatcher`` with several ``max_wait_ms`` settings.
+
+Usage:
+    python -m scripts.bench_query_batching --clients 16 --queries 50
+    python -m scripts.bench_query_batching --wait-ms 1 2 5 10 --batch-size 32
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASE_QUERIES = [
+    "What do people think about organic coffee?",
+    "Which dog food products have the best reviews?",
+    "What are common complaints about chocolate products?",
+    "Are there any highly rated gluten-free snacks?",
+    "What's the best tea according to reviewers?",
+    "Do people like sugar-free candy?",
+    "What do customers say about baby food quality?",
+    "Which snack bars have the most helpful reviews?",
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_load(encode_one, clients: int, per_client: int) -> dict:
+    """Drive ``encode_one`` from ``clients`` threads and collect latencies."""
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients)
+
+    def client(cid: int):
+        barrier.wait()
+        local = []
+        for i in range(per_client):
+            # Unique text per request so no layer can dedupe the work away
+            query = f"{BASE_QUERIES[(cid + i) % len(BASE_QUERIES)]} (client {cid}, #{i})"
+            start = time.perf_counter()
+            encode_one(query)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "qps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query micro-batching benchmark")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per client")
+    parser.add_argument("--batch-size", type=int, default=16, help="Batcher max batch size")
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[1.0, 2.0, 5.0, 10.0],
+                        help="Batcher max wait settings to compare")
+    args = parser.parse_args()
+
+    from src.embeddings.batcher import QueryBatcher
+    from src.embeddings.generator import EmbeddingGenerator
+
+    generator = EmbeddingGenerator()
+    generator.load_model()
+    encode = lambda texts: generator.encode(texts, normalize=True)
+    encode(BASE_QUERIES)  # warm-up
+
+    print(f"\n⏱️ {args.clients} clients × {args.queries} queries on {generator.device}\n")
+    print(f"{'mode':<24}{'QPS':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'avg batch':>11}")
+
+    result = run_load(lambda q: encode([q])[0], args.clients, args.queries)
+    print(f"{'per-query':<24}{result['qps']:>10.1f}{result['p50_ms']:>10.1f}"
+          f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{1.0:>11.1f}")
+
+    for wait_ms in args.wait_ms:
+        batcher = QueryBatcher(encode, max_batch_size=args.batch_size, max_wait_ms=wait_ms)
+        result = run_load(batcher.encode_query, args.clients, args.queries)
+        label = f"batched (wait {wait_ms:g}ms)"
+        print(f"{label:<24}{result['qps']:>10.1f}{result['p50_ms']:>10.1f}"
+              f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+              f"{batcher.stats()['avg_batch_size']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,11 @@ Usage:
     python -m scripts.run_pipeline --serve        # Launch web UI
     python -m scripts.run_pipeline --chat         # Interactive terminal chat
     python -m scripts.run_pipeline --query "..."  # Single query
+    python -m scripts.run_pipeline --batch FILE   # Answer a file of questions to JSONL
+    python -m scripts.run_pipeline --evaluate     # Retrieval metrics + LLM-judge scores
     python -m scripts.run_pipeline --stats        # Show database stats
+    python -m scripts.run_pipeline --embed        # Backfill missing embeddings
+    python -m scripts.run_pipeline --export-index # Export embeddings for the memmap backend
 """
 
 import argparse
@@ -21,9 +25,48 @@ def main():
     parser.add_argument("--serve", action="store_true", help="Launch Gradio web UI")
     parser.add_argument("--chat", action="store_true", help="Interactive terminal chat")
     parser.add_argument("--query", type=str, help="Run a single query")
+    parser.add_argument("--batch", type=str, metavar="FILE",
+                        help="Answer every question in FILE (text lines or JSONL 'query') to JSONL")
+    parser.add_argument("--output", type=str,
+                        help="With --batch: output JSONL (default FILE.answers.jsonl); "
+                             "with --evaluate: per-question records")
+    parser.add_argument("--concurrency", type=int, help="With --batch/--evaluate: questions in flight")
+    parser.add_argument("--evaluate", nargs="?", const="", metavar="FILE",
+                        help="Run the evaluation (built-in questions, or JSONL with 'query'/'keywords')")
+    parser.add_argument("--no-judge", action="store_true", help="With --evaluate: skip LLM-judge scoring")
     parser.add_argument("--stats", action="store_true", help="Show database statistics")
+    parser.add_argument("--embed", action="store_true", help="Generate missing review embeddings")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore the backfill checkpoint and start from the first review")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Overlap read/encode/write stages during --embed")
+    parser.add_argument("--export-index", action="store_true",
+                        help="Export embeddings to a memory-mapped index (RAG_RETRIEVAL_BACKEND=memmap)")
+    parser.add_argument("--index-dtype", choices=["float32", "float16"], help="Index storage dtype")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists to build with --export-index")
+    parser.add_argument("--quantize", choices=["none", "int8", "pq"],
+                        help="Compressed codes to build with --export-index")
     parser.add_argument("--top-k", type=int, default=5, help="Number of reviews to retrieve")
     parser.add_argument("--temperature", type=float, default=0.3, help="LLM temperature")
+    parser.add_argument("--mode", choices=["semantic", "keyword", "hybrid"],
+                        help="Retrieval mode (default: RAG_RETRIEVAL_MODE)")
+    parser.add_argument("--rerank", action="store_true", default=None,
+                        help="Rerank over-fetched candidates with a cross-encoder")
+    parser.add_argument("--min-score", type=int, help="Only retrieve reviews rated at least this")
+    parser.add_argument("--max-score", type=int, help="Only retrieve reviews rated at most this")
+    parser.add_argument("--product", action="append", help="Only retrieve reviews of this product id (repeatable)")
+    parser.add_argument("--load-csv", type=str, metavar="FILE",
+                        help="Bulk-load Reviews.csv into empty tables via COPY")
+    parser.add_argument("--reset", action="store_true", help="With --load-csv: replace existing data")
+    parser.add_argument("--ingest", type=str, metavar="FILE",
+                        help="Incrementally add reviews from a Reviews.csv-style CSV or JSONL file (embeds on write)")
+    parser.add_argument("--no-embed", action="store_true", help="With --ingest: leave new rows for --embed")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Group verbatim duplicate reviews by content hash (one embedding per unique text)")
+    parser.add_argument("--create-filtered-indexes", action="store_true",
+                        help="Create partial HNSW indexes per score for filtered retrieval")
+    parser.add_argument("--create-search-index", action="store_true",
+                        help="Add the full-text column + GIN index used by keyword/hybrid retrieval")
 
     args = parser.parse_args()
 
@@ -34,17 +77,84 @@ def main():
         for table, count in stats.items():
             print(f"   {table}: {count:,}")
 
+    elif args.embed:
+        from src.embeddings.generator import get_embedding_generator
+        generator = get_embedding_generator()
+        generator.generate_all_embeddings(resume=not args.no_resume, pipelined=args.pipelined)
+
+    elif args.load_csv:
+        from src.database.loader import load_csv
+        load_csv(args.load_csv, reset=args.reset)
+
+    elif args.ingest:
+        from src.database.ingest import ingest_file
+        ingest_file(args.ingest, embed=not args.no_embed)
+
+    elif args.dedup:
+        from src.database.dedup import deduplicate_reviews
+        deduplicate_reviews()
+
+    elif args.create_filtered_indexes:
+        from src.database.schema import create_filtered_indexes
+        create_filtered_indexes()
+
+    elif args.create_search_index:
+        from src.database.schema import create_search_index
+        create_search_index()
+
+    elif args.export_index:
+        from src.embeddings.index import export_index
+        export_index(dtype=args.index_dtype, nlist=args.nlist, quantize=args.quantize)
+
     elif args.query:
+        from src.database.filters import ReviewFilter
         from src.rag.pipeline import RAGPipeline
-        pipeline = RAGPipeline(top_k=args.top_k, temperature=args.temperature)
-        result = pipeline.query(args.query, show_context=True)
+        pipeline = RAGPipeline(top_k=args.top_k, temperature=args.temperature,
+                               retrieval_mode=args.mode, rerank=args.rerank)
+        filters = ReviewFilter(min_score=args.min_score, max_score=args.max_score,
+                               product_ids=args.product)
+        result = pipeline.query(args.query, show_context=True, filters=filters)
         print(f"\n🤖 Answer:\n{result['answer']}")
         print(f"\n⏱️ Retrieval: {result['retrieval_time']:.2f}s | "
               f"Generation: {result['generation_time']:.2f}s")
+        print("   Stages: " + " | ".join(f"{stage} {seconds * 1000:.0f}ms"
+                                         for stage, seconds in result["timings"].items()))
+
+    elif args.batch:
+        from src.database.filters import ReviewFilter
+        from src.rag.batch import answer_file
+        from src.rag.pipeline import RAGPipeline
+        pipeline = RAGPipeline(top_k=args.top_k, temperature=args.temperature,
+                               retrieval_mode=args.mode, rerank=args.rerank)
+        filters = ReviewFilter(min_score=args.min_score, max_score=args.max_score,
+                               product_ids=args.product)
+        answer_file(args.batch, output=args.output, pipeline=pipeline,
+                    concurrency=args.concurrency, filters=filters)
+
+    elif args.evaluate is not None:
+        import json
+        from src.evaluation.harness import evaluate, format_report, load_cases
+        from src.rag.pipeline import RAGPipeline
+        pipeline = RAGPipeline(top_k=args.top_k, temperature=0.0, use_answer_cache=False,
+                               retrieval_mode=args.mode, rerank=args.rerank)
+        cases = load_cases(args.evaluate) if args.evaluate else None
+        report = evaluate(cases, pipeline=pipeline, run_judge=not args.no_judge,
+                          concurrency=args.concurrency)
+        summary = report["summary"]
+        print(f"\n🧪 Evaluated {summary['cases']} questions in {report['seconds']:.1f}s "
+              f"({summary['judge_cached']}/{summary['judged']} verdicts from the judge cache, "
+              f"{summary['judge_unparsed']} unparsed)\n")
+        print(format_report(summary))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                for record in report["records"]:
+                    f.write(json.dumps(record, default=str) + "\n")
+            print(f"\n💾 Per-question records written to {args.output}")
 
     elif args.chat:
         from src.rag.pipeline import RAGPipeline
-        pipeline = RAGPipeline(top_k=args.top_k, temperature=args.temperature)
+        pipeline = RAGPipeline(top_k=args.top_k, temperature=args.temperature,
+                               retrieval_mode=args.mode, rerank=args.rerank)
         pipeline.chat_interactive()
 
     elif args.serve:
@@ -15,6 +15,7 @@ import torch
 from src.rag.pipeline import RAGPipeline
 from src.database.schema import get_stats
 from src.llm.ollama_client import get_ollama_client
+from src.llm.scheduler import PRIORITY_INTERACTIVE, SchedulerBusy
 from src.utils.config import config
 
 # ── Initialize ────────────────────────────────────────────────
@@ -27,6 +28,8 @@ ollama = get_ollama_client()
 # Verify Ollama
 if ollama.is_available():
     print(f"  ✅ Ollama connected ({config.ollama.model})")
+    if config.ollama.warmup:
+        print(f"  🔥 Model loaded in {ollama.warm_up():.1f}s (keep_alive {config.ollama.keep_alive})")
 else:
     print(f"  ⚠️ Ollama not reachable — run: ollama serve")
 
@@ -45,45 +48,92 @@ def format_sources(contexts: list[dict]) -> str:
         stars = "⭐" * ctx["score"]
         sim_pct = f"{ctx['similarity'] * 100:.1f}%"
         review_preview = ctx["review_text"][:200]
+        products = ", ".join(f"`{p}`" for p in (ctx.get("product_ids") or [ctx["product_id"]]))
         sources_md += f"""### Review {i} — Match: {sim_pct}
 **{ctx['summary']}** {stars}
-- **Product:** `{ctx['product_id']}`
+- **Product:** {products}
 - **Helpfulness:** {ctx['helpfulness_num']}/{ctx['helpfulness_den']} found helpful
 
-> {review_preview}{"..." if len(ctx["review_text"]) > 200 else ""}
+> {review_preview}{"..." if ctx.get("review_chars", len(ctx["review_text"])) > 200 else ""}
 
 ---
 """
     return sources_md
 
 
-def respond(message, chat_history, top_k, temperature):
-    """Main chat response function with streaming."""
+async def respond(message, chat_history, top_k, temperature):
+    """
+    Main chat response function with streaming.
+
+    Runs on Gradio's event loop. The request takes its place in the
+    generation queue before retrieval starts, then shows its queue position
+    until Ollama has a free slot. When the user presses Stop or closes the
+    page, Gradio cancels this task, which leaves the queue or closes the
+    Ollama stream and ends the generation on the server.
+    """
     if not message.strip():
-        return "", chat_history, ""
+        yield "", chat_history, ""
+        return
 
     # Update pipeline settings
     pipeline.top_k = int(top_k)
     pipeline.temperature = temperature
 
-    # Get streaming result
-    result = pipeline.query(message, stream=True)
-    contexts = result["contexts"]
-    retrieval_time = result["retrieval_time"]
-    sources = format_sources(contexts)
-
     # Add user message
     chat_history = chat_history + [{"role": "user", "content": message}]
     chat_history = chat_history + [{"role": "assistant", "content": ""}]
 
-    # Stream response
-    gen_start = time.time()
-    for token in result["stream"]:
-        chat_history[-1]["content"] += token
-        yield "", chat_history, sources
+    scheduler = ollama.scheduler
+    ticket = None
+    try:
+        if scheduler is not None:
+            try:
+                ticket = scheduler.enqueue(PRIORITY_INTERACTIVE)
+            except SchedulerBusy as e:
+                chat_history[-1]["content"] = f"⏳ {e}"
+                yield "", chat_history, ""
+                return
+
+        # Get streaming result
+        result = await pipeline.aquery(message, stream=True, ticket=ticket)
+        contexts = result["contexts"]
+        retrieval_time = result["retrieval_time"]
+        sources = format_sources(contexts)
+
+        if ticket is not None and ("stream" not in result or result.get("cached")):
+            # Nothing to generate: give the slot to the next request
+            ticket.release()
+            ticket = None
+        if "stream" not in result:
+            chat_history[-1]["content"] = result["answer"]
+            yield "", chat_history, sources
+            return
+
+        # Wait for a generation slot
+        queue_start = time.time()
+        while ticket is not None and not await ticket.wait_async(timeout=0.5):
+            if scheduler.queue_timeout and time.time() - queue_start > scheduler.queue_timeout:
+                chat_history[-1]["content"] = (f"⏳ Waited {scheduler.queue_timeout:.0f}s in the queue; "
+                                               f"try again shortly")
+                yield "", chat_history, sources
+                return
+            chat_history[-1]["content"] = f"⏳ Queued, position {ticket.position}…"
+            yield "", chat_history, sources
+        queue_time = time.time() - queue_start
+        chat_history[-1]["content"] = ""
+
+        # Stream response
+        gen_start = time.time()
+        async for token in result["stream"]:
+            chat_history[-1]["content"] += token
+            yield "", chat_history, sources
+    finally:
+        if ticket is not None:
+            ticket.release()
 
     gen_time = time.time() - gen_start
-    timing = f"\n\n---\n*🔍 Retrieval: {retrieval_time:.2f}s | 🤖 Generation: {gen_time:.2f}s | Total: {retrieval_time + gen_time:.2f}s*"
+    queued = f"⏳ Queue: {queue_time:.2f}s | " if queue_time >= 0.5 else ""
+    timing = f"\n\n---\n*🔍 Retrieval: {retrieval_time:.2f}s | {queued}🤖 Generation: {gen_time:.2f}s | Total: {retrieval_time + queue_time + gen_time:.2f}s*"
     chat_history[-1]["content"] += timing
 
     yield "", chat_history, sources
@@ -154,6 +204,7 @@ with gr.Blocks(title="LocalLLM-RAG") as app:
                     show_label=False, scale=6, container=False,
                 )
                 send_btn = gr.Button("Send", variant="primary", scale=1)
+                stop_btn = gr.Button("Stop", variant="stop", scale=1)
                 clear_btn = gr.Button("Clear", scale=1)
 
             gr.Examples(examples=EXAMPLE_QUERIES, inputs=msg, label="💡 Try these queries")
@@ -187,8 +238,9 @@ with gr.Blocks(title="LocalLLM-RAG") as app:
                 """)
 
     # Events
-    msg.submit(respond, [msg, chatbot, top_k, temperature], [msg, chatbot, sources_display])
-    send_btn.click(respond, [msg, chatbot, top_k, temperature], [msg, chatbot, sources_display])
+    submit_event = msg.submit(respond, [msg, chatbot, top_k, temperature], [msg, chatbot, sources_display])
+    click_event = send_btn.click(respond, [msg, chatbot, top_k, temperature], [msg, chatbot, sources_display])
+    stop_btn.click(None, cancels=[submit_event, click_event])
     clear_btn.click(clear_chat, outputs=[chatbot, sources_display])
 
 
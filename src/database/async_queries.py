@@ -0,0 +1,98 @@
+"""
+Asyncio retrieval queries backed by an asyncpg connection pool.
+
+Many searches can be in flight at once without one OS thread per request.
+asyncpg prepares each statement once per connection and reuses it
+(``DB_STATEMENT_CACHE_SIZE``). Pool size and statement timeout come from
+``DatabaseConfig``.
+"""
+
+import asyncio
+import json
+import weakref
+import numpy as np
+from src.database.retrieval import ReviewColumns, columnar_sql, projection_sql
+from src.utils.config import config
+
+# asyncpg pools are bound to the event loop that created them
+_pools = weakref.WeakKeyDictionary()
+
+
+async def _init_connection(conn):
+    """Register the pgvector codec so vectors travel in binary form, and decode json."""
+    from pgvector.asyncpg import register_vector
+    await register_vector(conn)
+    await conn.set_type_codec("json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def get_async_pool():
+    """Return the asyncpg pool for the running event loop, creating it on first use."""
+    import asyncpg
+
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        db = config.db
+        server_settings = {"application_name": "localllm-rag"}
+        if db.statement_timeout_ms:
+            server_settings["statement_timeout"] = str(db.statement_timeout_ms)
+        pool = await asyncpg.create_pool(
+            user=db.user,
+            password=db.password,
+            host=db.host,
+            port=int(db.port),
+            database=db.name,
+            min_size=db.async_pool_min,
+            max_size=db.async_pool_max,
+            statement_cache_size=db.statement_cache_size,
+            server_settings=server_settings,
+            init=_init_connection,
+        )
+        _pools[loop] = pool
+    return pool
+
+
+async def close_async_pool():
+    """Close the pool belonging to the running event loop."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+async def async_search_similar_reviews(query_embedding: list, top_k: int = 5,
+                                       text_chars: int = None) -> ReviewColumns:
+    """
+    Async counterpart of ``queries.search_similar_reviews``.
+
+    Args:
+        query_embedding: List of floats (384 dimensions)
+        top_k: Number of results to return
+        text_chars: Characters of review_text to fetch (defaults to ``RAG_CONTEXT_CHARS``)
+
+    Returns:
+        ReviewColumns (a sequence of review dicts) with similarity scores
+    """
+    pool = await get_async_pool()
+    query_vec = np.asarray(query_embedding, dtype=np.float32)
+    text_chars = config.rag.context_chars if text_chars is None else text_chars
+
+    ef_search = config.db.hnsw_ef_search
+
+    async with pool.acquire() as conn, conn.transaction():
+        if ef_search:
+            await conn.execute(f"SET LOCAL hnsw.ef_search = {min(max(int(ef_search), int(top_k)), 1000)}")
+        row = await conn.fetchrow(f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT {projection_sql("r", text_chars)},
+                       1 - (r.embedding <=> $1) AS similarity
+                FROM reviews r
+                WHERE r.embedding IS NOT NULL
+                ORDER BY r.embedding <=> $1
+                LIMIT $2
+            )
+            {columnar_sql("candidates", order_by="similarity DESC")}
+        """, query_vec, top_k)
+
+    if row is None or row["id"] is None:
+        return ReviewColumns.empty()
+    return ReviewColumns(dict(row))
@@ -0,0 +1,112 @@
+"""
+Bulk write paths for embeddings.
+
+Batches of (id, vector) pairs are staged through ``COPY ... FORMAT BINARY``
+into a temporary table and applied to ``reviews`` with a single
+``UPDATE ... FROM``, so a batch costs one round trip instead of one per row.
+Vectors are sent in pgvector's binary wire format rather than as text.
+"""
+
+import io
+import struct
+import numpy as np
+from src.database.connection import get_shared_engine
+
+# PostgreSQL binary COPY framing: signature, flags, header extension length
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+
+STAGING_TABLE = "embedding_staging"
+
+
+def encode_embeddings_copy(ids, embeddings) -> bytes:
+    """
+    Encode ids and vectors as a binary COPY stream for ``(integer, vector)``.
+
+    Each tuple is laid out with a NumPy structured dtype, so the whole batch
+    is serialized in one ``tobytes()`` call. pgvector's binary vector format
+    is ``int16 dim, int16 unused, float4[dim]``, all big-endian.
+
+    Args:
+        ids: Sequence of review ids (int4)
+        embeddings: Array-like of shape (n, dim)
+
+    Returns:
+        Bytes ready to feed to ``COPY ... FROM STDIN WITH (FORMAT BINARY)``
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim != 2 or len(vectors) != len(ids):
+        raise ValueError(f"Expected {len(ids)} vectors, got array of shape {vectors.shape}")
+
+    dim = vectors.shape[1]
+    row_dtype = np.dtype([
+        ("field_count", ">i2"),
+        ("id_len", ">i4"),
+        ("id", ">i4"),
+        ("vec_len", ">i4"),
+        ("dim", ">i2"),
+        ("unused", ">i2"),
+        ("vec", ">f4", (dim,)),
+    ])
+
+    rows = np.empty(len(vectors), dtype=row_dtype)
+    rows["field_count"] = 2
+    rows["id_len"] = 4
+    rows["id"] = np.asarray(ids, dtype=np.int64)
+    rows["vec_len"] = 4 + 4 * dim
+    rows["dim"] = dim
+    rows["unused"] = 0
+    rows["vec"] = vectors
+
+    return _COPY_HEADER + rows.tobytes() + _COPY_TRAILER
+
+
+def bulk_update_embeddings(ids, embeddings, engine=None) -> int:
+    """
+    Write a batch of embeddings with one COPY and one UPDATE.
+
+    The staging table is a per-connection temp table created with
+    ``ON COMMIT DELETE ROWS``, so pooled connections reuse it across batches.
+
+    Args:
+        ids: Sequence of review ids
+        embeddings: Array-like of shape (n, dim)
+        engine: SQLAlchemy engine (defaults to the shared engine)
+
+    Returns:
+        Number of review rows updated
+    """
+    if len(ids) == 0:
+        return 0
+
+    payload = encode_embeddings_copy(ids, embeddings)
+    dim = len(embeddings[0])
+    engine = engine or get_shared_engine()
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            f"(id integer, embedding vector({dim})) ON COMMIT DELETE ROWS"
+        )
+        cur.copy_expert(
+            f"COPY {STAGING_TABLE} (id, embedding) FROM STDIN WITH (FORMAT BINARY)",
+            io.BytesIO(payload),
+        )
+        cur.execute(f"""
+            UPDATE reviews r
+            SET embedding = s.embedding
+            FROM {STAGING_TABLE} s
+            WHERE r.id = s.id
+        """)
+        updated = cur.rowcount
+        cur.close()
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    return updated
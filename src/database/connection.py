@@ -13,7 +13,16 @@ def get_engine():
     db = config.db
     password = quote_plus(db.password)
     url = f"postgresql://{db.user}:{password}@{db.host}:{db.port}/{db.name}"
-    return create_engine(url, pool_size=5, max_overflow=10)
+    connect_args = {}
+    if db.statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={db.statement_timeout_ms}"
+    return create_engine(
+        url,
+        pool_size=db.pool_size,
+        max_overflow=db.max_overflow,
+        pool_timeout=db.pool_timeout,
+        connect_args=connect_args,
+    )
 
 
 def get_session():
@@ -0,0 +1,75 @@
+"""
+Content-hash deduplication of reviews.
+
+Many reviews in the dataset are verbatim copies posted across product
+variants. Reviews that share a ``content_hash`` form one group. The lowest id
+in the group is the canonical row and the only one that holds an embedding.
+The other rows point to it through ``duplicate_of`` and keep a NULL
+embedding. As a result:
+
+- the backfill encodes each unique text once
+- the HNSW graph and the vector storage hold one entry per unique text
+- retrieval returns each text once, with every product it was posted under
+  (see ``retrieval.projection_sql``)
+"""
+
+from sqlalchemy import text
+from src.database.connection import get_shared_engine
+
+
+def mark_duplicates(conn, content_hashes: list = None) -> int:
+    """
+    Point non-canonical rows at their canonical row and drop their embeddings.
+
+    Args:
+        conn: Open SQLAlchemy connection (the caller commits)
+        content_hashes: Only regroup these hashes (default: whole table)
+
+    Returns:
+        Number of rows changed
+    """
+    scope, params = "", {}
+    if content_hashes is not None:
+        scope, params = "WHERE content_hash = ANY(CAST(:hashes AS uuid[]))", {"hashes": list(content_hashes)}
+
+    return conn.execute(text(f"""
+        UPDATE reviews r
+        SET duplicate_of = g.canonical_id,
+            embedding = CASE WHEN g.canonical_id IS NULL THEN r.embedding END
+        FROM (
+            SELECT id, NULLIF(min(id) OVER (PARTITION BY content_hash), id) AS canonical_id
+            FROM reviews
+            {scope}
+        ) g
+        WHERE r.id = g.id
+          AND (r.duplicate_of IS DISTINCT FROM g.canonical_id
+               OR (g.canonical_id IS NOT NULL AND r.embedding IS NOT NULL))
+    """), params).rowcount
+
+
+def get_dedup_stats() -> dict:
+    """Row, unique-text and duplicate counts."""
+    engine = get_shared_engine()
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT count(*), count(*) FILTER (WHERE duplicate_of IS NULL),
+                   count(*) FILTER (WHERE duplicate_of IS NOT NULL)
+            FROM reviews
+        """)).fetchone()
+    return {"reviews": row[0], "unique": row[1], "duplicates": row[2]}
+
+
+def deduplicate_reviews() -> dict:
+    """Migrate the schema if needed and group the whole table by content hash."""
+    from src.database.schema import create_dedup_columns
+    create_dedup_columns()
+
+    engine = get_shared_engine()
+    with engine.connect() as conn:
+        changed = mark_duplicates(conn)
+        conn.commit()
+
+    stats = get_dedup_stats()
+    print(f"✅ {stats['duplicates']:,} duplicate reviews grouped under {stats['unique']:,} unique texts "
+          f"({changed:,} rows updated)")
+    return stats
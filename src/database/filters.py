@@ -0,0 +1,82 @@
+"""
+Metadata filters for retrieval (score, product, time window, helpfulness).
+
+A ``ReviewFilter`` renders itself as SQL predicates that are pushed into the
+pgvector query, and as a boolean mask over the columns of the in-process
+vector index. Only the canonical copy of a duplicated review text carries
+an embedding (see ``dedup``), so the product filter matches every product
+the text was posted under, not just the canonical row's.
+"""
+
+from dataclasses import dataclass
+import numpy as np
+
+
+@dataclass
+class ReviewFilter:
+    """Restricts retrieval to reviews matching every set field."""
+    min_score: int = None
+    max_score: int = None
+    product_ids: list[str] = None
+    time_from: int = None       # Unix seconds, inclusive
+    time_to: int = None         # Unix seconds, inclusive
+    min_helpful: int = None     # Minimum helpfulness_numerator
+
+    def is_empty(self) -> bool:
+        return all(v is None for v in (self.min_score, self.max_score, self.product_ids,
+                                       self.time_from, self.time_to, self.min_helpful))
+
+    def to_sql(self, alias: str = "r") -> tuple[str, dict]:
+        """
+        Render as ``AND ...`` predicates plus bind parameters.
+
+        A single score (``min_score == max_score``) is emitted as an equality
+        so the planner can pick a partial HNSW index built for that score.
+        """
+        clauses, params = [], {}
+        if self.min_score is not None and self.min_score == self.max_score:
+            clauses.append(f"{alias}.score = :f_score")
+            params["f_score"] = self.min_score
+        else:
+            if self.min_score is not None:
+                clauses.append(f"{alias}.score >= :f_min_score")
+                params["f_min_score"] = self.min_score
+            if self.max_score is not None:
+                clauses.append(f"{alias}.score <= :f_max_score")
+                params["f_max_score"] = self.max_score
+        if self.product_ids:
+            # Any copy of the text under a wanted product qualifies the (canonical) row
+            clauses.append(f"{alias}.content_hash IN (SELECT d.content_hash FROM reviews d "
+                           f"WHERE d.product_id = ANY(:f_product_ids))")
+            params["f_product_ids"] = list(self.product_ids)
+        if self.time_from is not None:
+            clauses.append(f"{alias}.review_time >= :f_time_from")
+            params["f_time_from"] = self.time_from
+        if self.time_to is not None:
+            clauses.append(f"{alias}.review_time <= :f_time_to")
+            params["f_time_to"] = self.time_to
+        if self.min_helpful is not None:
+            clauses.append(f"{alias}.helpfulness_numerator >= :f_min_helpful")
+            params["f_min_helpful"] = self.min_helpful
+
+        return "".join(f"\n AND {c}" for c in clauses), params
+
+    def mask(self, index) -> np.ndarray:
+        """Boolean row mask over a ``VectorIndex``'s metadata columns."""
+        keep = np.ones(len(index), dtype=bool)
+        if self.min_score is not None:
+            keep &= index.score >= self.min_score
+        if self.max_score is not None:
+            keep &= index.score <= self.max_score
+        if self.product_ids:
+            wanted = [p.encode() for p in self.product_ids]
+            in_group = np.zeros(len(index), dtype=bool)
+            in_group[index.group_rows[np.isin(index.group_products, wanted)]] = True
+            keep &= np.isin(index.product_id, wanted) | in_group
+        if self.time_from is not None:
+            keep &= index.review_time >= self.time_from
+        if self.time_to is not None:
+            keep &= index.review_time <= self.time_to
+        if self.min_helpful is not None:
+            keep &= index.helpfulness_num >= self.min_helpful
+        return keep
@@ -0,0 +1,250 @@
+"""
+Incremental ingestion of new reviews with embedding-on-write.
+
+``ingest_reviews`` takes a batch of reviews and does the following:
+- skips ``original_id`` values that are already stored (re-ingestion is
+  idempotent)
+- encodes only the new rows whose text is not stored yet (content-hash
+  duplicates share their canonical row's embedding, see ``dedup``)
+- in one transaction, upserts ``users`` and ``products``, inserts the reviews
+  with their embeddings, and rolls the inserted scores into each product's
+  ``review_count`` / ``avg_score``
+
+Rows are inserted with their vectors already set, so each row costs one heap
+tuple and one HNSW insertion. Nothing is backfilled, rescanned or reindexed.
+"""
+
+import csv
+import json
+import time
+from sqlalchemy import text
+from src.database.connection import get_shared_engine
+from src.database.dedup import mark_duplicates
+from src.database.schema import CONTENT_HASH_EXPRESSION, create_ingest_index
+
+# Reviews.csv (Amazon Fine Food Reviews) header -> table column
+CSV_COLUMNS = {
+    "Id": "original_id",
+    "ProductId": "product_id",
+    "UserId": "user_id",
+    "ProfileName": "profile_name",
+    "HelpfulnessNumerator": "helpfulness_numerator",
+    "HelpfulnessDenominator": "helpfulness_denominator",
+    "Score": "score",
+    "Time": "review_time",
+    "Summary": "summary",
+    "Text": "review_text",
+}
+
+_INT_FIELDS = ("original_id", "helpfulness_numerator", "helpfulness_denominator", "score", "review_time")
+
+_schema_ready = False
+
+
+def normalize_review(row: dict) -> dict:
+    """Map a CSV-style or column-style review dict onto table columns with proper types."""
+    review = {CSV_COLUMNS.get(k, k): v for k, v in row.items()}
+    for field in _INT_FIELDS:
+        value = review.get(field)
+        review[field] = int(value) if value not in (None, "") else None
+    if review.get("profile_name") is not None:
+        review["profile_name"] = str(review["profile_name"])[:255]
+    return review
+
+
+def iter_review_file(path: str, batch_size: int = 1000):
+    """
+    Read reviews from a ``Reviews.csv``-style CSV or a JSON-lines file.
+
+    Yields:
+        Lists of normalized review dicts, ``batch_size`` at a time
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        batch = []
+        for row in rows:
+            batch.append(normalize_review(row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _ensure_schema(engine):
+    """Create the unique ``original_id`` index that makes ingestion idempotent (once per process)."""
+    global _schema_ready
+    if not _schema_ready:
+        create_ingest_index(engine)
+        _schema_ready = True
+
+
+def _column(rows: list[dict], name: str) -> list:
+    return [r.get(name) for r in rows]
+
+
+def ingest_reviews(reviews: list[dict], embed: bool = True, engine=None) -> dict:
+    """
+    Ingest a batch of reviews.
+
+    Rows missing a product id, user id or text are dropped (as in the initial
+    load), and duplicate ``original_id`` values keep their first occurrence.
+
+    Args:
+        reviews: Review dicts (table column names or Reviews.csv headers)
+        embed: Encode and store embeddings with the insert (otherwise the
+            rows are left for ``--embed``)
+        engine: SQLAlchemy engine (defaults to the shared engine)
+
+    Returns:
+        Dict with received, inserted, skipped, embedded, duplicates and seconds
+    """
+    start = time.time()
+    engine = engine or get_shared_engine()
+    _ensure_schema(engine)
+
+    rows, seen = [], set()
+    for review in map(normalize_review, reviews):
+        if not (review.get("product_id") and review.get("user_id") and review.get("review_text")):
+            continue
+        if review["original_id"] is not None:
+            if review["original_id"] in seen:
+                continue
+            seen.add(review["original_id"])
+        rows.append(review)
+
+    hashes, encode = [], []
+    with engine.connect() as conn:
+        existing = set(conn.execute(
+            text("SELECT original_id FROM reviews WHERE original_id = ANY(:ids)"),
+            {"ids": list(seen)},
+        ).scalars()) if seen else set()
+        rows = [r for r in rows if r["original_id"] not in existing]
+
+        if rows:
+            # Texts already stored (or repeated within the batch) are duplicates:
+            # they are inserted without an embedding and grouped below
+            stored = conn.execute(text(f"""
+                SELECT CAST(h.hash AS text), EXISTS (SELECT 1 FROM reviews r WHERE r.content_hash = h.hash)
+                FROM (
+                    SELECT ord, {CONTENT_HASH_EXPRESSION} AS hash
+                    FROM unnest(CAST(:summaries AS text[]), CAST(:review_texts AS text[]))
+                         WITH ORDINALITY AS u(summary, review_text, ord)
+                ) h
+                ORDER BY h.ord
+            """), {"summaries": _column(rows, "summary"), "review_texts": _column(rows, "review_text")}).fetchall()
+            first = set()
+            for i, (content_hash, is_stored) in enumerate(stored):
+                hashes.append(content_hash)
+                if not is_stored and content_hash not in first:
+                    encode.append(i)
+                first.add(content_hash)
+
+    embeddings = [None] * len(rows)
+    if embed and encode:
+        from src.embeddings.generator import get_embedding_generator
+        texts = [f"{rows[i].get('summary') or ''} {rows[i].get('review_text') or ''}" for i in encode]
+        for i, v in zip(encode, get_embedding_generator().encode(texts)):
+            embeddings[i] = str(list(map(float, v)))
+
+    inserted = 0
+    if rows:
+        with engine.connect() as conn:
+            conn.execute(text("""
+                INSERT INTO users (user_id, profile_name)
+                SELECT DISTINCT ON (user_id) user_id, profile_name
+                FROM unnest(CAST(:user_ids AS varchar[]), CAST(:profile_names AS varchar[]))
+                     AS u(user_id, profile_name)
+                ON CONFLICT (user_id) DO UPDATE SET profile_name = EXCLUDED.profile_name
+                WHERE users.profile_name IS DISTINCT FROM EXCLUDED.profile_name
+            """), {"user_ids": _column(rows, "user_id"), "profile_names": _column(rows, "profile_name")})
+
+            conn.execute(text("""
+                INSERT INTO products (product_id)
+                SELECT DISTINCT product_id FROM unnest(CAST(:product_ids AS varchar[])) AS p(product_id)
+                ON CONFLICT (product_id) DO NOTHING
+            """), {"product_ids": _column(rows, "product_id")})
+
+            # Stats roll forward from the rows actually inserted (RETURNING), so
+            # a concurrent ingest of the same original_id cannot double count
+            inserted = conn.execute(text("""
+                WITH inserted AS (
+                    INSERT INTO reviews (original_id, product_id, user_id, helpfulness_numerator,
+                                         helpfulness_denominator, score, review_time, summary,
+                                         review_text, embedding)
+                    SELECT u.original_id, u.product_id, u.user_id, u.helpfulness_numerator,
+                           u.helpfulness_denominator, u.score, u.review_time, u.summary,
+                           u.review_text, CAST(u.embedding AS vector)
+                    FROM unnest(
+                        CAST(:original_ids AS integer[]), CAST(:product_ids AS varchar[]),
+                        CAST(:user_ids AS varchar[]), CAST(:helpfulness_numerators AS integer[]),
+                        CAST(:helpfulness_denominators AS integer[]), CAST(:scores AS integer[]),
+                        CAST(:review_times AS bigint[]), CAST(:summaries AS text[]),
+                        CAST(:review_texts AS text[]), CAST(:embeddings AS text[])
+                    ) AS u(original_id, product_id, user_id, helpfulness_numerator,
+                           helpfulness_denominator, score, review_time, summary,
+                           review_text, embedding)
+                    ON CONFLICT (original_id) DO NOTHING
+                    RETURNING product_id, score
+                ),
+                added AS (
+                    SELECT product_id, count(*) AS n, avg(score) AS mean
+                    FROM inserted
+                    GROUP BY product_id
+                ),
+                rolled AS (
+                    UPDATE products p
+                    SET review_count = p.review_count + a.n,
+                        avg_score = round((p.avg_score * p.review_count + COALESCE(a.mean, 0) * a.n)
+                                          / (p.review_count + a.n), 2)
+                    FROM added a
+                    WHERE p.product_id = a.product_id
+                )
+                SELECT count(*) FROM inserted
+            """), {
+                "original_ids": _column(rows, "original_id"),
+                "product_ids": _column(rows, "product_id"),
+                "user_ids": _column(rows, "user_id"),
+                "helpfulness_numerators": _column(rows, "helpfulness_numerator"),
+                "helpfulness_denominators": _column(rows, "helpfulness_denominator"),
+                "scores": _column(rows, "score"),
+                "review_times": _column(rows, "review_time"),
+                "summaries": _column(rows, "summary"),
+                "review_texts": _column(rows, "review_text"),
+                "embeddings": embeddings,
+            }).scalar()
+            mark_duplicates(conn, sorted(set(hashes)))
+            conn.commit()
+
+    return {
+        "received": len(reviews),
+        "inserted": inserted,
+        "skipped": len(reviews) - inserted,
+        "embedded": len(encode) if embed else 0,
+        "duplicates": len(rows) - len(encode),
+        "seconds": time.time() - start,
+    }
+
+
+def ingest_file(path: str, batch_size: int = 1000, embed: bool = True) -> dict:
+    """
+    Ingest a CSV or JSON-lines file batch by batch, printing progress.
+
+    Returns:
+        Totals over all batches
+    """
+    totals = {"received": 0, "inserted": 0, "skipped": 0, "embedded": 0, "duplicates": 0}
+    start = time.time()
+    for batch in iter_review_file(path, batch_size=batch_size):
+        stats = ingest_reviews(batch, embed=embed)
+        for key in totals:
+            totals[key] += stats[key]
+        print(f"   Ingested {totals['inserted']:,} new reviews "
+              f"({totals['skipped']:,} skipped) — {time.time() - start:.1f}s")
+
+    totals["seconds"] = time.time() - start
+    print(f"✅ Ingestion complete: {totals['inserted']:,} of {totals['received']:,} reviews added")
+    return totals
@@ -0,0 +1,180 @@
+"""
+Bulk loader for ``Reviews.csv`` (Amazon Fine Food Reviews).
+
+The CSV is streamed with the ``csv`` module and sent to PostgreSQL in chunks
+through ``COPY ... FORMAT csv``, so memory stays bounded by ``chunk_size``.
+The whole load is one transaction on a single connection:
+
+1. Truncate the tables, and drop the secondary indexes and foreign keys of
+   ``reviews`` (their definitions are saved).
+2. COPY reviews directly into ``reviews`` (FREEZE, since the table was
+   truncated in this transaction). Users go into a temporary staging table.
+3. Remove duplicate (user, product, time) reviews and keep the first, as the
+   original notebook did.
+4. Derive ``users`` and ``products`` set-based, with ``review_count`` and
+   ``avg_score`` computed in one GROUP BY.
+5. Recreate the indexes and constraints.
+
+Content-hash duplicates are then grouped (``dedup``) and the tables
+analyzed. Embeddings are generated afterwards with ``--embed``, one per
+unique text.
+"""
+
+import csv
+import io
+import time
+from sqlalchemy import text
+from src.database.connection import get_shared_engine
+from src.database.dedup import mark_duplicates
+from src.database.ingest import CSV_COLUMNS
+from src.database.schema import create_dedup_columns, create_tables
+from src.utils.config import config
+
+REVIEW_COPY_COLUMNS = ("original_id", "product_id", "user_id", "helpfulness_numerator",
+                       "helpfulness_denominator", "score", "review_time", "summary", "review_text")
+
+# CSV header for each copied column (inverse of ingest.CSV_COLUMNS)
+_CSV_HEADER = {column: header for header, column in CSV_COLUMNS.items()}
+
+
+def _copy_chunk(cursor, sql: str, rows: list):
+    """Serialize ``rows`` as CSV and COPY them in (empty unquoted fields load as NULL)."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(sql, buffer)
+
+
+def _deferred_objects(cursor) -> tuple[list, list]:
+    """Definitions of the secondary indexes and foreign keys on ``reviews``."""
+    cursor.execute("""
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'reviews' AND indexname <> 'reviews_pkey'
+    """)
+    indexes = cursor.fetchall()
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'reviews'::regclass AND contype = 'f'
+    """)
+    return indexes, cursor.fetchall()
+
+
+def load_csv(path: str, chunk_size: int = 50_000, reset: bool = False) -> dict:
+    """
+    Load a Reviews.csv file into empty ``products``/``users``/``reviews`` tables.
+
+    Args:
+        path: Path to Reviews.csv
+        chunk_size: Rows per COPY chunk (bounds memory)
+        reset: Replace existing data; without it a non-empty ``reviews``
+            table is an error (use ``--ingest`` to add to a loaded database)
+
+    Returns:
+        Dict with rows_read, rows_loaded, users, products, duplicates and seconds
+    """
+    create_tables()
+    create_dedup_columns()
+    engine = get_shared_engine()
+    with engine.connect() as conn:
+        if not reset and conn.execute(text("SELECT EXISTS (SELECT 1 FROM reviews)")).scalar():
+            raise RuntimeError("reviews is not empty; pass reset=True (--reset) to reload, "
+                               "or use --ingest to add reviews incrementally")
+
+    start = time.time()
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if config.db.index_maintenance_work_mem:
+            cursor.execute("SELECT set_config('maintenance_work_mem', %s, true)",
+                           (config.db.index_maintenance_work_mem,))
+        if config.db.index_parallel_workers:
+            cursor.execute("SELECT set_config('max_parallel_maintenance_workers', %s, true)",
+                           (str(int(config.db.index_parallel_workers)),))
+
+        cursor.execute("TRUNCATE reviews, users, products RESTART IDENTITY")
+        indexes, foreign_keys = _deferred_objects(cursor)
+        for name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE reviews DROP CONSTRAINT "{name}"')
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+        print(f"⏸️  Deferred {len(indexes)} indexes and {len(foreign_keys)} foreign keys")
+
+        cursor.execute("CREATE TEMP TABLE users_staging (ord BIGINT, user_id VARCHAR(50), "
+                       "profile_name VARCHAR(255)) ON COMMIT DROP")
+        reviews_sql = (f"COPY reviews ({', '.join(REVIEW_COPY_COLUMNS)}) "
+                       f"FROM STDIN WITH (FORMAT csv, FREEZE)")
+        users_sql = "COPY users_staging (ord, user_id, profile_name) FROM STDIN WITH (FORMAT csv)"
+
+        read = loaded = 0
+        headers = [_CSV_HEADER[c] for c in REVIEW_COPY_COLUMNS]
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            review_rows, user_rows = [], []
+            for row in reader:
+                read += 1
+                if not (row["ProductId"] and row["UserId"] and row["Text"]):
+                    continue
+                review_rows.append([row[h] for h in headers])
+                user_rows.append((read, row["UserId"], (row["ProfileName"] or "")[:255]))
+                if len(review_rows) >= chunk_size:
+                    _copy_chunk(cursor, reviews_sql, review_rows)
+                    _copy_chunk(cursor, users_sql, user_rows)
+                    loaded += len(review_rows)
+                    review_rows, user_rows = [], []
+                    elapsed = time.time() - start
+                    print(f"   Copied {loaded:,} reviews ({loaded / elapsed:,.0f} rows/s)")
+            if review_rows:
+                _copy_chunk(cursor, reviews_sql, review_rows)
+                _copy_chunk(cursor, users_sql, user_rows)
+                loaded += len(review_rows)
+
+        print("🧹 Normalizing users/products...")
+        cursor.execute("""
+            DELETE FROM reviews r
+            USING (
+                SELECT id, row_number() OVER (PARTITION BY user_id, product_id, review_time ORDER BY id) AS rn
+                FROM reviews
+            ) d
+            WHERE r.id = d.id AND d.rn > 1
+        """)
+        loaded -= cursor.rowcount
+        cursor.execute("""
+            INSERT INTO users (user_id, profile_name)
+            SELECT DISTINCT ON (user_id) user_id, NULLIF(profile_name, '')
+            FROM users_staging
+            ORDER BY user_id, ord
+        """)
+        users = cursor.rowcount
+        cursor.execute("""
+            INSERT INTO products (product_id, review_count, avg_score)
+            SELECT product_id, count(*), round(avg(score), 2)
+            FROM reviews
+            GROUP BY product_id
+        """)
+        products = cursor.rowcount
+
+        print(f"🔨 Rebuilding {len(indexes)} indexes and {len(foreign_keys)} foreign keys...")
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE reviews ADD CONSTRAINT "{name}" {definition}')
+
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    with engine.connect() as conn:
+        duplicates = mark_duplicates(conn)
+        for table in ("reviews", "users", "products"):
+            conn.execute(text(f"ANALYZE {table}"))
+        conn.commit()
+    print(f"🔗 Grouped {duplicates:,} duplicate review texts")
+
+    elapsed = time.time() - start
+    print(f"✅ Loaded {loaded:,} reviews, {users:,} users, {products:,} products "
+          f"in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} rows/s)")
+    return {"rows_read": read, "rows_loaded": loaded, "users": users,
+            "products": products, "duplicates": duplicates, "seconds": elapsed}
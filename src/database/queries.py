@@ -3,44 +3,243 @@ Common database queries for the RAG pipeline.
 """
 
 from sqlalchemy import text
+from src.database.bulk import bulk_update_embeddings
 from src.database.connection import get_shared_engine
+from src.database.filters import ReviewFilter
+from src.database.retrieval import (
+    REVIEW_COLUMNS, ReviewColumns, VectorSearchQuery, columnar_sql, fetch_columns, projection_sql,
+)
+from src.utils.config import config
 
 
-def search_similar_reviews(query_embedding: list, top_k: int = 5) -> list[dict]:
+def _push_down_filters(conn, filters: ReviewFilter = None, exact: bool = False):
+    """
+    Session settings for filtered vector search (must run inside the transaction).
+
+    With a filter, HNSW iterative scans keep walking the graph until enough
+    rows pass the predicates instead of returning a short list. ``exact``
+    disables index scans so the planner falls back to an exact, filter-first
+    plan (bitmap scans on the btree indexes stay available).
+    """
+    if filters is None or filters.is_empty():
+        return
+    conn.execute(text("SET LOCAL hnsw.iterative_scan = relaxed_order"))
+    conn.execute(text(f"SET LOCAL hnsw.max_scan_tuples = {int(config.rag.filter_max_scan_tuples)}"))
+    if exact:
+        conn.execute(text("SET LOCAL enable_indexscan = off"))
+
+
+def _set_ef_search(conn, top_k: int, ef_search: int = None):
+    """
+    ``SET LOCAL hnsw.ef_search`` for this retrieval transaction.
+
+    The HNSW scan returns at most ``ef_search`` rows, so it is raised to
+    ``top_k`` when needed (pgvector caps it at 1000).
+    """
+    ef_search = config.db.hnsw_ef_search if ef_search is None else ef_search
+    if ef_search:
+        conn.execute(text(f"SET LOCAL hnsw.ef_search = {min(max(int(ef_search), int(top_k)), 1000)}"))
+
+
+def search_similar_reviews(query_embedding: list, top_k: int = 5,
+                           filters: ReviewFilter = None, text_chars: int = None,
+                           prepared: bool = None, ef_search: int = None) -> ReviewColumns:
     """
     Find the most similar reviews using pgvector cosine similarity.
 
+    Filters are pushed into the WHERE clause and the HNSW scan runs in
+    iterative mode, so selective filters still return ``top_k`` rows. If the
+    index scan gives up early, the query is retried as an exact scan.
+
     Args:
         query_embedding: List of floats (384 dimensions)
         top_k: Number of results to return
+        filters: Optional metadata filter
+        text_chars: Characters of review_text to fetch (defaults to
+            ``RAG_CONTEXT_CHARS``; 0 = full text)
+        prepared: Use the PREPAREd form (defaults to ``RAG_PREPARED_STATEMENTS``)
+        ef_search: HNSW candidate list size (defaults to ``DB_HNSW_EF_SEARCH``)
 
     Returns:
-        List of review dicts with similarity scores
+        ReviewColumns (a sequence of review dicts) with similarity scores
     """
     engine = get_shared_engine()
+    query = VectorSearchQuery(
+        text_chars=config.rag.context_chars if text_chars is None else text_chars,
+        prepared=config.rag.prepared_statements if prepared is None else prepared,
+    )
+    filtered = filters is not None and not filters.is_empty()
 
     with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT
-                r.id,
-                r.summary,
-                r.score,
-                r.review_text,
-                r.helpfulness_numerator,
-                r.helpfulness_denominator,
-                p.product_id,
-                1 - (r.embedding <=> CAST(:query_emb AS vector)) as similarity
-            FROM reviews r
-            JOIN products p ON r.product_id = p.product_id
-            WHERE r.embedding IS NOT NULL
-            ORDER BY r.embedding <=> CAST(:query_emb AS vector)
-            LIMIT :top_k
-        """), {"query_emb": str(query_embedding), "top_k": top_k})
-
-        columns = ["id", "summary", "score", "review_text", "helpfulness_num",
-                    "helpfulness_den", "product_id", "similarity"]
-
-        return [dict(zip(columns, row)) for row in result]
+        _set_ef_search(conn, top_k, ef_search)
+        _push_down_filters(conn, filters)
+        rows = query.execute(conn, query_embedding, top_k, filters)
+        if filtered and len(rows) < top_k:
+            # A cached generic plan would ignore enable_indexscan, so don't reuse it
+            _push_down_filters(conn, filters, exact=True)
+            rows = query.execute(conn, query_embedding, top_k, filters, prepared=False)
+        return rows
+
+
+def search_similar_reviews_batch(query_embeddings: list, top_k: int = 5,
+                                 filters: ReviewFilter = None, text_chars: int = None,
+                                 ef_search: int = None) -> list[ReviewColumns]:
+    """
+    ``search_similar_reviews`` for many query embeddings in one round trip.
+
+    All vectors travel as a single ``vector[]`` parameter. A ``LATERAL``
+    subquery runs the HNSW top-k scan for each one. With a filter, the
+    queries that come back short are retried together as exact scans.
+
+    Args:
+        query_embeddings: List of embeddings (lists or arrays of floats)
+        top_k: Number of results per query
+        filters: Optional metadata filter (applies to every query)
+        text_chars: Characters of review_text to fetch (defaults to ``RAG_CONTEXT_CHARS``)
+        ef_search: HNSW candidate list size (defaults to ``DB_HNSW_EF_SEARCH``)
+
+    Returns:
+        One ReviewColumns per query embedding, in input order
+    """
+    if len(query_embeddings) == 0:
+        return []
+    engine = get_shared_engine()
+    query = VectorSearchQuery(text_chars=config.rag.context_chars if text_chars is None else text_chars)
+    filtered = filters is not None and not filters.is_empty()
+
+    with engine.connect() as conn:
+        _set_ef_search(conn, top_k, ef_search)
+        _push_down_filters(conn, filters)
+        results = query.execute_batch(conn, query_embeddings, top_k, filters)
+        short = [i for i, rows in enumerate(results) if len(rows) < top_k]
+        if filtered and short:
+            _push_down_filters(conn, filters, exact=True)
+            retried = query.execute_batch(conn, [query_embeddings[i] for i in short], top_k, filters)
+            for i, rows in zip(short, retried):
+                results[i] = rows
+        return results
+
+
+# OR together the query's lexemes: natural-language questions rarely contain
+# every term of a matching review, so plainto_tsquery's AND is too strict.
+# The text is cast straight back to tsquery: its lexemes are already stemmed,
+# and running them through to_tsquery('english') again would stem them twice.
+_KEYWORD_TSQUERY = """
+    CAST(replace(CAST(plainto_tsquery('english', :query_text) AS text), ' & ', ' | ') AS tsquery)
+"""
+
+
+def search_keyword_reviews(query_text: str, top_k: int = 5,
+                           filters: ReviewFilter = None, text_chars: int = None) -> ReviewColumns:
+    """
+    Full-text search over the ``search_tsv`` column, ranked by ``ts_rank_cd``.
+
+    Args:
+        query_text: Natural language query
+        top_k: Number of results to return
+        filters: Optional metadata filter
+        text_chars: Characters of review_text to fetch (defaults to ``RAG_CONTEXT_CHARS``)
+
+    Returns:
+        ReviewColumns (``similarity`` holds the text rank)
+    """
+    engine = get_shared_engine()
+    where, params = filters.to_sql("r") if filters is not None else ("", {})
+    params.update({"query_text": query_text, "top_k": top_k})
+    text_chars = config.rag.context_chars if text_chars is None else text_chars
+
+    with engine.connect() as conn:
+        return fetch_columns(conn, f"""
+            WITH hits AS (
+                SELECT {projection_sql("r", text_chars)},
+                       ts_rank_cd(r.search_tsv, q.tsq) AS similarity
+                FROM reviews r, (SELECT {_KEYWORD_TSQUERY} AS tsq) q
+                WHERE r.search_tsv @@ q.tsq AND r.duplicate_of IS NULL{where}
+                ORDER BY similarity DESC
+                LIMIT :top_k
+            )
+            {columnar_sql("hits", order_by="similarity DESC")}
+        """, params)
+
+
+def search_hybrid_reviews(query_text: str, query_embedding: list, top_k: int = 5,
+                          candidates: int = 50, rrf_k: int = 60,
+                          filters: ReviewFilter = None, text_chars: int = None,
+                          ef_search: int = None) -> ReviewColumns:
+    """
+    Hybrid retrieval: pgvector and full-text candidates fused with
+    reciprocal-rank fusion, in a single statement (one round trip).
+
+    Each candidate list contributes ``1 / (rrf_k + rank)`` per review; reviews
+    found by both lists rise to the top.
+
+    Args:
+        query_text: Natural language query (for the keyword side)
+        query_embedding: List of floats (for the vector side)
+        top_k: Number of fused results to return
+        candidates: Candidates fetched from each side before fusion
+        rrf_k: RRF damping constant
+        filters: Optional metadata filter, applied to both candidate lists
+        text_chars: Characters of review_text to fetch (defaults to ``RAG_CONTEXT_CHARS``)
+        ef_search: HNSW candidate list size (defaults to ``DB_HNSW_EF_SEARCH``)
+
+    Returns:
+        ReviewColumns with cosine ``similarity`` and ``rrf_score``
+    """
+    engine = get_shared_engine()
+    where, params = filters.to_sql("r") if filters is not None else ("", {})
+    params.update({
+        "query_text": query_text,
+        "query_emb": str(query_embedding),
+        "top_k": top_k,
+        "candidates": candidates,
+        "rrf_k": rrf_k,
+    })
+    text_chars = config.rag.context_chars if text_chars is None else text_chars
+
+    with engine.connect() as conn:
+        _set_ef_search(conn, candidates, ef_search)
+        _push_down_filters(conn, filters)
+        return fetch_columns(conn, f"""
+            WITH vector_hits AS (
+                SELECT id, distance, row_number() OVER (ORDER BY distance) AS rank
+                FROM (
+                    SELECT r.id, r.embedding <=> CAST(:query_emb AS vector) AS distance
+                    FROM reviews r
+                    WHERE r.embedding IS NOT NULL{where}
+                    ORDER BY distance
+                    LIMIT :candidates
+                ) v
+            ),
+            keyword_hits AS (
+                SELECT id, row_number() OVER (ORDER BY text_rank DESC) AS rank
+                FROM (
+                    SELECT r.id, ts_rank_cd(r.search_tsv, q.tsq) AS text_rank
+                    FROM reviews r, (SELECT {_KEYWORD_TSQUERY} AS tsq) q
+                    WHERE r.search_tsv @@ q.tsq AND r.duplicate_of IS NULL{where}
+                    ORDER BY text_rank DESC
+                    LIMIT :candidates
+                ) k
+            ),
+            fused AS (
+                SELECT COALESCE(v.id, k.id) AS id, v.distance,
+                       COALESCE(1.0 / (:rrf_k + v.rank), 0)
+                       + COALESCE(1.0 / (:rrf_k + k.rank), 0) AS rrf_score
+                FROM vector_hits v
+                FULL OUTER JOIN keyword_hits k ON v.id = k.id
+                ORDER BY rrf_score DESC, id
+                LIMIT :top_k
+            ),
+            hits AS (
+                SELECT {projection_sql("r", text_chars)},
+                       COALESCE(1 - COALESCE(f.distance, r.embedding <=> CAST(:query_emb AS vector)), 0)
+                           AS similarity,
+                       f.rrf_score
+                FROM fused f
+                JOIN reviews r ON r.id = f.id
+            )
+            {columnar_sql("hits", order_by="rrf_score DESC", columns=REVIEW_COLUMNS + ("rrf_score",))}
+        """, params)
 
 
 def get_review_count() -> int:
@@ -59,26 +258,90 @@ def get_embedded_count() -> int:
         ).scalar()
 
 
+def get_reviews_fingerprint() -> tuple:
+    """
+    Cheap change marker for the reviews table.
+
+    Uses the cumulative insert/update/delete counters from
+    ``pg_stat_user_tables`` instead of scanning the table.
+    """
+    engine = get_shared_engine()
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT n_tup_ins, n_tup_upd, n_tup_del
+            FROM pg_stat_user_tables
+            WHERE relname = 'reviews'
+        """)).fetchone()
+        return tuple(row) if row else ()
+
+
 def get_reviews_without_embeddings(batch_size: int = 1000) -> list[tuple]:
-    """Fetch reviews that need embeddings generated."""
+    """Fetch reviews that need embeddings generated (canonical rows only; see ``dedup``)."""
     engine = get_shared_engine()
     with engine.connect() as conn:
         result = conn.execute(text("""
             SELECT id, COALESCE(summary, '') || ' ' || COALESCE(review_text, '') as combined_text
             FROM reviews
-            WHERE embedding IS NULL
+            WHERE embedding IS NULL AND duplicate_of IS NULL
             ORDER BY id
             LIMIT :batch_size
         """), {"batch_size": batch_size})
         return result.fetchall()
 
 
-def update_embedding(review_id: int, embedding: list):
-    """Update a single review's embedding."""
+def iter_reviews_without_embeddings(chunk_size: int = 1000, after_id: int = 0):
+    """
+    Stream reviews that need embeddings through a server-side cursor.
+
+    Rows are read in id order and yielded in chunks, so memory is bounded by
+    ``chunk_size`` rather than by the number of unembedded reviews.
+    Content-hash duplicates are skipped; they share their canonical row's
+    embedding.
+
+    Args:
+        chunk_size: Rows fetched from the cursor per chunk
+        after_id: Only return reviews with ``id > after_id`` (resume point)
+
+    Yields:
+        Lists of (id, combined_text) tuples
+    """
     engine = get_shared_engine()
     with engine.connect() as conn:
-        conn.execute(
-            text("UPDATE reviews SET embedding = :emb WHERE id = :id"),
-            {"emb": str(embedding), "id": review_id}
-        )
-        conn.commit()
+        result = conn.execution_options(yield_per=chunk_size).execute(text("""
+            SELECT id, COALESCE(summary, '') || ' ' || COALESCE(review_text, '') as combined_text
+            FROM reviews
+            WHERE embedding IS NULL AND duplicate_of IS NULL AND id > :after_id
+            ORDER BY id
+        """), {"after_id": after_id})
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+
+
+def count_reviews_without_embeddings(after_id: int = 0) -> int:
+    """Count reviews that still need embeddings after a given id."""
+    engine = get_shared_engine()
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT COUNT(*) FROM reviews "
+                 "WHERE embedding IS NULL AND duplicate_of IS NULL AND id > :after_id"),
+            {"after_id": after_id},
+        ).scalar()
+
+
+def update_embedding(review_id: int, embedding: list):
+    """Update a single review's embedding."""
+    update_embeddings([review_id], [embedding])
+
+
+def update_embeddings(review_ids: list[int], embeddings) -> int:
+    """
+    Update a batch of review embeddings in one round trip.
+
+    Args:
+        review_ids: Review ids to update
+        embeddings: Vectors aligned with ``review_ids``
+
+    Returns:
+        Number of rows updated
+    """
+    return bulk_update_embeddings(review_ids, embeddings)
@@ -0,0 +1,207 @@
+"""
+Retrieval query builder with lean projections and columnar results.
+
+The hot vector query reads only ``reviews``, with no join to ``products``
+(``reviews.product_id`` already holds the id). ``review_text`` can be cut
+server-side with ``left()``, so only the characters the prompt uses cross the
+wire. The candidate set comes back as one row of arrays (``array_agg``),
+wrapped in ``ReviewColumns``. That type stores columns but reads like a list
+of review dicts, so existing consumers keep working. Only canonical rows
+carry embeddings (see ``dedup``), so each hit is a unique text, and
+``product_ids`` lists every product that text was posted under. The
+statement can also run in a ``PREPARE``/``EXECUTE`` form, prepared once per
+pooled connection. A batch form sends many query vectors as one ``vector[]``
+and runs the top-k scan for each in a ``LATERAL`` subquery, so a batch of
+queries costs one round trip.
+"""
+
+import hashlib
+import re
+from collections.abc import Sequence
+from sqlalchemy import text
+
+# Column names of the dicts yielded by ReviewColumns (kept compatible with
+# the historical per-row dicts of search_similar_reviews)
+REVIEW_COLUMNS = ("id", "summary", "score", "review_text", "helpfulness_num",
+                  "helpfulness_den", "product_id", "product_ids", "review_chars", "similarity")
+
+# Columns derived when the (already limited) hit set is aggregated. Every
+# product the review text was posted under, across content-hash duplicates.
+_DERIVED_COLUMNS = {
+    "product_ids": "to_json(ARRAY(SELECT DISTINCT d.product_id FROM reviews d "
+                   "WHERE d.content_hash = {source}.content_hash))",
+}
+
+_BIND = re.compile(r"(?<!:):(\w+)")
+
+
+class ReviewColumns(Sequence):
+    """Columnar retrieval result that also behaves as a list of review dicts."""
+
+    def __init__(self, columns: dict):
+        self.columns = {name: list(columns.get(name) or []) for name in columns}
+        self._len = len(next(iter(self.columns.values()), []))
+
+    @classmethod
+    def empty(cls, names=REVIEW_COLUMNS):
+        return cls({name: [] for name in names})
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        return {name: values[i] for name, values in self.columns.items()}
+
+    def column(self, name: str) -> list:
+        """All values of one column, in rank order."""
+        return self.columns[name]
+
+    def to_dicts(self) -> list[dict]:
+        return [self[i] for i in range(self._len)]
+
+    def __repr__(self) -> str:
+        return f"ReviewColumns({self._len} rows, columns={list(self.columns)})"
+
+
+def projection_sql(alias: str = "r", text_chars: int = None) -> str:
+    """SELECT list for review rows; ``text_chars`` truncates review_text server-side."""
+    review_text = f"{alias}.review_text"
+    if text_chars:
+        review_text = f"left({alias}.review_text, {int(text_chars)})"
+    return f"""
+        {alias}.id,
+        {alias}.summary,
+        {alias}.score,
+        {review_text} AS review_text,
+        {alias}.helpfulness_numerator AS helpfulness_num,
+        {alias}.helpfulness_denominator AS helpfulness_den,
+        {alias}.product_id,
+        {alias}.content_hash,
+        length({alias}.review_text) AS review_chars"""
+
+
+def columnar_sql(source: str, order_by: str, columns=REVIEW_COLUMNS, group_by: str = None) -> str:
+    """
+    Aggregate every row of ``source`` into one row of arrays, ordered by ``order_by``.
+
+    ``id`` is appended as a tiebreaker. Each array is a separate aggregate, and
+    only a total order guarantees that tied rows line up across all of them.
+    With ``group_by``, one row of arrays per group (the group column comes
+    first, and rows are sorted by it).
+    """
+    order_by = f"{order_by}, {source}.id"
+    aggregates = ",\n               ".join(
+        f"array_agg({_DERIVED_COLUMNS.get(name, name).format(source=source)} ORDER BY {order_by}) AS {name}"
+        for name in columns
+    )
+    if group_by is None:
+        return f"""
+        SELECT {aggregates}
+        FROM {source}
+    """
+    return f"""
+        SELECT {group_by}, {aggregates}
+        FROM {source}
+        GROUP BY {group_by}
+        ORDER BY {group_by}
+    """
+
+
+def vector_array_literal(embeddings) -> str:
+    """Render embeddings as a ``vector[]`` literal: one bind parameter for the whole batch."""
+    return "{" + ",".join(f'"{[float(x) for x in emb]}"' for emb in embeddings) + "}"
+
+
+def fetch_columns(conn, sql: str, params: dict) -> ReviewColumns:
+    """Run a columnar statement and wrap its single row."""
+    row = conn.execute(text(sql), params).mappings().first()
+    if row is None or row["id"] is None:
+        return ReviewColumns.empty()
+    return ReviewColumns(dict(row))
+
+
+class VectorSearchQuery:
+    """Builds and runs the pgvector top-k statement."""
+
+    def __init__(self, text_chars: int = None, prepared: bool = False):
+        """
+        Args:
+            text_chars: Truncate review_text to this many characters (None = full)
+            prepared: Run via PREPARE/EXECUTE, preparing once per connection
+        """
+        self.text_chars = text_chars
+        self.prepared = prepared
+
+    def sql(self, where: str = "") -> str:
+        # MATERIALIZED: iterative (relaxed_order) scans may return rows slightly
+        # out of order, so the final order is imposed on the materialized set
+        return f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT {projection_sql("r", self.text_chars)},
+                       1 - (r.embedding <=> CAST(:query_emb AS vector)) AS similarity
+                FROM reviews r
+                WHERE r.embedding IS NOT NULL{where}
+                ORDER BY r.embedding <=> CAST(:query_emb AS vector)
+                LIMIT :top_k
+            )
+            {columnar_sql("candidates", order_by="similarity DESC")}
+        """
+
+    def batch_sql(self, where: str = "") -> str:
+        # One HNSW top-k scan per query vector, driven by the unnested array
+        return f"""
+            WITH hits AS MATERIALIZED (
+                SELECT q.query_ord, c.*
+                FROM unnest(CAST(:query_embs AS vector[])) WITH ORDINALITY AS q(emb, query_ord)
+                CROSS JOIN LATERAL (
+                    SELECT {projection_sql("r", self.text_chars)},
+                           1 - (r.embedding <=> q.emb) AS similarity
+                    FROM reviews r
+                    WHERE r.embedding IS NOT NULL{where}
+                    ORDER BY r.embedding <=> q.emb
+                    LIMIT :top_k
+                ) c
+            )
+            {columnar_sql("hits", order_by="similarity DESC", group_by="query_ord")}
+        """
+
+    def execute_batch(self, conn, query_embeddings: list, top_k: int, filters=None) -> list[ReviewColumns]:
+        """Top-k for every embedding in one statement; one ReviewColumns per embedding, in order."""
+        where, params = filters.to_sql("r") if filters is not None else ("", {})
+        params.update({"query_embs": vector_array_literal(query_embeddings), "top_k": top_k})
+
+        results = [ReviewColumns.empty() for _ in query_embeddings]
+        for row in conn.execute(text(self.batch_sql(where)), params).mappings():
+            columns = dict(row)
+            results[columns.pop("query_ord") - 1] = ReviewColumns(columns)
+        return results
+
+    def execute(self, conn, query_embedding: list, top_k: int, filters=None,
+                prepared: bool = None) -> ReviewColumns:
+        where, params = filters.to_sql("r") if filters is not None else ("", {})
+        params.update({"query_emb": str(query_embedding), "top_k": top_k})
+        sql = self.sql(where)
+
+        use_prepared = self.prepared if prepared is None else prepared
+        if not use_prepared:
+            return fetch_columns(conn, sql, params)
+        return fetch_columns(conn, *self._prepare(conn, sql, params))
+
+    @staticmethod
+    def _prepare(conn, sql: str, params: dict) -> tuple[str, dict]:
+        """PREPARE ``sql`` on this connection once; return the EXECUTE form."""
+        names = list(dict.fromkeys(_BIND.findall(sql)))
+        positional = _BIND.sub(lambda m: f"${names.index(m.group(1)) + 1}", sql)
+        name = "rag_" + hashlib.sha1(positional.encode()).hexdigest()[:16]
+
+        prepared = conn.info.setdefault("prepared_statements", set())
+        if name not in prepared:
+            conn.execute(text(f"PREPARE {name} AS {positional}"))
+            prepared.add(name)
+        return f"EXECUTE {name}({', '.join(':' + n for n in names)})", params
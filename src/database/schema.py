@@ -3,23 +3,49 @@ Database schema definitions for the LocalLLM-RAG project.
 Creates and manages PostgreSQL tables with pgvector support.
 """
 
+from contextlib import contextmanager
 from sqlalchemy import text
 from src.database.connection import get_shared_engine
+from src.utils.config import config
 
+# Full-text document for hybrid search: product id (exact tokens) ranks above
+# the summary, which ranks above the review body.
+SEARCH_TSV_EXPRESSION = """
+    setweight(to_tsvector('simple', COALESCE(product_id, '')), 'A') ||
+    setweight(to_tsvector('english', COALESCE(summary, '')), 'B') ||
+    setweight(to_tsvector('english', COALESCE(review_text, '')), 'C')
+"""
+
+# Identity of a review's text for deduplication: md5 of the lower-cased,
+# whitespace-collapsed "summary review_text", stored as a 16-byte uuid.
+CONTENT_HASH_EXPRESSION = """
+    CAST(md5(lower(btrim(regexp_replace(
+        COALESCE(summary, '') || ' ' || COALESCE(review_text, ''), '\\s+', ' ', 'g'
+    )))) AS uuid)
+"""
+
+
+def create_tables(drop_existing: bool = False):
+    """
+    Create all database tables with pgvector extension.
 
-def create_tables():
-    """Create all database tables with pgvector extension."""
+    Args:
+        drop_existing: Drop and recreate the tables (destroys all data);
+            otherwise missing tables and indexes are created and existing
+            ones are left alone
+    """
     engine = get_shared_engine()
 
     with engine.connect() as conn:
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
 
-        conn.execute(text("DROP TABLE IF EXISTS reviews CASCADE;"))
-        conn.execute(text("DROP TABLE IF EXISTS products CASCADE;"))
-        conn.execute(text("DROP TABLE IF EXISTS users CASCADE;"))
+        if drop_existing:
+            conn.execute(text("DROP TABLE IF EXISTS reviews CASCADE;"))
+            conn.execute(text("DROP TABLE IF EXISTS products CASCADE;"))
+            conn.execute(text("DROP TABLE IF EXISTS users CASCADE;"))
 
         conn.execute(text("""
-            CREATE TABLE products (
+            CREATE TABLE IF NOT EXISTS products (
                 product_id VARCHAR(20) PRIMARY KEY,
                 review_count INTEGER DEFAULT 0,
                 avg_score NUMERIC(3,2) DEFAULT 0
@@ -27,14 +53,14 @@ def create_tables():
         """))
 
         conn.execute(text("""
-            CREATE TABLE users (
+            CREATE TABLE IF NOT EXISTS users (
                 user_id VARCHAR(50) PRIMARY KEY,
                 profile_name VARCHAR(255)
             );
         """))
 
-        conn.execute(text("""
-            CREATE TABLE reviews (
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS reviews (
                 id SERIAL PRIMARY KEY,
                 original_id INTEGER,
                 product_id VARCHAR(20) REFERENCES products(product_id),
@@ -45,34 +71,184 @@ def create_tables():
                 review_time BIGINT,
                 summary TEXT,
                 review_text TEXT,
-                embedding vector(384)
+                embedding vector(384),
+                search_tsv tsvector GENERATED ALWAYS AS ({SEARCH_TSV_EXPRESSION}) STORED,
+                content_hash uuid GENERATED ALWAYS AS ({CONTENT_HASH_EXPRESSION}) STORED,
+                duplicate_of INTEGER
             );
         """))
 
         conn.execute(text("CREATE INDEX IF NOT EXISTS idx_reviews_product ON reviews(product_id);"))
         conn.execute(text("CREATE INDEX IF NOT EXISTS idx_reviews_user ON reviews(user_id);"))
         conn.execute(text("CREATE INDEX IF NOT EXISTS idx_reviews_score ON reviews(score);"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_reviews_search_tsv ON reviews USING gin (search_tsv);"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_reviews_content_hash ON reviews(content_hash);"))
 
         conn.commit()
 
+    create_ingest_index(engine)
     print("✅ Database schema created successfully!")
 
 
-def create_vector_index():
-    """Create HNSW index for fast vector similarity search."""
+def create_ingest_index(engine=None):
+    """
+    Unique index on ``reviews.original_id`` (idempotent ingestion). Safe to
+    run more than once.
+    """
+    engine = engine or get_shared_engine()
+
+    with engine.connect() as conn:
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_original_id ON reviews(original_id);"))
+        conn.commit()
+
+
+@contextmanager
+def _index_build_session(concurrently: bool):
+    """
+    Connection tuned for index builds.
+
+    ``maintenance_work_mem`` and ``max_parallel_maintenance_workers`` come from
+    ``DatabaseConfig``. The pool's ``DB_STATEMENT_TIMEOUT_MS`` is lifted, since
+    an HNSW build runs for minutes. ``CREATE INDEX CONCURRENTLY`` cannot run in
+    a transaction, so concurrent builds use an autocommit connection and reset
+    the settings before it goes back to the pool.
+    """
+    db = config.db
+    settings = {"statement_timeout": "0"}
+    if db.index_maintenance_work_mem:
+        settings["maintenance_work_mem"] = db.index_maintenance_work_mem
+    if db.index_parallel_workers:
+        settings["max_parallel_maintenance_workers"] = str(int(db.index_parallel_workers))
+
+    engine = get_shared_engine()
+    with engine.connect() as conn:
+        if concurrently:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        for name, value in settings.items():
+            conn.execute(text("SELECT set_config(:name, :value, :is_local)"),
+                         {"name": name, "value": value, "is_local": not concurrently})
+        try:
+            yield conn
+            if not concurrently:
+                conn.commit()
+        finally:
+            if concurrently:
+                for name in settings:
+                    conn.execute(text(f"RESET {name}"))
+
+
+def create_vector_index(m: int = None, ef_construction: int = None, concurrently: bool = None):
+    """
+    Create HNSW index for fast vector similarity search.
+
+    With ``concurrently``, the new index is built next to the old one without
+    blocking writes, then swapped in under the usual name in one transaction
+    (a brief exclusive lock on ``reviews``).
+
+    Args:
+        m: Graph degree (defaults to ``DB_HNSW_M``)
+        ef_construction: Build-time candidate list (defaults to ``DB_HNSW_EF_CONSTRUCTION``)
+        concurrently: Use CREATE INDEX CONCURRENTLY (defaults to ``DB_INDEX_CONCURRENTLY``)
+    """
+    db = config.db
+    m = int(m or db.hnsw_m)
+    ef_construction = int(ef_construction or db.hnsw_ef_construction)
+    concurrently = db.index_concurrently if concurrently is None else concurrently
+    options = f"WITH (m = {m}, ef_construction = {ef_construction})"
+
+    with _index_build_session(concurrently) as conn:
+        if concurrently:
+            conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_reviews_embedding_new;"))
+            conn.execute(text(f"""
+                CREATE INDEX CONCURRENTLY idx_reviews_embedding_new
+                ON reviews
+                USING hnsw (embedding vector_cosine_ops)
+                {options};
+            """))
+            # Swap in one short transaction: queries never run without an HNSW index,
+            # and a crash leaves either the old index or the new one under the usual name
+            conn.execute(text("""
+                BEGIN;
+                DROP INDEX IF EXISTS idx_reviews_embedding;
+                ALTER INDEX idx_reviews_embedding_new RENAME TO idx_reviews_embedding;
+                COMMIT;
+            """))
+        else:
+            conn.execute(text("DROP INDEX IF EXISTS idx_reviews_embedding;"))
+            conn.execute(text(f"""
+                CREATE INDEX idx_reviews_embedding
+                ON reviews
+                USING hnsw (embedding vector_cosine_ops)
+                {options};
+            """))
+
+    print(f"✅ HNSW vector index created! (m={m}, ef_construction={ef_construction})")
+
+
+def create_filtered_indexes(scores: tuple = (1, 2, 3, 4, 5), concurrently: bool = None):
+    """
+    Create partial HNSW indexes for single-score filters.
+
+    A query filtered to one rating (``ReviewFilter(min_score=s, max_score=s)``)
+    renders ``score = s``, which the planner matches to the partial index, so
+    the graph only contains qualifying rows and no results are filtered away.
+    """
+    db = config.db
+    concurrently = db.index_concurrently if concurrently is None else concurrently
+    create = "CREATE INDEX CONCURRENTLY" if concurrently else "CREATE INDEX"
+
+    with _index_build_session(concurrently) as conn:
+        for score in scores:
+            conn.execute(text(f"""
+                {create} IF NOT EXISTS idx_reviews_embedding_score_{int(score)}
+                ON reviews
+                USING hnsw (embedding vector_cosine_ops)
+                WITH (m = {int(db.hnsw_m)}, ef_construction = {int(db.hnsw_ef_construction)})
+                WHERE score = {int(score)};
+            """))
+        conn.execute(text(f"{create} IF NOT EXISTS idx_reviews_time ON reviews(review_time);"))
+
+    print(f"✅ Partial HNSW indexes created for scores {', '.join(map(str, scores))}!")
+
+
+def create_search_index():
+    """
+    Add the full-text ``search_tsv`` column and its GIN index to an existing
+    reviews table (used by hybrid retrieval). Safe to run more than once.
+    """
     engine = get_shared_engine()
 
     with engine.connect() as conn:
-        conn.execute(text("DROP INDEX IF EXISTS idx_reviews_embedding;"))
-        conn.execute(text("""
-            CREATE INDEX idx_reviews_embedding
-            ON reviews
-            USING hnsw (embedding vector_cosine_ops)
-            WITH (m = 16, ef_construction = 64);
+        conn.execute(text(f"""
+            ALTER TABLE reviews
+            ADD COLUMN IF NOT EXISTS search_tsv tsvector
+            GENERATED ALWAYS AS ({SEARCH_TSV_EXPRESSION}) STORED;
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_reviews_search_tsv ON reviews USING gin (search_tsv);"))
+        conn.commit()
+
+    print("✅ Full-text search column and GIN index created!")
+
+
+def create_dedup_columns():
+    """
+    Add the generated ``content_hash`` column, ``duplicate_of`` and the hash
+    index to an existing reviews table (used by deduplication). Safe to run
+    more than once.
+    """
+    engine = get_shared_engine()
+
+    with engine.connect() as conn:
+        conn.execute(text(f"""
+            ALTER TABLE reviews
+            ADD COLUMN IF NOT EXISTS content_hash uuid
+            GENERATED ALWAYS AS ({CONTENT_HASH_EXPRESSION}) STORED;
         """))
+        conn.execute(text("ALTER TABLE reviews ADD COLUMN IF NOT EXISTS duplicate_of INTEGER;"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_reviews_content_hash ON reviews(content_hash);"))
         conn.commit()
 
-    print("✅ HNSW vector index created!")
+    print("✅ Content-hash column and index created!")
 
 
 def get_stats() -> dict:
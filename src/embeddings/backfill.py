@@ -0,0 +1,274 @@
+"""
+Pipelined embedding backfill.
+
+Reader, encoder and writer stages run in their own threads and are connected
+by bounded queues, so the model encodes the next chunk while earlier chunks
+are still being written. Writers draw connections from the shared SQLAlchemy
+pool; the database driver and the model both release the GIL while they work.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from src.database.bulk import bulk_update_embeddings
+from src.database.connection import get_shared_engine
+from src.database.queries import count_reviews_without_embeddings, iter_reviews_without_embeddings
+from src.embeddings.generator import BackfillCheckpoint
+from src.utils.config import config
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+    name: str
+    workers: int = 1
+    rows: int = 0
+    chunks: int = 0
+    busy_seconds: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, rows: int, seconds: float):
+        with self.lock:
+            self.rows += rows
+            self.chunks += 1
+            self.busy_seconds += seconds
+
+    def rate(self, elapsed: float) -> float:
+        """Rows per wall-clock second."""
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def utilization(self, elapsed: float) -> float:
+        """Fraction of wall time the stage's workers spent doing work."""
+        return self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0
+
+
+@dataclass
+class QueueStats:
+    """Sampled occupancy of a bounded queue."""
+    name: str
+    maxsize: int
+    samples: int = 0
+    total: int = 0
+
+    def sample(self, q: queue.Queue):
+        self.samples += 1
+        self.total += q.qsize()
+
+    @property
+    def avg_occupancy(self) -> float:
+        """Average fill ratio between 0 (always empty) and 1 (always full)."""
+        if self.samples == 0 or self.maxsize == 0:
+            return 0.0
+        return self.total / self.samples / self.maxsize
+
+
+class PipelinedBackfill:
+    """Overlapped read → encode → write embedding backfill."""
+
+    def __init__(self, generator, chunk_size: int = None, queue_size: int = None,
+                 writers: int = None, engine=None):
+        self.generator = generator
+        self.engine = engine or get_shared_engine()
+        self.chunk_size = chunk_size or config.embedding.chunk_size
+        self.queue_size = queue_size or config.embedding.pipeline_queue_size
+        # The reader holds one pooled connection for its server-side cursor
+        self.writers = writers or config.embedding.pipeline_writers or max(1, self.engine.pool.size() - 1)
+
+        self.read_queue = queue.Queue(maxsize=self.queue_size)
+        self.write_queue = queue.Queue(maxsize=self.queue_size)
+        self.stats = {
+            "reader": StageStats("reader"),
+            "encoder": StageStats("encoder"),
+            "writer": StageStats("writer", workers=self.writers),
+        }
+        self.queue_stats = {
+            "read_queue": QueueStats("read_queue", self.queue_size),
+            "write_queue": QueueStats("write_queue", self.queue_size),
+        }
+
+        self._stop = threading.Event()
+        self._errors = []
+        self._checkpoint = BackfillCheckpoint()
+        self._commit_lock = threading.Lock()
+        self._committed = {}
+        self._next_seq = 0
+
+    # ── Stages ────────────────────────────────────────────────
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Put with periodic stop checks so a failed stage can't deadlock the rest."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _read(self, after_id: int):
+        stats = self.stats["reader"]
+        try:
+            seq = 0
+            started = time.perf_counter()
+            for rows in iter_reviews_without_embeddings(self.chunk_size, after_id=after_id):
+                stats.record(len(rows), time.perf_counter() - started)
+                if not self._put(self.read_queue, (seq, [r[0] for r in rows], [r[1] for r in rows])):
+                    return
+                seq += 1
+                started = time.perf_counter()
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self.read_queue, _DONE)
+
+    def _encode(self):
+        stats = self.stats["encoder"]
+        try:
+            while True:
+                item = self._get(self.read_queue)
+                if item is _DONE:
+                    break
+                seq, ids, texts = item
+                started = time.perf_counter()
+                embeddings = self.generator.encode(texts, normalize=True)
+                stats.record(len(ids), time.perf_counter() - started)
+                if not self._put(self.write_queue, (seq, ids, embeddings)):
+                    return
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.writers):
+                self._put(self.write_queue, _DONE)
+
+    def _write(self):
+        stats = self.stats["writer"]
+        try:
+            while True:
+                item = self._get(self.write_queue)
+                if item is _DONE:
+                    break
+                seq, ids, embeddings = item
+                started = time.perf_counter()
+                bulk_update_embeddings(ids, embeddings, engine=self.engine)
+                stats.record(len(ids), time.perf_counter() - started)
+                self._mark_committed(seq, ids[-1])
+        except Exception as e:
+            self._fail(e)
+
+    def _mark_committed(self, seq: int, last_id: int):
+        """Advance the checkpoint over the contiguous prefix of committed chunks."""
+        with self._commit_lock:
+            self._committed[seq] = last_id
+            advanced = None
+            while self._next_seq in self._committed:
+                advanced = self._committed.pop(self._next_seq)
+                self._next_seq += 1
+            if advanced is not None:
+                self._checkpoint.save(advanced)
+
+    def _fail(self, error: Exception):
+        self._errors.append(error)
+        self._stop.set()
+
+    # ── Driver ────────────────────────────────────────────────
+
+    def run(self, resume: bool = True, report_every: float = 10.0) -> dict:
+        """
+        Run the backfill to completion.
+
+        Args:
+            resume: Continue after the last committed checkpoint if present
+            report_every: Seconds between progress reports
+
+        Returns:
+            Dict with per-stage throughput/utilization and queue occupancy
+        """
+        after_id = self._checkpoint.load() if resume else 0
+        if after_id:
+            print(f"Resuming after review id {after_id:,}")
+
+        total = count_reviews_without_embeddings(after_id)
+        if total == 0:
+            print("✅ All reviews already have embeddings!")
+            self._checkpoint.clear()
+            return {}
+
+        self.generator.load_model()
+        print(f"Generating embeddings for {total:,} reviews "
+              f"(pipelined: chunks of {self.chunk_size:,}, queue={self.queue_size}, writers={self.writers})...")
+
+        threads = [threading.Thread(target=self._read, args=(after_id,), name="backfill-reader"),
+                   threading.Thread(target=self._encode, name="backfill-encoder")]
+        threads += [threading.Thread(target=self._write, name=f"backfill-writer-{i}")
+                    for i in range(self.writers)]
+
+        start_time = time.time()
+        for t in threads:
+            t.start()
+
+        last_report = start_time
+        while any(t.is_alive() for t in threads):
+            time.sleep(0.2)
+            self.queue_stats["read_queue"].sample(self.read_queue)
+            self.queue_stats["write_queue"].sample(self.write_queue)
+            if time.time() - last_report >= report_every:
+                last_report = time.time()
+                self._print_progress(total, last_report - start_time)
+
+        for t in threads:
+            t.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        self._checkpoint.clear()
+        elapsed = time.time() - start_time
+        report = self.report(elapsed)
+        written = self.stats["writer"].rows
+        print(f"\n✅ Done! {written:,} embeddings in {elapsed/60:.1f}min ({written/max(elapsed, 1e-9):.0f}/sec)")
+        self._print_report(report)
+        return report
+
+    def report(self, elapsed: float) -> dict:
+        """Summarize stage throughput and queue occupancy."""
+        stages = {
+            name: {
+                "rows": s.rows,
+                "rows_per_sec": s.rate(elapsed),
+                "utilization": s.utilization(elapsed),
+                "workers": s.workers,
+            }
+            for name, s in self.stats.items()
+        }
+        queues = {name: q.avg_occupancy for name, q in self.queue_stats.items()}
+        bottleneck = max(stages, key=lambda n: stages[n]["utilization"])
+        return {"elapsed": elapsed, "stages": stages, "queues": queues, "bottleneck": bottleneck}
+
+    def _print_progress(self, total: int, elapsed: float):
+        done = self.stats["writer"].rows
+        rate = done / elapsed if elapsed > 0 else 0
+        remaining = max(total - done, 0) / rate if rate > 0 else 0
+        print(f"  {done:,}/{total:,} ({done/total*100:.1f}%) | {rate:.0f} reviews/sec | "
+              f"ETA: {remaining/60:.1f}min | queues: read {self.read_queue.qsize()}/{self.queue_size}, "
+              f"write {self.write_queue.qsize()}/{self.queue_size}")
+
+    @staticmethod
+    def _print_report(report: dict):
+        print("\n📊 Stage throughput:")
+        for name, s in report["stages"].items():
+            print(f"   {name:<8} {s['rows_per_sec']:>8.0f} rows/sec | busy {s['utilization']*100:5.1f}% "
+                  f"| workers {s['workers']}")
+        for name, occupancy in report["queues"].items():
+            print(f"   {name:<11} avg occupancy {occupancy*100:5.1f}%")
+        print(f"   Bottleneck: {report['bottleneck']}")
@@ -0,0 +1,94 @@
+"""
+Micro-batching for concurrent query embeddings.
+
+Concurrent callers (e.g. several Gradio users submitting at once) each submit
+a single query. A background thread collects requests until ``max_batch_size``
+arrive or ``max_wait_ms`` passes, encodes them in one model call, and resolves
+each caller's future with its own embedding.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class QueryBatcher:
+    """Coalesces single-query encode requests into batched model calls."""
+
+    def __init__(self, encode_fn, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        """
+        Args:
+            encode_fn: Callable mapping a list of texts to an array of embeddings
+            max_batch_size: Flush as soon as this many requests are waiting
+            max_wait_ms: Longest time the first request in a batch waits for company
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.queries = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, query: str) -> Future:
+        """Queue a query and return a future resolving to its embedding (list of floats)."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((query, future))
+        return future
+
+    def encode_query(self, query: str, timeout: float = None) -> list:
+        """Blocking convenience wrapper around ``submit``."""
+        return self.submit(query).result(timeout=timeout)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Identical queries in the same window are encoded once
+            unique = list(dict.fromkeys(q for q, _ in batch))
+            try:
+                embeddings = self.encode_fn(unique)
+                by_text = {q: emb.tolist() for q, emb in zip(unique, embeddings)}
+                outcomes = [(future, list(by_text[q]), None) for q, future in batch]
+            except Exception as e:
+                outcomes = [(future, None, e) for _, future in batch]
+            # Count before resolving, so a woken caller never sees stale stats()
+            with self._lock:
+                self.batches += 1
+                self.queries += len(batch)
+            for future, embedding, error in outcomes:
+                if error is None:
+                    future.set_result(embedding)
+                else:
+                    future.set_exception(error)
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches, queries = self.batches, self.queries
+        return {
+            "batches": batches,
+            "queries": queries,
+            "avg_batch_size": queries / batches if batches else 0.0,
+        }
@@ -0,0 +1,75 @@
+"""
+Query embedding cache.
+
+Repeated questions (including the UI's example queries) skip the transformer
+forward pass. Keys are the model name plus the normalized query text, and the
+cache can be persisted to an ``.npz`` file so it survives restarts.
+"""
+
+import os
+import re
+import time
+import unicodedata
+import numpy as np
+from src.utils.cache import LRUCache
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query for cache lookups (NFKC, casefolded, single-spaced)."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query)).strip().casefold()
+
+
+class QueryEmbeddingCache(LRUCache):
+    """LRU/TTL cache of query embeddings keyed by (model name, normalized text)."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = None, path: str = None):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.path = path or None
+
+    def get_embedding(self, model_name: str, query: str):
+        """Return a copy of the cached embedding, or None on a miss."""
+        embedding = self.get((model_name, normalize_query(query)))
+        return list(embedding) if embedding is not None else None
+
+    def put_embedding(self, model_name: str, query: str, embedding: list):
+        self.put((model_name, normalize_query(query)), list(embedding))
+
+    def save(self, path: str = None):
+        """Write live entries to an ``.npz`` file (atomically)."""
+        path = path or self.path
+        entries = self.items()
+        if not path or not entries:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            models=np.array([k[0] for k, _, _ in entries]),
+            queries=np.array([k[1] for k, _, _ in entries]),
+            stored_at=np.array([t for _, _, t in entries], dtype=np.float64),
+            embeddings=np.array([v for _, v, _ in entries], dtype=np.float32),
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str = None) -> int:
+        """Load entries saved by ``save``; expired entries are skipped. Returns count loaded."""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            data = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return 0
+
+        now = time.time()
+        loaded = 0
+        for model, query, stored_at, embedding in zip(
+            data["models"], data["queries"], data["stored_at"], data["embeddings"]
+        ):
+            if self._expired(float(stored_at), now):
+                continue
+            self.put((str(model), str(query)), embedding.tolist(), stored_at=float(stored_at))
+            loaded += 1
+        return loaded
@@ -0,0 +1,93 @@
+"""
+Multi-process embedding encoder for CPU-only machines.
+
+A single ``SentenceTransformer.encode`` call keeps only a few cores busy on
+CPU. This pool starts N worker processes, each with its own copy of the model
+and a capped torch thread count, and shards every encode call across them.
+Texts are grouped by length so each shard pads to a similar sequence length,
+and results are scattered back into the caller's original order.
+"""
+
+import atexit
+import math
+import multiprocessing as mp
+import numpy as np
+
+# Per-process model, loaded once by the pool initializer
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    """Load the model in a worker and cap its intra-op parallelism."""
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set in this process
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_shard(args) -> np.ndarray:
+    texts, batch_size, normalize = args
+    return _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=normalize,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+    )
+
+
+class CPUEncoderPool:
+    """Shards encode calls across worker processes that each hold the model."""
+
+    def __init__(self, model_name: str, dimension: int, workers: int,
+                 threads_per_worker: int = 1, shard_size: int = 64,
+                 start_method: str = "spawn"):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.shard_size = shard_size
+
+        ctx = mp.get_context(start_method)
+        self._pool = ctx.Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(model_name, threads_per_worker),
+        )
+        atexit.register(self.close)
+
+    def encode(self, texts: list[str], normalize: bool = True) -> np.ndarray:
+        """
+        Encode texts across the pool, returning embeddings in input order.
+
+        Texts are sorted by length and cut into shards of at most
+        ``shard_size``; small bursts are split evenly across workers. Shards
+        are dispatched longest-first, one at a time, so a worker stuck on long
+        reviews never holds up the short ones queued behind it.
+        """
+        n = len(texts)
+        if n == 0:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        shard = max(1, min(self.shard_size, math.ceil(n / self.workers)))
+        order = np.argsort([len(t) for t in texts], kind="stable")[::-1]
+        shards = [order[i:i + shard] for i in range(0, n, shard)]
+
+        jobs = [([texts[j] for j in idx], shard, normalize) for idx in shards]
+        out = np.empty((n, self.dimension), dtype=np.float32)
+        for idx, embeddings in zip(shards, self._pool.imap(_encode_shard, jobs, chunksize=1)):
+            out[idx] = embeddings
+        return out
+
+    def close(self):
+        """Shut down the worker processes."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
@@ -3,11 +3,17 @@ Embedding generation and management.
 Handles model loading, batch generation, and storage.
 """
 
+import atexit
+import json
+import os
 import torch
 import time
 from sentence_transformers import SentenceTransformer
-from sqlalchemy import text
+from src.database.bulk import bulk_update_embeddings
 from src.database.connection import get_shared_engine
+from src.database.queries import count_reviews_without_embeddings, iter_reviews_without_embeddings
+from src.embeddings.batcher import QueryBatcher
+from src.embeddings.cache import QueryEmbeddingCache
 from src.utils.config import config
 
 
@@ -20,17 +26,73 @@ class EmbeddingGenerator:
         self.model_name = config.embedding.model_name
         self.dimension = config.embedding.dimension
         self.batch_size = config.embedding.batch_size
+        self.cpu_workers = config.embedding.cpu_workers if self.device == "cpu" else 0
+        self.cpu_pool = None
+        self.query_cache = self._create_query_cache()
+        self.batcher = None
+        if config.embedding.query_batching:
+            self.batcher = QueryBatcher(
+                lambda texts: self.encode(texts, normalize=True),
+                max_batch_size=config.embedding.query_batch_size,
+                max_wait_ms=config.embedding.query_batch_wait_ms,
+            )
+
+    @staticmethod
+    def _create_query_cache():
+        """Build the query embedding cache from config (None if disabled)."""
+        cfg = config.embedding
+        if cfg.query_cache_size <= 0:
+            return None
+        cache = QueryEmbeddingCache(cfg.query_cache_size, ttl=cfg.query_cache_ttl,
+                                    path=cfg.query_cache_path)
+        if cache.path:
+            cache.load()
+            atexit.register(cache.save)
+        return cache
+
+    @property
+    def use_cpu_pool(self) -> bool:
+        """True when encoding is sharded across CPU worker processes."""
+        return self.cpu_workers > 1
 
     def load_model(self):
-        """Load the sentence transformer model."""
+        """
+        Load the sentence transformer model.
+
+        In CPU pool mode the model lives in the worker processes, so this
+        starts the pool instead and returns None.
+        """
+        if self.use_cpu_pool:
+            self.start_cpu_pool()
+            return None
         if self.model is None:
             print(f"Loading embedding model: {self.model_name}...")
             self.model = SentenceTransformer(self.model_name, device=self.device)
             print(f"✅ Model loaded on {self.device} (dim={self.dimension})")
         return self.model
 
+    def start_cpu_pool(self):
+        """Start the multi-process CPU encoder pool (no-op if running)."""
+        if self.cpu_pool is None:
+            from src.embeddings.cpu_pool import CPUEncoderPool
+            cfg = config.embedding
+            print(f"Starting CPU encoder pool: {self.cpu_workers} workers × "
+                  f"{cfg.cpu_threads_per_worker} threads ({self.model_name})...")
+            self.cpu_pool = CPUEncoderPool(
+                self.model_name,
+                self.dimension,
+                workers=self.cpu_workers,
+                threads_per_worker=cfg.cpu_threads_per_worker,
+                shard_size=cfg.cpu_shard_size,
+                start_method=cfg.cpu_start_method,
+            )
+            print("✅ CPU encoder pool ready")
+        return self.cpu_pool
+
     def encode(self, texts: list[str], normalize: bool = True) -> list:
         """Encode texts into embeddings."""
+        if self.use_cpu_pool:
+            return self.start_cpu_pool().encode(texts, normalize=normalize)
         model = self.load_model()
         return model.encode(
             texts,
@@ -40,67 +102,114 @@ class EmbeddingGenerator:
         )
 
     def encode_query(self, query: str) -> list:
-        """Encode a single query and return as list."""
-        embedding = self.encode([query], normalize=True)[0]
-        return embedding.tolist()
-
-    def generate_all_embeddings(self):
-        """Generate embeddings for all reviews missing them."""
-        model = self.load_model()
+        """Encode a single query and return as list (served from the query cache when possible)."""
+        if self.query_cache is not None:
+            cached = self.query_cache.get_embedding(self.model_name, query)
+            if cached is not None:
+                return cached
+
+        if self.batcher is not None:
+            embedding = self.batcher.encode_query(query)
+        else:
+            embedding = self.encode([query], normalize=True)[0].tolist()
+        if self.query_cache is not None:
+            self.query_cache.put_embedding(self.model_name, query, embedding)
+        return embedding
+
+    def generate_all_embeddings(self, chunk_size: int = None, resume: bool = True,
+                                pipelined: bool = False):
+        """
+        Generate embeddings for all reviews missing them.
+
+        Reviews are streamed from a server-side cursor in chunks of
+        ``chunk_size`` rows, so peak memory depends on the chunk size rather
+        than on the corpus size. After each chunk is committed its last id is
+        written to a checkpoint file; with ``resume=True`` a restarted run
+        continues after that id instead of rescanning from the start.
+
+        Args:
+            chunk_size: Rows read and written per chunk (defaults to config)
+            resume: Continue from the last committed checkpoint if present
+            pipelined: Overlap reading, encoding and writing in separate
+                stages (see ``src.embeddings.backfill``)
+        """
+        if pipelined:
+            from src.embeddings.backfill import PipelinedBackfill
+            return PipelinedBackfill(self, chunk_size=chunk_size).run(resume=resume)
+
+        chunk_size = chunk_size or config.embedding.chunk_size
         engine = get_shared_engine()
+        checkpoint = BackfillCheckpoint()
+
+        after_id = checkpoint.load() if resume else 0
+        if after_id:
+            print(f"Resuming after review id {after_id:,}")
 
-        # Fetch all reviews without embeddings
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT id, COALESCE(summary, '') || ' ' || COALESCE(review_text, '') as combined_text
-                FROM reviews
-                WHERE embedding IS NULL
-                ORDER BY id
-            """))
-            rows = result.fetchall()
-
-        total = len(rows)
+        total = count_reviews_without_embeddings(after_id)
         if total == 0:
             print("✅ All reviews already have embeddings!")
+            checkpoint.clear()
             return
 
-        ids = [row[0] for row in rows]
-        texts = [row[1] for row in rows]
-
-        print(f"Generating embeddings for {total:,} reviews...")
+        self.load_model()
+        print(f"Generating embeddings for {total:,} reviews (chunks of {chunk_size:,})...")
         start_time = time.time()
         processed = 0
+        chunks = 0
 
-        for i in range(0, total, self.batch_size):
-            batch_ids = ids[i:i + self.batch_size]
-            batch_texts = texts[i:i + self.batch_size]
+        for rows in iter_reviews_without_embeddings(chunk_size, after_id=after_id):
+            batch_ids = [row[0] for row in rows]
+            batch_texts = [row[1] for row in rows]
 
-            embeddings = model.encode(
-                batch_texts,
-                batch_size=self.batch_size,
-                show_progress_bar=False,
-                normalize_embeddings=True,
-            )
+            embeddings = self.encode(batch_texts, normalize=True)
 
-            with engine.connect() as conn:
-                for review_id, embedding in zip(batch_ids, embeddings):
-                    conn.execute(
-                        text("UPDATE reviews SET embedding = :emb WHERE id = :id"),
-                        {"emb": str(embedding.tolist()), "id": review_id}
-                    )
-                conn.commit()
+            bulk_update_embeddings(batch_ids, embeddings, engine=engine)
+            checkpoint.save(batch_ids[-1])
 
             processed += len(batch_ids)
+            chunks += 1
             elapsed = time.time() - start_time
             rate = processed / elapsed
-            remaining = (total - processed) / rate if rate > 0 else 0
+            remaining = max(total - processed, 0) / rate if rate > 0 else 0
 
-            if (i // self.batch_size) % 10 == 0 or processed == total:
+            if chunks % 10 == 1 or processed >= total:
                 print(f"  {processed:,}/{total:,} ({processed/total*100:.1f}%) | "
                       f"{rate:.0f} reviews/sec | ETA: {remaining/60:.1f}min")
 
+        checkpoint.clear()
         total_time = time.time() - start_time
-        print(f"\n✅ Done! {total:,} embeddings in {total_time/60:.1f}min ({total/total_time:.0f}/sec)")
+        print(f"\n✅ Done! {processed:,} embeddings in {total_time/60:.1f}min "
+              f"({processed/max(total_time, 1e-9):.0f}/sec)")
+
+
+class BackfillCheckpoint:
+    """Persists the last committed review id of an embedding backfill."""
+
+    def __init__(self, path: str = None):
+        self.path = path or config.embedding.checkpoint_path
+
+    def load(self) -> int:
+        """Return the last committed id, or 0 if no checkpoint exists."""
+        try:
+            with open(self.path) as f:
+                return int(json.load(f).get("last_id", 0))
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def save(self, last_id: int):
+        """Atomically record ``last_id`` as committed."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"last_id": int(last_id), "updated_at": time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Remove the checkpoint once a backfill completes."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
 
 
 # Singleton instance
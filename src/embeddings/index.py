@@ -0,0 +1,337 @@
+"""
+In-process vector index backed by memory-mapped NumPy files.
+
+``export_index`` streams every embedded review out of PostgreSQL once into a
+directory of ``.npy`` files: the embedding matrix (float32 or float16), the id
+array, the metadata columns used by prompts, and the review texts as UTF-8
+blobs with offset arrays. ``VectorIndex`` maps those files read-only, so any
+number of worker processes share one page-cached copy, and answers top-k
+queries with a blockwise matrix-vector product plus ``argpartition`` — no
+database round trip.
+
+An optional IVF layer (spherical k-means coarse quantizer) can be built at
+export time; searches then scan only the ``nprobe`` closest lists. Int8 or PQ
+codes (``src.embeddings.quantization``) can replace the full-precision scan,
+with only the best ``rerank_factor * k`` candidates rescored exactly.
+"""
+
+import json
+import os
+import shutil
+import time
+import numpy as np
+from src.database.connection import get_shared_engine
+from src.database.queries import get_embedded_count
+from src.embeddings.quantization import build_quantizer, load_quantizer
+from src.utils.config import config
+
+BLOCK_ROWS = 65536
+TEXT_COLUMNS = ("summary", "review_text")
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def _assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + BLOCK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def build_ivf(path: str, nlist: int, sample_size: int = 100_000):
+    """Train IVF centroids on a sample and write the inverted lists next to the index."""
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+    rng = np.random.default_rng(0)
+    sample_idx = np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))
+    centroids = _kmeans(np.asarray(vectors[sample_idx], dtype=np.float32), nlist)
+
+    assign = _assign_lists(vectors, centroids)
+    order = np.argsort(assign, kind="stable").astype(np.int32)
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+    np.save(os.path.join(path, "ivf_centroids.npy"), centroids)
+    np.save(os.path.join(path, "ivf_order.npy"), order)
+    np.save(os.path.join(path, "ivf_offsets.npy"), offsets)
+
+
+def export_index(path: str = None, dtype: str = None, nlist: int = 0, quantize: str = None,
+                 chunk_size: int = 10_000) -> dict:
+    """
+    Export all embedded reviews into a memory-mappable index directory.
+
+    Rows are streamed through a server-side cursor, so memory stays bounded by
+    ``chunk_size``. The index is written to a temporary directory and swapped
+    in atomically.
+
+    Args:
+        path: Index directory (defaults to config)
+        dtype: ``float32`` or ``float16`` storage for the embedding matrix
+        nlist: Number of IVF lists to build (0 = exact search only)
+        quantize: Also build ``int8`` or ``pq`` codes
+        chunk_size: Rows fetched per cursor round trip
+
+    Returns:
+        Index metadata dict
+    """
+    from pgvector.psycopg2 import register_vector
+
+    path = path or config.rag.index_path
+    dtype = dtype or config.rag.index_dtype
+    dim = config.embedding.dimension
+    expected = get_embedded_count()
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    vectors = np.lib.format.open_memmap(os.path.join(tmp_path, "vectors.npy"), mode="w+",
+                                        dtype=np.dtype(dtype), shape=(expected, dim))
+    columns = {
+        "ids": np.empty(expected, dtype=np.int32),
+        "score": np.empty(expected, dtype=np.int8),
+        "helpfulness_num": np.empty(expected, dtype=np.int32),
+        "helpfulness_den": np.empty(expected, dtype=np.int32),
+        "review_time": np.empty(expected, dtype=np.int64),
+        "product_id": np.empty(expected, dtype="S20"),
+    }
+    # Other products each row's text was posted under (its content-hash duplicates)
+    group_rows, group_products = [], []
+    text_files = {c: open(os.path.join(tmp_path, f"{c}.bin"), "wb") for c in TEXT_COLUMNS}
+    text_offsets = {c: [0] for c in TEXT_COLUMNS}
+
+    print(f"Exporting {expected:,} embeddings to {path} ({dtype})...")
+    start_time = time.time()
+    n = 0
+
+    engine = get_shared_engine()
+    raw = engine.raw_connection()
+    try:
+        register_vector(raw.driver_connection)
+        cur = raw.cursor(name="export_vector_index")
+        cur.itersize = chunk_size
+        cur.execute("""
+            SELECT id, score, COALESCE(helpfulness_numerator, 0), COALESCE(helpfulness_denominator, 0),
+                   COALESCE(review_time, 0), product_id, COALESCE(summary, ''),
+                   COALESCE(review_text, ''), embedding,
+                   ARRAY(SELECT DISTINCT d.product_id FROM reviews d
+                         WHERE d.content_hash = reviews.content_hash
+                           AND d.product_id <> reviews.product_id)
+            FROM reviews
+            WHERE embedding IS NOT NULL
+            ORDER BY id
+        """)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            rows = rows[:max(expected - n, 0)]
+            if not rows:
+                break  # rows embedded after the count was taken
+            m = len(rows)
+            vectors[n:n + m] = np.stack([r[8] for r in rows])
+            columns["ids"][n:n + m] = [r[0] for r in rows]
+            columns["score"][n:n + m] = [r[1] or 0 for r in rows]
+            columns["helpfulness_num"][n:n + m] = [r[2] for r in rows]
+            columns["helpfulness_den"][n:n + m] = [r[3] for r in rows]
+            columns["review_time"][n:n + m] = [r[4] for r in rows]
+            columns["product_id"][n:n + m] = [(r[5] or "").encode() for r in rows]
+            for i, r in enumerate(rows):
+                for product in r[9] or ():
+                    group_rows.append(n + i)
+                    group_products.append(product.encode())
+            for col, pos in zip(TEXT_COLUMNS, (6, 7)):
+                offsets = text_offsets[col]
+                for r in rows:
+                    data = r[pos].encode("utf-8")
+                    text_files[col].write(data)
+                    offsets.append(offsets[-1] + len(data))
+            n += m
+        cur.close()
+        raw.commit()
+    finally:
+        raw.close()
+        for f in text_files.values():
+            f.close()
+
+    vectors.flush()
+    del vectors
+    if n < expected:
+        # Fewer rows than counted (e.g. embeddings removed mid-export): shrink the matrix
+        full = np.load(os.path.join(tmp_path, "vectors.npy"), mmap_mode="r")
+        np.save(os.path.join(tmp_path, "vectors_trim.npy"), full[:n])
+        del full
+        os.replace(os.path.join(tmp_path, "vectors_trim.npy"), os.path.join(tmp_path, "vectors.npy"))
+
+    for name, values in columns.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), values[:n])
+    for col in TEXT_COLUMNS:
+        np.save(os.path.join(tmp_path, f"{col}_offsets.npy"), np.asarray(text_offsets[col], dtype=np.int64))
+    np.save(os.path.join(tmp_path, "group_rows.npy"), np.asarray(group_rows, dtype=np.int64))
+    np.save(os.path.join(tmp_path, "group_products.npy"), np.asarray(group_products, dtype="S20"))
+
+    if nlist:
+        print(f"Building IVF with {nlist:,} lists...")
+        build_ivf(tmp_path, nlist)
+    if quantize and quantize != "none":
+        print(f"Building {quantize} codes...")
+        build_quantizer(tmp_path, quantize, pq_m=config.rag.index_pq_m)
+
+    meta = {
+        "count": n,
+        "dimension": dim,
+        "dtype": dtype,
+        "model": config.embedding.model_name,
+        "nlist": nlist,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"✅ Exported {n:,} vectors in {time.time() - start_time:.1f}s")
+    return meta
+
+
+class VectorIndex:
+    """Read-only memory-mapped index answering top-k cosine similarity queries."""
+
+    def __init__(self, path: str = None, nprobe: int = None, quantization: str = None,
+                 rerank_factor: int = None):
+        self.path = path or config.rag.index_path
+        self.nprobe = nprobe or config.rag.index_nprobe
+        self.rerank_factor = rerank_factor or config.rag.index_rerank_factor
+        with open(os.path.join(self.path, "meta.json")) as f:
+            self.meta = json.load(f)
+
+        load = lambda name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        self.vectors = load("vectors")
+        self.ids = load("ids")
+        self.score = load("score")
+        self.helpfulness_num = load("helpfulness_num")
+        self.helpfulness_den = load("helpfulness_den")
+        self.review_time = load("review_time")
+        self.product_id = load("product_id")
+        # (row, product) pairs for duplicates posted under other products; absent in older exports
+        if os.path.exists(os.path.join(self.path, "group_rows.npy")):
+            self.group_rows, self.group_products = load("group_rows"), load("group_products")
+        else:
+            self.group_rows, self.group_products = np.empty(0, dtype=np.int64), np.empty(0, dtype="S20")
+        self.text_offsets = {c: load(f"{c}_offsets") for c in TEXT_COLUMNS}
+        self.text_blobs = {
+            c: np.memmap(os.path.join(self.path, f"{c}.bin"), dtype=np.uint8, mode="r")
+            if self.text_offsets[c][-1] > 0 else np.empty(0, dtype=np.uint8)
+            for c in TEXT_COLUMNS
+        }
+
+        self.ivf = None
+        if self.meta.get("nlist"):
+            self.ivf = (load("ivf_centroids"), load("ivf_order"), load("ivf_offsets"))
+
+        quantization = quantization or config.rag.index_quantization
+        self.quantizer = load_quantizer(self.path, quantization) if quantization != "none" else None
+
+    def __len__(self) -> int:
+        return int(self.meta["count"])
+
+    def _text(self, column: str, i: int) -> str:
+        offsets = self.text_offsets[column]
+        return bytes(self.text_blobs[column][offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def row(self, i: int, similarity: float) -> dict:
+        """Build a result dict shaped like ``search_similar_reviews`` rows."""
+        return {
+            "id": int(self.ids[i]),
+            "summary": self._text("summary", i),
+            "score": int(self.score[i]),
+            "review_text": self._text("review_text", i),
+            "helpfulness_num": int(self.helpfulness_num[i]),
+            "helpfulness_den": int(self.helpfulness_den[i]),
+            "product_id": self.product_id[i].decode(),
+            "similarity": float(similarity),
+        }
+
+    def _candidate_rows(self, query: np.ndarray):
+        """Row indices to scan: all rows, or the members of the nprobe closest IVF lists."""
+        if self.ivf is None:
+            return None
+        centroids, order, offsets = self.ivf
+        probes = np.argpartition(-(centroids @ query), min(self.nprobe, len(centroids)) - 1)[:self.nprobe]
+        return np.concatenate([order[offsets[p]:offsets[p + 1]] for p in probes])
+
+    def scores(self, query, rows: np.ndarray = None) -> np.ndarray:
+        """Cosine similarity of ``query`` against sorted ``rows`` (or every vector), computed blockwise."""
+        query = np.asarray(query, dtype=np.float32)
+        if rows is None:
+            out = np.empty(len(self), dtype=np.float32)
+            for start in range(0, len(self), BLOCK_ROWS):
+                block = np.asarray(self.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+                out[start:start + BLOCK_ROWS] = block @ query
+            return out
+        return np.asarray(self.vectors[rows], dtype=np.float32) @ query
+
+    def search_indices(self, query_embedding, top_k: int = 5,
+                       filters=None) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, similarities) of the top-k matches, best first."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        rows = self._candidate_rows(query)
+        if rows is not None:
+            rows = np.sort(rows)
+
+        if filters is not None and not filters.is_empty():
+            allowed = filters.mask(self)
+            if rows is not None:
+                rows = rows[allowed[rows]]
+            if rows is None or len(rows) < top_k:
+                # Too few matches in the probed lists: scan every matching row
+                rows = np.flatnonzero(allowed)
+
+        if self.quantizer is not None:
+            # Approximate scan over compressed codes, then exact rerank of the best few
+            approx = self.quantizer.scores(query, rows)
+            r = min(len(approx), max(top_k * self.rerank_factor, top_k))
+            if r == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            shortlist = np.argpartition(-approx, r - 1)[:r]
+            rows = np.sort(rows[shortlist] if rows is not None else shortlist)
+
+        scores = self.scores(query, rows)
+
+        k = min(top_k, len(scores))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        indices = rows[top] if rows is not None else top
+        return indices, scores[top]
+
+    def search(self, query_embedding, top_k: int = 5, filters=None) -> list[dict]:
+        """Top-k most similar reviews as dicts, best first."""
+        indices, similarities = self.search_indices(query_embedding, top_k, filters=filters)
+        return [self.row(int(i), s) for i, s in zip(indices, similarities)]
+
+
+# Singleton instance
+_index = None
+
+
+def get_vector_index() -> VectorIndex:
+    """Get or open the shared memory-mapped VectorIndex."""
+    global _index
+    if _index is None:
+        _index = VectorIndex()
+    return _index
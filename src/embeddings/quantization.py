@@ -0,0 +1,205 @@
+"""
+Compressed embedding codes for the memory-mapped vector index.
+
+Two quantizers are provided:
+
+- ``ScalarQuantizer`` — per-dimension int8 codes (4x smaller than float32).
+- ``ProductQuantizer`` — ``m`` sub-vectors, each replaced by the id of one of
+  256 k-means centroids (1 byte per sub-vector; m=48 is 32x smaller).
+
+Both score a query against their codes asymmetrically (the query stays full
+precision), and ``VectorIndex`` reranks a small candidate set with the original
+vectors. ``evaluate_recall`` measures how much recall@k that costs against an
+exact scan.
+"""
+
+import os
+import numpy as np
+
+BLOCK_ROWS = 65536
+
+
+def _kmeans_l2(vectors: np.ndarray, k: int, iterations: int = 12, seed: int = 0) -> np.ndarray:
+    """Plain Euclidean k-means; returns (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        # ||x - c||^2 = ||x||^2 - 2 x·c + ||c||^2 ; ||x||^2 is constant per row
+        assign = np.argmin((centroids ** 2).sum(1) - 2 * vectors @ centroids.T, axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        if (~filled).any():
+            centroids[~filled] = vectors[rng.choice(len(vectors), int((~filled).sum()), replace=False)]
+    return centroids
+
+
+class ScalarQuantizer:
+    """Per-dimension 8-bit quantization: x ≈ offset + scale * code."""
+
+    kind = "int8"
+
+    def __init__(self, offset: np.ndarray = None, scale: np.ndarray = None):
+        self.offset = offset
+        self.scale = scale
+        self.codes = None
+
+    def train(self, sample: np.ndarray):
+        sample = np.asarray(sample, dtype=np.float32)
+        low, high = sample.min(axis=0), sample.max(axis=0)
+        self.offset = low
+        self.scale = np.maximum(high - low, 1e-12) / 255.0
+        return self
+
+    def encode(self, vectors) -> np.ndarray:
+        codes = np.empty(vectors.shape, dtype=np.uint8)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + BLOCK_ROWS] = np.clip(np.rint((block - self.offset) / self.scale), 0, 255)
+        return codes
+
+    def scores(self, query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """Approximate inner products: q·offset + (q*scale)·code."""
+        weights = (query * self.scale).astype(np.float32)
+        bias = float(query @ self.offset)
+        codes = self.codes if rows is None else self.codes[rows]
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            out[start:start + BLOCK_ROWS] = codes[start:start + BLOCK_ROWS].astype(np.float32) @ weights
+        return out + bias
+
+    def bytes_per_vector(self) -> int:
+        return len(self.offset)
+
+    def save(self, path: str, codes: np.ndarray):
+        np.savez(os.path.join(path, "sq_params.npz"), offset=self.offset, scale=self.scale)
+        np.save(os.path.join(path, "sq_codes.npy"), codes)
+
+    @classmethod
+    def load(cls, path: str):
+        params = np.load(os.path.join(path, "sq_params.npz"))
+        quantizer = cls(params["offset"], params["scale"])
+        quantizer.codes = np.load(os.path.join(path, "sq_codes.npy"), mmap_mode="r")
+        return quantizer
+
+
+class ProductQuantizer:
+    """Product quantization with ``m`` sub-spaces of 256 centroids each."""
+
+    kind = "pq"
+
+    def __init__(self, m: int = 48, codebooks: np.ndarray = None):
+        self.m = m
+        self.codebooks = codebooks  # (m, 256, dim // m)
+        self.codes = None
+
+    def train(self, sample: np.ndarray):
+        sample = np.asarray(sample, dtype=np.float32)
+        dim = sample.shape[1]
+        if dim % self.m:
+            raise ValueError(f"Dimension {dim} is not divisible by m={self.m}")
+        sub = dim // self.m
+        self.codebooks = np.stack([
+            _kmeans_l2(np.ascontiguousarray(sample[:, j * sub:(j + 1) * sub]), 256, seed=j)
+            for j in range(self.m)
+        ])
+        return self
+
+    def encode(self, vectors) -> np.ndarray:
+        sub = self.codebooks.shape[2]
+        norms = (self.codebooks ** 2).sum(axis=2)  # (m, 256)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            for j in range(self.m):
+                part = block[:, j * sub:(j + 1) * sub]
+                codes[start:start + BLOCK_ROWS, j] = np.argmin(norms[j] - 2 * part @ self.codebooks[j].T, axis=1)
+        return codes
+
+    def scores(self, query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """Asymmetric distance: sum of per-sub-space lookup tables q_j·centroid."""
+        sub = self.codebooks.shape[2]
+        lut = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.m, sub)).astype(np.float32)
+        codes = self.codes if rows is None else self.codes[rows]
+        cols = np.arange(self.m)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = np.asarray(codes[start:start + BLOCK_ROWS])
+            out[start:start + BLOCK_ROWS] = lut[cols, block].sum(axis=1)
+        return out
+
+    def bytes_per_vector(self) -> int:
+        return self.m
+
+    def save(self, path: str, codes: np.ndarray):
+        np.save(os.path.join(path, "pq_codebooks.npy"), self.codebooks)
+        np.save(os.path.join(path, "pq_codes.npy"), codes)
+
+    @classmethod
+    def load(cls, path: str):
+        codebooks = np.load(os.path.join(path, "pq_codebooks.npy"))
+        quantizer = cls(codebooks.shape[0], codebooks)
+        quantizer.codes = np.load(os.path.join(path, "pq_codes.npy"), mmap_mode="r")
+        return quantizer
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+def build_quantizer(path: str, kind: str, pq_m: int = 48, sample_size: int = 100_000):
+    """Train a quantizer on a sample of the exported index and write its codes."""
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+    rng = np.random.default_rng(0)
+    sample_idx = np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))
+    sample = np.asarray(vectors[sample_idx], dtype=np.float32)
+
+    quantizer = ProductQuantizer(pq_m) if kind == "pq" else QUANTIZERS[kind]()
+    quantizer.train(sample)
+    codes = quantizer.encode(vectors)
+    quantizer.save(path, codes)
+    return quantizer
+
+
+def load_quantizer(path: str, kind: str):
+    """Open a previously built quantizer with memory-mapped codes."""
+    return QUANTIZERS[kind].load(path)
+
+
+def evaluate_recall(index, queries: np.ndarray, k: int = 10) -> dict:
+    """
+    Compare ``index`` (with its quantization/IVF settings) against exact search.
+
+    Args:
+        index: ``VectorIndex`` configured with the setting under test
+        queries: (n, dim) query embeddings
+        k: Cutoff for recall@k
+
+    Returns:
+        Dict with mean recall@k, latency and bytes per vector
+    """
+    import time
+    from src.embeddings.index import VectorIndex
+
+    exact = VectorIndex(index.path, quantization="none")
+    exact.ivf = None
+
+    recalls, latencies = [], []
+    for query in queries:
+        truth = set(exact.search_indices(query, k)[0].tolist())
+        start = time.perf_counter()
+        found = index.search_indices(query, k)[0]
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(truth & set(found.tolist())) / max(len(truth), 1))
+
+    quantizer = index.quantizer
+    full_bytes = index.vectors.shape[1] * index.vectors.dtype.itemsize
+    code_bytes = quantizer.bytes_per_vector() if quantizer else full_bytes
+    return {
+        "recall": float(np.mean(recalls)),
+        "mean_ms": float(np.mean(latencies) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "bytes_per_vector": code_bytes,
+        "compression": (index.vectors.shape[1] * 4) / code_bytes,
+    }
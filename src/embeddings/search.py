@@ -2,21 +2,108 @@
 Vector similarity search using pgvector.
 """
 
+import asyncio
 from src.embeddings.generator import get_embedding_generator
-from src.database.queries import search_similar_reviews
+from src.database.filters import ReviewFilter
+from src.database.queries import (
+    search_hybrid_reviews, search_keyword_reviews, search_similar_reviews, search_similar_reviews_batch,
+)
+from src.utils.config import config
 
+RETRIEVAL_MODES = ("semantic", "keyword", "hybrid")
 
-def semantic_search(query: str, top_k: int = 5) -> list[dict]:
+
+def semantic_search(query: str, top_k: int = 5, query_embedding: list = None,
+                    mode: str = None, filters: ReviewFilter = None) -> list[dict]:
     """
-    Perform semantic search: encode query → pgvector similarity search.
+    Perform semantic search: encode query → vector similarity search.
+
+    The search runs in PostgreSQL (pgvector) or, with
+    ``RAG_RETRIEVAL_BACKEND=memmap``, against the exported in-process index.
+    ``mode="keyword"`` uses full-text search only and ``mode="hybrid"`` fuses
+    both candidate lists with reciprocal-rank fusion (always in PostgreSQL).
 
     Args:
         query: Natural language search query
         top_k: Number of results to return
+        query_embedding: Precomputed embedding of ``query`` (skips encoding)
+        mode: "semantic", "keyword" or "hybrid" (defaults to config)
+        filters: Optional score/product/time/helpfulness filter, pushed
+            into the search so the full ``top_k`` still comes back
+
+    Returns:
+        List of review dicts sorted by relevance
+    """
+    mode = mode or config.rag.retrieval_mode
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
+
+    if mode == "keyword":
+        return search_keyword_reviews(query, top_k=top_k, filters=filters)
+
+    if query_embedding is None:
+        query_embedding = get_embedding_generator().encode_query(query)
+
+    if mode == "hybrid":
+        return search_hybrid_reviews(
+            query, query_embedding, top_k=top_k,
+            candidates=max(config.rag.hybrid_candidates, top_k), rrf_k=config.rag.rrf_k,
+            filters=filters,
+        )
+    if config.rag.retrieval_backend == "memmap":
+        from src.embeddings.index import get_vector_index
+        return get_vector_index().search(query_embedding, top_k=top_k, filters=filters)
+    return search_similar_reviews(query_embedding, top_k=top_k, filters=filters)
+
+
+def batch_search(queries: list[str], top_k: int = 5, query_embeddings: list = None,
+                 mode: str = None, filters: ReviewFilter = None) -> list[list[dict]]:
+    """
+    ``semantic_search`` for many queries.
+
+    Semantic search on the pgvector backend runs every query in one SQL
+    round trip. Keyword, hybrid and memmap searches run per query.
+
+    Args:
+        queries: Natural language search queries
+        top_k: Number of results per query
+        query_embeddings: Precomputed embeddings, one per query (skips encoding)
+        mode: "semantic", "keyword" or "hybrid" (defaults to config)
+        filters: Optional metadata filter (applies to every query)
 
     Returns:
-        List of review dicts sorted by similarity
+        One result list per query, in input order
     """
-    generator = get_embedding_generator()
-    query_embedding = generator.encode_query(query)
-    return search_similar_reviews(query_embedding, top_k=top_k)
+    mode = mode or config.rag.retrieval_mode
+    if mode == "semantic" and config.rag.retrieval_backend != "memmap":
+        if query_embeddings is None:
+            query_embeddings = get_embedding_generator().encode(queries)
+        return search_similar_reviews_batch(query_embeddings, top_k=top_k, filters=filters)
+
+    if query_embeddings is None:
+        query_embeddings = [None] * len(queries)
+    return [semantic_search(q, top_k=top_k, query_embedding=emb, mode=mode, filters=filters)
+            for q, emb in zip(queries, query_embeddings)]
+
+
+async def async_semantic_search(query: str, top_k: int = 5, query_embedding: list = None,
+                                mode: str = None, filters: ReviewFilter = None) -> list[dict]:
+    """
+    Asyncio version of ``semantic_search``.
+
+    Query encoding runs in the default executor (or is served from the query
+    cache); the pgvector search goes through the asyncpg pool. Keyword,
+    hybrid and filtered searches run the synchronous query in the executor.
+    """
+    mode = mode or config.rag.retrieval_mode
+    if mode != "semantic" or (filters is not None and not filters.is_empty()):
+        return await asyncio.to_thread(semantic_search, query, top_k, query_embedding, mode, filters)
+
+    if query_embedding is None:
+        query_embedding = await asyncio.to_thread(get_embedding_generator().encode_query, query)
+    if config.rag.retrieval_backend == "memmap":
+        from src.embeddings.index import get_vector_index
+        return await asyncio.to_thread(get_vector_index().search, query_embedding, top_k)
+
+    from src.database.async_queries import async_search_similar_reviews
+    return await async_search_similar_reviews(query_embedding, top_k=top_k)
@@ -0,0 +1,186 @@
+"""
+Evaluation harness: retrieval metrics, latency and LLM-judge scores.
+
+Each case is one question with optional expected keywords. The full RAG
+pipeline answers it. Retrieval metrics come from the reviews the model saw:
+keyword precision, mean similarity, product diversity and retrieval time.
+The judge then scores the answer. Cases run concurrently on a thread pool;
+generations and judge calls share the generation scheduler. Generation runs
+at temperature 0 without the answer cache, so answers are reproducible and
+cached verdicts stay valid across runs. Tokens/sec is Ollama's decode rate
+(``eval_count`` / ``eval_duration``), so time spent queued behind other
+cases does not count against the model.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import numpy as np
+from src.evaluation.judge import SCORE_FIELDS, Judge
+from src.utils.config import config
+
+
+@dataclass
+class EvalCase:
+    query: str
+    keywords: list[str] = field(default_factory=list)
+
+
+DEFAULT_CASES = [
+    EvalCase("What do people think about organic coffee?", ["coffee"]),
+    EvalCase("Which dog food products have the best reviews?", ["dog"]),
+    EvalCase("What are common complaints about chocolate products?", ["chocolate"]),
+    EvalCase("Are there any highly rated gluten-free snacks?", ["gluten"]),
+    EvalCase("What's the best tea according to reviewers?", ["tea"]),
+    EvalCase("Do people like sugar-free candy?", ["sugar", "candy"]),
+    EvalCase("What do customers say about baby food quality?", ["baby"]),
+    EvalCase("Which snack bars have the most helpful reviews?", ["bar"]),
+]
+
+
+def load_cases(path: str) -> list[EvalCase]:
+    """Cases from JSONL (``query`` and optional ``keywords``) or a text file of questions."""
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                cases.append(EvalCase(entry["query"], list(entry.get("keywords") or [])))
+            else:
+                cases.append(EvalCase(line))
+    return cases
+
+
+def keyword_precision(contexts: list[dict], keywords: list[str]):
+    """Share of retrieved reviews mentioning any expected keyword (None without keywords)."""
+    if not keywords or not contexts:
+        return None
+    keywords = [k.lower() for k in keywords]
+    matches = sum(
+        any(k in f"{ctx['summary']} {ctx['review_text']}".lower() for k in keywords)
+        for ctx in contexts
+    )
+    return matches / len(contexts)
+
+
+def product_diversity(contexts: list[dict]):
+    """Distinct products among the retrieved reviews, as a share of the reviews."""
+    if not contexts:
+        return None
+    return len({ctx["product_id"] for ctx in contexts}) / len(contexts)
+
+
+def evaluate_case(pipeline, judge: Judge, case: EvalCase) -> dict:
+    """Answer one case and score it (``judge`` None = retrieval and latency only)."""
+    start = time.time()
+    result = pipeline.query(case.query)
+    total_time = time.time() - start
+    contexts = result["contexts"]
+    answer = result["answer"]
+
+    record = {
+        "query": case.query,
+        "answer": answer,
+        "review_ids": [ctx["id"] for ctx in contexts],
+        "keyword_precision": keyword_precision(contexts, case.keywords),
+        "avg_similarity": float(np.mean([ctx["similarity"] for ctx in contexts])) if contexts else None,
+        "product_diversity": product_diversity(contexts),
+        "retrieval_ms": result["retrieval_time"] * 1000,
+        "total_time": total_time,
+        "tokens_per_sec": result.get("llm_stats", {}).get("tokens_per_sec"),
+        "timings": result.get("timings", {}),
+    }
+
+    if judge is not None and contexts and not answer.startswith("❌"):
+        record.update(judge.judge(case.query, contexts, answer))
+    return record
+
+
+def _mean(records: list[dict], key: str):
+    values = [r[key] for r in records if r.get(key) is not None]
+    return float(np.mean(values)) if values else None
+
+
+def summarize(records: list[dict]) -> dict:
+    """Aggregate per-case records into the README metrics."""
+    judged = [r for r in records if "parsed" in r]
+    flagged = [r for r in judged if r["hallucination"] is not None]
+    retrieval_ms = [r["retrieval_ms"] for r in records]
+    summary = {
+        "cases": len(records),
+        "keyword_precision": _mean(records, "keyword_precision"),
+        "avg_similarity": _mean(records, "avg_similarity"),
+        "retrieval_ms": float(np.mean(retrieval_ms)) if retrieval_ms else None,
+        "retrieval_ms_p95": float(np.percentile(retrieval_ms, 95)) if retrieval_ms else None,
+        "product_diversity": _mean(records, "product_diversity"),
+        "latency_s": _mean(records, "total_time"),
+        "tokens_per_sec": _mean(records, "tokens_per_sec"),
+        "judged": len(judged),
+        "judge_cached": sum(bool(r.get("cached")) for r in judged),
+        "judge_unparsed": sum(not r["parsed"] for r in judged),
+        "hallucination_rate": (sum(r["hallucination"] for r in flagged) / len(flagged)) if flagged else None,
+    }
+    for name in SCORE_FIELDS:
+        summary[name] = _mean(judged, name)
+    return summary
+
+
+def evaluate(cases: list[EvalCase] = None, pipeline=None, judge: Judge = None, run_judge: bool = True,
+             concurrency: int = None) -> dict:
+    """
+    Run the evaluation concurrently.
+
+    Args:
+        cases: Questions to evaluate (defaults to ``DEFAULT_CASES``)
+        pipeline: RAGPipeline to evaluate (defaults to temperature 0, no answer cache)
+        judge: Judge to score answers (defaults to one from config)
+        run_judge: Set False for retrieval and latency metrics only
+        concurrency: Cases in flight (defaults to ``EVAL_CONCURRENCY``, else
+            ``OLLAMA_MAX_IN_FLIGHT`` so generations do not wait in the queue)
+
+    Returns:
+        Dict with ``summary`` (aggregate metrics), ``records`` (one per case,
+        in input order) and ``seconds``
+    """
+    if pipeline is None:
+        from src.rag.pipeline import RAGPipeline
+        pipeline = RAGPipeline(temperature=0.0, use_answer_cache=False)
+    if run_judge and judge is None:
+        judge = Judge()
+    cases = cases or DEFAULT_CASES
+    concurrency = concurrency or config.evaluation.concurrency or max(config.ollama.max_in_flight, 1)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rag-eval") as pool:
+        records = list(pool.map(lambda case: evaluate_case(pipeline, judge if run_judge else None, case),
+                                cases))
+    return {"summary": summarize(records), "records": records, "seconds": time.time() - start}
+
+
+def format_report(summary: dict) -> str:
+    """Markdown table in the README's format."""
+    def fmt(value, spec):
+        return "n/a" if value is None else format(value, spec)
+
+    rows = [
+        ("Retrieval Keyword Precision", fmt(summary["keyword_precision"], ".1%")),
+        ("Avg Similarity Score", fmt(summary["avg_similarity"], ".4f")),
+        ("Retrieval Time", f"{fmt(summary['retrieval_ms'], '.1f')}ms"),
+        ("Faithfulness", f"{fmt(summary['faithfulness'], '.2f')}/5"),
+        ("Relevance", f"{fmt(summary['relevance'], '.2f')}/5"),
+        ("Completeness", f"{fmt(summary['completeness'], '.2f')}/5"),
+        ("Hallucination Rate", fmt(summary["hallucination_rate"], ".0%")),
+        ("Product Diversity", fmt(summary["product_diversity"], ".1%")),
+        ("Avg End-to-End Latency", f"{fmt(summary['latency_s'], '.2f')}s"),
+        ("Tokens/sec", fmt(summary["tokens_per_sec"], ".1f")),
+    ]
+    lines = ["| Metric | Score |", "|--------|-------|"]
+    lines += [f"| **{name}** | {value} |" for name, value in rows]
+    if summary.get("judge_unparsed"):
+        lines.append(f"\n⚠️ {summary['judge_unparsed']}/{summary['judged']} judge replies could not be "
+                     f"fully parsed; their missing fields are left out of the scores above.")
+    return "\n".join(lines)
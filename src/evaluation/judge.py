@@ -0,0 +1,162 @@
+"""
+LLM-as-judge scoring with an on-disk verdict cache.
+
+The judge answers ``build_eval_prompt`` with faithfulness, relevance and
+completeness scores (1-5) and a hallucination flag. Verdicts are cached in
+a JSONL file keyed by hashes of the query, the context shown to the judge
+and the answer, plus the judge model and prompt version. A rerun after a
+retrieval-only change therefore calls the judge only for answers whose
+context or text actually changed.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from src.llm.ollama_client import OllamaClient, get_ollama_client
+from src.llm.prompts import build_eval_prompt
+from src.llm.scheduler import PRIORITY_BATCH
+from src.utils.config import config
+
+# Bump when build_eval_prompt or the parsing below changes, so old verdicts are not reused
+JUDGE_PROMPT_VERSION = "eval-v1"
+
+SCORE_FIELDS = ("faithfulness", "relevance", "completeness")
+
+# Models often echo the prompt's markdown ("**Faithfulness**: 5", "**Hallucination:** no"),
+# so bold markers are allowed on either side of the separator
+_SCORE = {name: re.compile(rf"{name}\**\s*[:=]\s*\**\s*([1-5])", re.IGNORECASE) for name in SCORE_FIELDS}
+_HALLUCINATION = re.compile(r"hallucination\**\s*[:=]\s*\**\s*(yes|no)", re.IGNORECASE)
+_REASONING = re.compile(r"reasoning\**\s*[:=]\s*\**\s*(.*)", re.IGNORECASE | re.DOTALL)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def context_summary(contexts: list[dict]) -> str:
+    """The retrieved reviews as the judge sees them."""
+    return "\n".join(
+        f"[{i}] ({ctx['score']}/5) {ctx['summary']}: {ctx['review_text']}"
+        for i, ctx in enumerate(contexts, 1)
+    )
+
+
+def parse_verdict(text: str) -> dict:
+    """
+    Parse the judge's reply.
+
+    Returns:
+        Dict with faithfulness/relevance/completeness (int or None),
+        hallucination (bool or None), reasoning and ``parsed`` (True when
+        every field was found)
+    """
+    verdict = {}
+    for name, pattern in _SCORE.items():
+        match = pattern.search(text)
+        verdict[name] = int(match.group(1)) if match else None
+    match = _HALLUCINATION.search(text)
+    verdict["hallucination"] = match.group(1).lower() == "yes" if match else None
+    match = _REASONING.search(text)
+    verdict["reasoning"] = match.group(1).strip() if match else ""
+    verdict["parsed"] = all(verdict[name] is not None for name in (*SCORE_FIELDS, "hallucination"))
+    return verdict
+
+
+class JudgeCache:
+    """Append-only JSONL cache of judge verdicts, loaded into memory on open."""
+
+    def __init__(self, path: str = None):
+        self.path = config.evaluation.judge_cache_path if path is None else path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def key(model: str, query: str, context: str, answer: str) -> str:
+        return "|".join((model, JUDGE_PROMPT_VERSION, _digest(query), _digest(context), _digest(answer)))
+
+    def load(self) -> int:
+        """Read verdicts written by earlier runs; returns the count loaded."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                self._entries[entry["key"]] = entry["verdict"]
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(verdict)
+
+    def put(self, key: str, verdict: dict):
+        with self._lock:
+            self._entries[key] = verdict
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "verdict": verdict}) + "\n")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class Judge:
+    """Scores answers with an Ollama model through ``build_eval_prompt``."""
+
+    def __init__(self, model: str = None, cache: JudgeCache = None, use_cache: bool = True):
+        """
+        Args:
+            model: Judge model (defaults to ``EVAL_JUDGE_MODEL``, else the generation model)
+            cache: Verdict cache (defaults to one at ``EVAL_JUDGE_CACHE_PATH``)
+            use_cache: Set False to always call the judge
+        """
+        self.model = model or config.evaluation.judge_model or config.ollama.model
+        if self.model == config.ollama.model:
+            self.llm = get_ollama_client()
+        else:
+            self.llm = OllamaClient()
+            self.llm.model = self.model
+        self.cache = (cache or JudgeCache()) if use_cache else None
+
+    def judge(self, query: str, contexts: list[dict], answer: str) -> dict:
+        """
+        Score one answer against the reviews it was generated from.
+
+        Returns:
+            Verdict dict (see ``parse_verdict``) plus ``cached`` and ``judge_time``
+        """
+        context = context_summary(contexts)
+        key = JudgeCache.key(self.model, query, context, answer)
+        if self.cache is not None:
+            verdict = self.cache.get(key)
+            if verdict is not None:
+                return {**verdict, "cached": True, "judge_time": 0.0}
+
+        start = time.time()
+        reply = self.llm.generate(build_eval_prompt(query, context, answer), temperature=0.0,
+                                  priority=PRIORITY_BATCH)
+        verdict = parse_verdict(reply)
+        judge_time = time.time() - start
+        if self.cache is not None and verdict["parsed"]:
+            self.cache.put(key, verdict)
+        return {**verdict, "cached": False, "judge_time": judge_time}
@@ -0,0 +1,94 @@
+"""
+Prompt token budgeting.
+
+Counts tokens with the generation model's own tokenizer (``OLLAMA_TOKENIZER``,
+loaded through ``transformers`` from a local path or the HF cache only; it is
+never downloaded while serving a request). If no tokenizer is configured or
+it is not available locally, a conservative characters-per-token estimate is
+used instead. The prompt
+budget is ``num_ctx`` minus the tokens reserved for the answer, so a packed
+prompt never makes Ollama truncate the context.
+"""
+
+import math
+import re
+from src.utils.config import config
+
+# Fallback estimate: English averages ~4 characters per token; 3 over-counts
+# on purpose so the budget is never exceeded
+CHARS_PER_TOKEN = 3.0
+
+# Slack for tokens that differ between counting parts and counting the whole
+SAFETY_MARGIN = 32
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class TokenCounter:
+    """Counts and truncates text in model tokens."""
+
+    def __init__(self, tokenizer_name: str = None):
+        self.tokenizer_name = config.ollama.tokenizer if tokenizer_name is None else tokenizer_name
+        self.tokenizer = None
+        if self.tokenizer_name:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name, local_files_only=True)
+            except Exception as e:
+                print(f"⚠️ Tokenizer {self.tokenizer_name} unavailable ({e}); estimating tokens from characters")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Hard cut to at most ``max_tokens`` tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer is not None:
+            ids = self.tokenizer.encode(text, add_special_tokens=False)
+            return text if len(ids) <= max_tokens else self.tokenizer.decode(ids[:max_tokens])
+        return text[:int(max_tokens * CHARS_PER_TOKEN)]
+
+
+def trim_to_tokens(text: str, max_tokens: int, counter: TokenCounter) -> str:
+    """
+    Shorten ``text`` to ``max_tokens`` at a sentence boundary.
+
+    Whole sentences are kept while they fit. If even the first sentence is
+    too long, it is cut mid-sentence. An ellipsis marks any trimmed text.
+    """
+    if counter.count(text) <= max_tokens:
+        return text
+
+    kept, used = [], 0
+    for sentence in _SENTENCE_END.split(text):
+        cost = counter.count(sentence) + 1
+        if used + cost > max_tokens - 1:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept) + " …"
+    return counter.truncate(text, max_tokens - 1).rstrip() + "…"
+
+
+def prompt_token_budget() -> int:
+    """Tokens available to the prompt: context window minus the reserved answer length."""
+    ollama = config.ollama
+    return max(ollama.num_ctx - ollama.num_predict - SAFETY_MARGIN, 0)
+
+
+# Singleton instance
+_counter = None
+
+
+def get_token_counter() -> TokenCounter:
+    """Get or create the singleton TokenCounter."""
+    global _counter
+    if _counter is None:
+        _counter = TokenCounter()
+    return _counter
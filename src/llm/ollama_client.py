@@ -1,11 +1,83 @@
 """
 Ollama API client for interacting with the local LLM.
+
+All synchronous calls share one ``requests.Session`` whose connection pool
+keeps TCP connections to Ollama alive between requests
+(``OLLAMA_POOL_SIZE``). ``agenerate_stream`` / ``agenerate`` are asyncio
+versions built on an ``httpx.AsyncClient`` (one per event loop). Streaming
+responses are parsed from raw byte chunks as NDJSON. Closing a stream early
+closes its HTTP response, so Ollama stops generating and frees the slot.
+That happens when the consumer stops iterating, when the generator is
+closed, or when its task is cancelled.
+
+Generations are admitted through the shared ``GenerationScheduler`` (see
+``src.llm.scheduler``) unless ``OLLAMA_MAX_IN_FLIGHT`` is 0. A caller that
+already holds a ``Ticket``, e.g. to show its queue position, passes it in.
+The ticket is released when the generation ends.
+
+Each request renews Ollama's ``keep_alive``, and the client tracks when the
+model will be unloaded. Under steady traffic it stays resident. After an
+idle gap, ``warm_up`` (or ``warm_up_background`` / ``awarm_up``) loads it
+again, so the load overlaps retrieval instead of delaying the first token.
 """
 
-import requests
+import asyncio
 import json
+import math
+import re
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from src.llm.scheduler import PRIORITY_INTERACTIVE, Ticket, get_generation_scheduler
 from src.utils.config import config
 
+CONNECT_ERROR = "❌ Error: Cannot connect to Ollama. Run: ollama serve"
+
+
+_DURATION_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+
+def keep_alive_seconds(value) -> float:
+    """Seconds a ``keep_alive`` value keeps the model loaded ("30m", "1h30m", 300; negative = forever)."""
+    text = str(value).strip()
+    try:
+        seconds = float(text)
+    except ValueError:
+        parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", text)
+        seconds = sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+        if text.startswith("-"):
+            seconds = -seconds
+    return math.inf if seconds < 0 else seconds
+
+
+def generation_stats(data: dict) -> dict:
+    """Token counts and server-side timings (seconds) from Ollama's final response object."""
+    eval_seconds = data.get("eval_duration", 0) / 1e9
+    return {
+        "prompt_eval_count": data.get("prompt_eval_count", 0),
+        "prompt_eval_seconds": data.get("prompt_eval_duration", 0) / 1e9,
+        "eval_count": data.get("eval_count", 0),
+        "eval_seconds": eval_seconds,
+        "load_seconds": data.get("load_duration", 0) / 1e9,
+        # Decode rate only: excludes queueing, model load and prompt prefill
+        "tokens_per_sec": data.get("eval_count", 0) / eval_seconds if eval_seconds else None,
+    }
+
+
+class NDJSONDecoder:
+    """Incremental NDJSON parser: feed raw byte chunks, get back the complete objects."""
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        # json.loads takes bytes directly; no str decoding of each line
+        return [json.loads(line) for line in lines if line.strip()]
+
 
 class OllamaClient:
     """Client for the Ollama API."""
@@ -13,81 +85,271 @@ class OllamaClient:
     def __init__(self):
         self.base_url = config.ollama.host
         self.model = config.ollama.model
+        self.timeout = (config.ollama.connect_timeout, config.ollama.timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.ollama.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # httpx clients are bound to the event loop that created them
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.scheduler = get_generation_scheduler() if config.ollama.max_in_flight > 0 else None
+        # Monotonic time until which the model is known to be loaded
+        self.loaded_until = 0.0
+        self._warmer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ollama-warmup")
 
     def is_available(self) -> bool:
         """Check if Ollama is running and the model is loaded."""
-        try:
-            r = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            models = [m["name"] for m in r.json().get("models", [])]
-            return self.model in models
-        except Exception:
-            return False
+        return self.model in self.get_models()
 
     def get_models(self) -> list[str]:
         """List available models."""
         try:
-            r = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            r = self.session.get(f"{self.base_url}/api/tags", timeout=config.ollama.connect_timeout)
             return [m["name"] for m in r.json().get("models", [])]
         except Exception:
             return []
 
-    def generate(self, prompt: str, temperature: float = 0.3) -> str:
-        """Generate a response (non-streaming)."""
+    def _touch(self):
+        """The model was just used: Ollama keeps it loaded for ``keep_alive`` from now."""
+        self.loaded_until = time.monotonic() + keep_alive_seconds(config.ollama.keep_alive)
+
+    def is_warm(self, margin: float = 5.0) -> bool:
+        """True if the model is known to stay loaded for at least ``margin`` more seconds."""
+        return time.monotonic() + margin < self.loaded_until
+
+    def _warm_up_payload(self) -> dict:
+        # No prompt: Ollama only loads the model. num_ctx must match generation
+        # requests, or the next generation would reload the model.
+        return {
+            "model": self.model,
+            "keep_alive": config.ollama.keep_alive,
+            "options": {"num_ctx": config.ollama.num_ctx},
+        }
+
+    def warm_up(self) -> float:
+        """
+        Load the model (renewing its ``keep_alive``) unless it is known to be resident.
+
+        Returns:
+            Seconds spent (0 when skipped or failed; generation reports errors)
+        """
+        if self.is_warm():
+            return 0.0
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json=self._warm_up_payload(),
+                                         timeout=self.timeout)
+            response.raise_for_status()
+            self._touch()
+        except Exception:
+            return 0.0
+        return time.perf_counter() - start
+
+    def warm_up_background(self) -> Future:
+        """Run ``warm_up`` on a background thread; the future resolves to its duration."""
+        if self.is_warm():
+            future = Future()
+            future.set_result(0.0)
+            return future
+        return self._warmer.submit(self.warm_up)
+
+    async def awarm_up(self) -> float:
+        """Asyncio version of ``warm_up``."""
+        if self.is_warm():
+            return 0.0
+        start = time.perf_counter()
+        try:
+            response = await self._async_client().post(f"{self.base_url}/api/generate",
+                                                       json=self._warm_up_payload())
+            response.raise_for_status()
+            self._touch()
+        except Exception:
+            return 0.0
+        return time.perf_counter() - start
+
+    def _payload(self, prompt: str, temperature: float, stream: bool, context: list = None) -> dict:
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
+            "keep_alive": config.ollama.keep_alive,
             "options": {
                 "temperature": temperature,
-                "num_ctx": 4096,
+                "num_ctx": config.ollama.num_ctx,
+                "num_predict": config.ollama.num_predict,
                 "top_p": 0.9,
             }
         }
+        if context is not None:
+            # Token state of an earlier response: only the new prompt is prefilled
+            payload["context"] = context
+        return payload
+
+    def _admit(self, ticket: Ticket, priority: int) -> Ticket:
+        if self.scheduler is None:
+            return ticket
+        return self.scheduler.acquire(ticket, priority)
+
+    async def _aadmit(self, ticket: Ticket, priority: int) -> Ticket:
+        if self.scheduler is None:
+            return ticket
+        return await self.scheduler.aacquire(ticket, priority)
+
+    def generate(self, prompt: str, temperature: float = 0.3, context: list = None,
+                 on_done=None, priority: int = PRIORITY_INTERACTIVE, ticket: Ticket = None) -> str:
+        """
+        Generate a response (non-streaming).
+
+        Args:
+            prompt: Prompt text (appended to ``context`` when given)
+            temperature: Sampling temperature
+            context: ``context`` returned by a previous response, to continue it
+            on_done: Called with the final response object (``context``,
+                ``prompt_eval_count``, timings)
+            priority: Scheduler priority (lower runs first)
+            ticket: Scheduler ticket already taken by the caller
+        """
+        payload = self._payload(prompt, temperature, stream=False, context=context)
 
         try:
-            response = requests.post(
+            ticket = self._admit(ticket, priority)
+            response = self.session.post(
                 f"{self.base_url}/api/generate",
                 json=payload,
-                timeout=120,
+                timeout=self.timeout,
             )
-            return response.json().get("response", "")
+            data = response.json()
+            self._touch()
+            if on_done is not None:
+                on_done(data)
+            return data.get("response", "")
         except requests.exceptions.ConnectionError:
-            return "❌ Error: Cannot connect to Ollama. Run: ollama serve"
+            return CONNECT_ERROR
         except Exception as e:
             return f"❌ Error: {str(e)}"
+        finally:
+            if ticket is not None:
+                ticket.release()
 
-    def generate_stream(self, prompt: str, temperature: float = 0.3):
-        """Generate a response with streaming (yields tokens)."""
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": True,
-            "options": {
-                "temperature": temperature,
-                "num_ctx": 4096,
-                "top_p": 0.9,
-            }
-        }
+    def generate_stream(self, prompt: str, temperature: float = 0.3, context: list = None,
+                        on_done=None, priority: int = PRIORITY_INTERACTIVE, ticket: Ticket = None):
+        """
+        Generate a response with streaming (yields tokens; see ``generate`` for the extras).
+
+        Closing the generator before it finishes closes the response, which
+        cancels the generation on the server.
+        """
+        payload = self._payload(prompt, temperature, stream=True, context=context)
 
         try:
-            response = requests.post(
+            ticket = self._admit(ticket, priority)
+            with self.session.post(
                 f"{self.base_url}/api/generate",
                 json=payload,
                 stream=True,
-                timeout=120,
-            )
-            for line in response.iter_lines():
-                if line:
-                    data = json.loads(line)
-                    token = data.get("response", "")
-                    if token:
-                        yield token
-                    if data.get("done", False):
-                        break
+                timeout=self.timeout,
+            ) as response:
+                decoder = NDJSONDecoder()
+                for chunk in response.iter_content(chunk_size=None):
+                    for data in decoder.feed(chunk):
+                        token = data.get("response", "")
+                        if token:
+                            yield token
+                        if data.get("done", False):
+                            self._touch()
+                            if on_done is not None:
+                                on_done(data)
+                            return
         except requests.exceptions.ConnectionError:
-            yield "❌ Error: Cannot connect to Ollama. Run: ollama serve"
+            yield CONNECT_ERROR
         except Exception as e:
             yield f"❌ Error: {str(e)}"
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+    def _async_client(self):
+        """Return the httpx client for the running event loop, creating it on first use."""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            ollama = config.ollama
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=ollama.pool_size,
+                                    max_keepalive_connections=ollama.pool_size),
+                timeout=httpx.Timeout(ollama.timeout, connect=ollama.connect_timeout),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def agenerate(self, prompt: str, temperature: float = 0.3, context: list = None,
+                        on_done=None, priority: int = PRIORITY_INTERACTIVE, ticket: Ticket = None) -> str:
+        """Asyncio version of ``generate``."""
+        import httpx
+
+        payload = self._payload(prompt, temperature, stream=False, context=context)
+        try:
+            ticket = await self._aadmit(ticket, priority)
+            response = await self._async_client().post(f"{self.base_url}/api/generate", json=payload)
+            data = response.json()
+            self._touch()
+            if on_done is not None:
+                on_done(data)
+            return data.get("response", "")
+        except httpx.ConnectError:
+            return CONNECT_ERROR
+        except Exception as e:
+            return f"❌ Error: {str(e)}"
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+    async def agenerate_stream(self, prompt: str, temperature: float = 0.3, context: list = None,
+                               on_done=None, priority: int = PRIORITY_INTERACTIVE, ticket: Ticket = None):
+        """
+        Asyncio version of ``generate_stream`` (an async generator of tokens).
+
+        Cancelling the consuming task or calling ``aclose()`` on the generator
+        closes the response, which cancels the generation on the server.
+        """
+        import httpx
+
+        payload = self._payload(prompt, temperature, stream=True, context=context)
+        try:
+            ticket = await self._aadmit(ticket, priority)
+            client = self._async_client()
+            async with client.stream("POST", f"{self.base_url}/api/generate", json=payload) as response:
+                decoder = NDJSONDecoder()
+                async for chunk in response.aiter_bytes():
+                    for data in decoder.feed(chunk):
+                        token = data.get("response", "")
+                        if token:
+                            yield token
+                        if data.get("done", False):
+                            self._touch()
+                            if on_done is not None:
+                                on_done(data)
+                            return
+        except httpx.ConnectError:
+            yield CONNECT_ERROR
+        except Exception as e:
+            yield f"❌ Error: {str(e)}"
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+    async def aclose(self):
+        """Close the httpx client belonging to the running event loop."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Close the pooled synchronous connections."""
+        self.session.close()
 
 
 # Singleton instance
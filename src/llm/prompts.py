@@ -2,22 +2,36 @@
 Prompt templates for the RAG pipeline.
 """
 
-
-def build_rag_prompt(query: str, contexts: list[dict], chat_history: list = None) -> str:
-    """
-    Build a RAG prompt that instructs the LLM to answer from retrieved context only.
-
-    Args:
-        query: User's question
-        contexts: List of retrieved review dicts
-        chat_history: Optional list of [user_msg, bot_msg] pairs
-    """
-    context_text = ""
-    for i, ctx in enumerate(contexts, 1):
-        review_text = ctx.get("review_text", "")[:500]
-        context_text += f"""
+from dataclasses import dataclass
+from src.llm.budget import TokenCounter, get_token_counter, prompt_token_budget, trim_to_tokens
+from src.utils.config import config
+
+# Bump whenever the RAG prompt template changes; cached answers built with
+# another version are never reused.
+RAG_PROMPT_VERSION = "rag-v3"
+
+# A review trimmed below this many tokens isn't worth its header
+MIN_REVIEW_TOKENS = 24
+
+
+@dataclass
+class PackedPrompt:
+    """A RAG prompt packed into the token budget, with what went into it."""
+    prompt: str
+    tokens: int
+    budget: int
+    contexts_used: int
+    contexts_trimmed: int
+    history_turns: int
+    history_dropped: int
+
+
+def _context_block(i: int, ctx: dict, review_text: str) -> str:
+    # Verbatim duplicates are collapsed into one context listing all their products
+    product_ids = ctx.get("product_ids") or [ctx.get("product_id", "N/A")]
+    return f"""
 --- Review {i} ---
-Product ID: {ctx.get('product_id', 'N/A')}
+Product ID{'s' if len(product_ids) > 1 else ''}: {', '.join(product_ids)}
 Rating: {ctx.get('score', 'N/A')}/5
 Helpfulness: {ctx.get('helpfulness_num', 0)}/{ctx.get('helpfulness_den', 0)}
 Summary: {ctx.get('summary', 'N/A')}
@@ -25,13 +39,14 @@ Review: {review_text}
 Similarity Score: {ctx.get('similarity', 0):.4f}
 """
 
-    history_text = ""
-    if chat_history and len(chat_history) > 0:
-        recent = chat_history[-3:]
-        for user_msg, bot_msg in recent:
-            history_text += f"\nUser: {user_msg}\nAssistant: {bot_msg}\n"
 
-    prompt = f"""You are a helpful food product review assistant. You answer questions ONLY based on the provided customer reviews from an Amazon food product database.
+def _history_text(turns: list) -> str:
+    return "".join(f"\nUser: {user_msg}\nAssistant: {bot_msg}\n" for user_msg, bot_msg in turns)
+
+
+# Static rules open every prompt byte-for-byte identically, so Ollama can
+# reuse their KV cache across requests
+RAG_SYSTEM_RULES = """You are a helpful food product review assistant. You answer questions ONLY based on the provided customer reviews from an Amazon food product database.
 
 STRICT RULES:
 - ONLY use information explicitly stated in the reviews below
@@ -41,18 +56,161 @@ STRICT RULES:
 - Include ratings when relevant
 - Present both perspectives if reviews conflict
 - Be concise but thorough
-{f"Previous conversation:{history_text}" if history_text else ""}
+"""
 
-Here are the relevant customer reviews retrieved from the database:
-{context_text}
 
+def _question(query: str) -> str:
+    return f"""
 Based ONLY on the reviews above, answer this question:
 
 Question: {query}
 
 Answer:"""
 
-    return prompt
+
+def _render(query: str, context_text: str, history_text: str) -> str:
+    return f"""{RAG_SYSTEM_RULES}{f"Previous conversation:{history_text}" if history_text else ""}
+
+Here are the relevant customer reviews retrieved from the database:
+{context_text}
+{_question(query)}"""
+
+
+def _render_followup(query: str, context_text: str) -> str:
+    """A later turn of a chat session: appended after the previous prompt and answer."""
+    if not context_text:
+        return _question(query).lstrip("\n")
+    return f"""More customer reviews retrieved for the next question (earlier reviews still apply):
+{context_text}
+{_question(query)}"""
+
+
+def _pack_blocks(contexts: list[dict], first_index: int, used: int, max_tokens: int,
+                 counter: TokenCounter) -> tuple[list[str], int, int]:
+    """
+    Add review blocks in relevance order while they fit the budget.
+
+    Returns:
+        (blocks, tokens used including ``used``, number of trimmed reviews)
+    """
+    blocks, trimmed = [], 0
+    for ctx in contexts:
+        i = first_index + len(blocks)
+        review_text = trim_to_tokens(ctx.get("review_text") or "", config.rag.review_max_tokens, counter)
+        block = _context_block(i, ctx, review_text)
+        cost = counter.count(block)
+        if used + cost > max_tokens:
+            room = max_tokens - used - counter.count(_context_block(i, ctx, ""))
+            if room < MIN_REVIEW_TOKENS:
+                break
+            block = _context_block(i, ctx, trim_to_tokens(review_text, room, counter))
+            cost = counter.count(block)
+            if used + cost > max_tokens:
+                break
+            trimmed += 1
+        blocks.append(block)
+        used += cost
+    return blocks, used, trimmed
+
+
+def pack_rag_prompt(query: str, contexts: list[dict], chat_history: list = None,
+                    max_tokens: int = None, counter: TokenCounter = None) -> PackedPrompt:
+    """
+    Build a RAG prompt that fits the model's context window.
+
+    Reviews are added in relevance order, each capped at
+    ``RAG_REVIEW_MAX_TOKENS`` and trimmed at sentence boundaries; the last one
+    that only partly fits is trimmed to the space left. History keeps the
+    most recent ``RAG_HISTORY_TURNS`` turns with past answers shortened, and
+    the oldest turns are dropped first whenever they would crowd out the
+    best review.
+
+    Args:
+        query: User's question
+        contexts: Retrieved review dicts, most relevant first
+        chat_history: Optional list of [user_msg, bot_msg] pairs
+        max_tokens: Prompt token budget (defaults to ``prompt_token_budget()``)
+        counter: Token counter (defaults to the shared one)
+    """
+    rag = config.rag
+    counter = counter or get_token_counter()
+    max_tokens = prompt_token_budget() if max_tokens is None else max_tokens
+
+    history = list(chat_history or [])[-rag.history_turns:] if rag.history_turns > 0 else []
+    turns = [(user_msg, trim_to_tokens(bot_msg or "", rag.history_turn_tokens, counter))
+             for user_msg, bot_msg in history]
+    history_dropped = len(chat_history or []) - len(turns)
+
+    used = counter.count(_render(query, "", ""))
+    reserve = 0
+    if contexts:
+        best = trim_to_tokens(contexts[0].get("review_text") or "", rag.review_max_tokens, counter)
+        reserve = counter.count(_context_block(1, contexts[0], best))
+    while turns and used + counter.count(f"Previous conversation:{_history_text(turns)}") + reserve > max_tokens:
+        turns.pop(0)
+        history_dropped += 1
+    history_text = _history_text(turns)
+    if turns:
+        used += counter.count(f"Previous conversation:{history_text}")
+
+    blocks, used, trimmed = _pack_blocks(contexts, 1, used, max_tokens, counter)
+
+    prompt = _render(query, "".join(blocks), history_text)
+    return PackedPrompt(
+        prompt=prompt,
+        tokens=counter.count(prompt),
+        budget=max_tokens,
+        contexts_used=len(blocks),
+        contexts_trimmed=trimmed,
+        history_turns=len(turns),
+        history_dropped=history_dropped,
+    )
+
+
+def pack_session_turn(query: str, contexts: list[dict], first_index: int, opening: bool,
+                      max_tokens: int, counter: TokenCounter = None) -> PackedPrompt:
+    """
+    Prompt for one turn of a chat session (see ``rag.session.ChatSession``).
+
+    The opening turn is the regular layout without history. Later turns only
+    add the reviews not shown yet, numbered on from ``first_index``, and the
+    question. Ollama appends them to the session's token ``context``, so the
+    earlier prompt and answers form an unchanged prefix.
+
+    Args:
+        query: User's question
+        contexts: Reviews not yet shown in this session, most relevant first
+        first_index: Number of the first new review
+        opening: Whether this is the session's first turn
+        max_tokens: Tokens available for this turn's prompt
+        counter: Token counter (defaults to the shared one)
+    """
+    counter = counter or get_token_counter()
+    render = (lambda text: _render(query, text, "")) if opening else (lambda text: _render_followup(query, text))
+    # Count the frame with some review text: a follow-up only adds its header when reviews are shown
+    blocks, _, trimmed = _pack_blocks(contexts, first_index, counter.count(render(" ")), max_tokens, counter)
+    prompt = render("".join(blocks))
+    return PackedPrompt(
+        prompt=prompt,
+        tokens=counter.count(prompt),
+        budget=max_tokens,
+        contexts_used=len(blocks),
+        contexts_trimmed=trimmed,
+        history_turns=0,
+        history_dropped=0,
+    )
+
+
+def build_rag_prompt(query: str, contexts: list[dict], chat_history: list = None) -> str:
+    """
+    Build a RAG prompt that instructs the LLM to answer from retrieved context only.
+
+    Args:
+        query: User's question
+        contexts: List of retrieved review dicts
+        chat_history: Optional list of [user_msg, bot_msg] pairs
+    """
+    return pack_rag_prompt(query, contexts, chat_history).prompt
 
 
 def build_eval_prompt(query: str, context_summary: str, answer: str) -> str:
@@ -0,0 +1,218 @@
+"""
+Admission control for Ollama generations.
+
+A local Ollama server only runs a few generations in parallel
+(``OLLAMA_NUM_PARALLEL``). Extra requests queue inside the server, where
+they time out and slow everyone down together. ``GenerationScheduler`` sits
+in front of ``OllamaClient``:
+
+- at most ``max_in_flight`` generations run at once;
+- the rest wait in a priority queue (FIFO within a priority);
+- an interactive request is shed immediately when ``max_queue`` interactive
+  requests are already waiting, or after ``queue_timeout`` seconds in the
+  queue. Batch-priority requests (``PRIORITY_BATCH`` and above) are never
+  shed; their callers bound them with their own worker pools;
+- queue waits are recorded for ``stats()``.
+
+A ``Ticket`` is a caller's place in the queue. It can be waited on from
+threads (``wait``) or coroutines (``wait_async``) and reports its current
+``position`` so a UI can show it. ``release()`` frees the slot (or leaves
+the queue) and is safe to call twice.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import numpy as np
+from src.utils.config import config
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class SchedulerBusy(RuntimeError):
+    """A generation was shed: the queue is full or the wait timed out."""
+
+
+class Ticket:
+    """One generation's claim on a scheduler slot."""
+
+    def __init__(self, scheduler: "GenerationScheduler", priority: int, seq: int):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.perf_counter()
+        self.wait_seconds = None
+        self.released = False
+        # Batch work waits as long as it takes instead of being shed
+        self.sheddable = priority < PRIORITY_BATCH
+        self._granted = Future()
+
+    def __lt__(self, other: "Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def granted(self) -> bool:
+        return self._granted.done()
+
+    @property
+    def position(self) -> int:
+        """1-based place in the queue (0 once the generation may run)."""
+        return self.scheduler._position(self)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the slot is granted; False if ``timeout`` passes first."""
+        try:
+            self._granted.result(timeout=timeout)
+            return True
+        except FutureTimeout:
+            # The slot may have been granted just as the wait timed out
+            return self.granted
+
+    async def wait_async(self, timeout: float = None) -> bool:
+        """Asyncio version of ``wait``."""
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self._granted)), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self.granted
+
+    def release(self):
+        """Free the slot, or leave the queue if not admitted yet."""
+        self.scheduler._release(self)
+
+
+class GenerationScheduler:
+    """Bounded concurrency, a fair queue and load shedding for LLM generations."""
+
+    def __init__(self, max_in_flight: int = None, max_queue: int = None, queue_timeout: float = None):
+        """
+        Args:
+            max_in_flight: Generations allowed to run at once
+            max_queue: Waiting interactive generations before new ones are rejected
+            queue_timeout: Seconds an interactive generation may wait before it is shed (0 = no limit)
+        """
+        ollama = config.ollama
+        self.max_in_flight = max(max_in_flight or ollama.max_in_flight, 1)
+        self.max_queue = ollama.max_queue if max_queue is None else max_queue
+        self.queue_timeout = ollama.queue_timeout if queue_timeout is None else queue_timeout
+
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._waits = deque(maxlen=1000)
+
+        self.admitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.abandoned = 0
+
+    def enqueue(self, priority: int = PRIORITY_INTERACTIVE) -> Ticket:
+        """
+        Take a place in the queue (lower ``priority`` runs first).
+
+        Raises:
+            SchedulerBusy: an interactive request found ``max_queue`` interactive
+                requests already waiting
+        """
+        with self._lock:
+            ticket = Ticket(self, priority, next(self._seq))
+            if self._in_flight < self.max_in_flight:
+                self._grant(ticket)
+            elif ticket.sheddable and sum(t.sheddable for t in self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerBusy(f"Ollama is busy ({self._in_flight} running, "
+                                    f"{len(self._queue)} queued); try again shortly")
+            else:
+                heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def acquire(self, ticket: Ticket = None, priority: int = PRIORITY_INTERACTIVE) -> Ticket:
+        """Wait until ``ticket`` (a new one if None) may run; release it when done."""
+        ticket = ticket or self.enqueue(priority)
+        if not ticket.wait(self._timeout(ticket)):
+            self._shed(ticket)
+        return ticket
+
+    async def aacquire(self, ticket: Ticket = None, priority: int = PRIORITY_INTERACTIVE) -> Ticket:
+        """Asyncio version of ``acquire``."""
+        ticket = ticket or self.enqueue(priority)
+        try:
+            granted = await ticket.wait_async(self._timeout(ticket))
+        except asyncio.CancelledError:
+            ticket.release()
+            raise
+        if not granted:
+            self._shed(ticket)
+        return ticket
+
+    def _timeout(self, ticket: Ticket):
+        return (self.queue_timeout or None) if ticket.sheddable else None
+
+    def _shed(self, ticket: Ticket):
+        ticket.release()
+        raise SchedulerBusy(f"Waited {self.queue_timeout:.0f}s in the Ollama queue; try again shortly")
+
+    def _grant(self, ticket: Ticket):
+        # Caller holds the lock
+        self._in_flight += 1
+        self.admitted += 1
+        ticket.wait_seconds = time.perf_counter() - ticket.enqueued_at
+        self._waits.append(ticket.wait_seconds)
+        ticket._granted.set_result(True)
+
+    def _release(self, ticket: Ticket):
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                self._in_flight -= 1
+                self.completed += 1
+            else:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self.abandoned += 1
+            while self._in_flight < self.max_in_flight and self._queue:
+                self._grant(heapq.heappop(self._queue))
+
+    def _position(self, ticket: Ticket) -> int:
+        with self._lock:
+            if ticket.granted or ticket.released:
+                return 0
+            return 1 + sum(other < ticket for other in self._queue)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = np.array(self._waits) * 1000
+            in_flight, queued = self._in_flight, len(self._queue)
+        return {
+            "in_flight": in_flight,
+            "queued": queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+            "wait_ms_mean": float(waits.mean()) if len(waits) else 0.0,
+            "wait_ms_p50": float(np.percentile(waits, 50)) if len(waits) else 0.0,
+            "wait_ms_p95": float(np.percentile(waits, 95)) if len(waits) else 0.0,
+        }
+
+
+# Singleton instance
+_scheduler = None
+
+
+def get_generation_scheduler() -> GenerationScheduler:
+    """Get or create the shared GenerationScheduler configured from .env."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = GenerationScheduler()
+    return _scheduler
@@ -0,0 +1,87 @@
+"""
+Offline bulk answering: a file of questions in, a JSONL file of answers out.
+
+Questions are read from a text file (one per line) or a JSONL file (a
+``query`` field per line). Answers come from ``RAGPipeline.query_batch`` and
+are written as JSONL in completion order, one line per question. Each line
+holds the question's ``index`` in the input, its sources and per-stage
+timings.
+"""
+
+import json
+import time
+from pathlib import Path
+from src.database.filters import ReviewFilter
+
+
+def read_queries(path: str) -> list[str]:
+    """Questions from a text file (one per line) or JSONL (``query`` field); blank lines skipped."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            queries.append(json.loads(line)["query"] if line.startswith("{") else line)
+    return queries
+
+
+def batch_record(result: dict) -> dict:
+    """JSON-ready line for one answer: review ids and similarities instead of review texts."""
+    return {
+        "index": result["index"],
+        "query": result["query"],
+        "answer": result["answer"],
+        "cached": result.get("cached", False),
+        "prompt_tokens": result.get("prompt_tokens"),
+        "sources": [
+            {"id": ctx["id"], "product_ids": ctx.get("product_ids") or [ctx["product_id"]],
+             "similarity": round(float(ctx["similarity"]), 4)}
+            for ctx in result["contexts"]
+        ],
+        "timings": {stage: round(value, 4) for stage, value in result["timings"].items()},
+    }
+
+
+def answer_file(path: str, output: str = None, pipeline=None, concurrency: int = None,
+                filters: ReviewFilter = None) -> dict:
+    """
+    Answer every question in ``path`` and stream the answers to ``output``.
+
+    Args:
+        path: Text or JSONL file of questions
+        output: JSONL file to write (defaults to ``<path stem>.answers.jsonl``)
+        pipeline: RAGPipeline to use (defaults to a new one)
+        concurrency: Generations in flight (defaults to ``OLLAMA_MAX_IN_FLIGHT``)
+        filters: Optional metadata filter for every question
+
+    Returns:
+        Dict with questions, answered, errors, output and seconds
+    """
+    if pipeline is None:
+        from src.rag.pipeline import RAGPipeline
+        pipeline = RAGPipeline()
+    if output is None:
+        source = Path(path)
+        output = str(source.with_name(f"{source.stem}.answers.jsonl"))
+
+    queries = read_queries(path)
+    print(f"📥 {len(queries):,} questions from {path}")
+    start = time.time()
+    answered = errors = 0
+
+    with open(output, "w", encoding="utf-8") as out:
+        for result in pipeline.query_batch(queries, concurrency=concurrency, filters=filters):
+            out.write(json.dumps(batch_record(result), default=str) + "\n")
+            out.flush()
+            answered += 1
+            errors += result["answer"].startswith("❌")
+            if answered % 50 == 0 or answered == len(queries):
+                elapsed = time.time() - start
+                print(f"   {answered:,}/{len(queries):,} answered "
+                      f"({answered / max(elapsed, 1e-9):.2f}/s, {errors} errors)")
+
+    seconds = time.time() - start
+    print(f"✅ Wrote {answered:,} answers to {output} in {seconds:.1f}s")
+    return {"questions": len(queries), "answered": answered, "errors": errors,
+            "output": output, "seconds": seconds}
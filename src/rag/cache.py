@@ -0,0 +1,156 @@
+"""
+Semantic answer cache for the RAG pipeline.
+
+Answers are stored with their query embedding. A new query whose embedding has
+cosine similarity above a threshold to a stored one (same model, prompt version
+and top_k) gets the stored answer and contexts back instead of a fresh
+generation. The lookup is a brute-force dot product over an in-process matrix,
+which costs well under a millisecond at cache sizes in the hundreds.
+
+The cache is cleared when the reviews table changes (checked through a cheap
+fingerprint query at most every ``check_interval`` seconds). Entries built with
+a different prompt version never match.
+"""
+
+import threading
+import time
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Fixed-capacity embedding-keyed cache of generated answers."""
+
+    def __init__(self, dimension: int, max_size: int = 512, threshold: float = 0.95,
+                 ttl: float = None, fingerprint_fn=None, check_interval: float = 60.0):
+        """
+        Args:
+            dimension: Embedding dimension
+            max_size: Maximum number of cached answers (LRU eviction beyond)
+            threshold: Minimum cosine similarity for a hit
+            ttl: Seconds an answer stays valid (None = until invalidated)
+            fingerprint_fn: Callable returning a value that changes when the
+                underlying data changes; a change clears the cache
+            check_interval: Minimum seconds between fingerprint checks
+        """
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl or None
+        self.fingerprint_fn = fingerprint_fn
+        self.check_interval = check_interval
+
+        self._vectors = np.zeros((max_size, dimension), dtype=np.float32)
+        self._entries = [None] * max_size
+        self._last_used = np.zeros(max_size, dtype=np.float64)
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._last_check = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_fingerprint(self):
+        if self.fingerprint_fn is None:
+            return
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            fingerprint = self.fingerprint_fn()
+        except Exception:
+            return
+        if self._fingerprint is not None and fingerprint != self._fingerprint:
+            self.invalidate()
+        self._fingerprint = fingerprint
+
+    def lookup(self, embedding, namespace: tuple):
+        """
+        Find a cached answer for a semantically equivalent query.
+
+        Args:
+            embedding: Normalized query embedding
+            namespace: Tuple that must match exactly (e.g. model, prompt version, top_k)
+
+        Returns:
+            Cached entry dict with an added ``cache_similarity`` key, or None
+        """
+        self._check_fingerprint()
+        query = np.asarray(embedding, dtype=np.float32)
+        now = time.time()
+
+        with self._lock:
+            valid = np.array([
+                e is not None and e["namespace"] == namespace
+                and (self.ttl is None or now - e["stored_at"] <= self.ttl)
+                for e in self._entries
+            ])
+            if not valid.any():
+                self.misses += 1
+                return None
+
+            scores = np.where(valid, self._vectors @ query, -np.inf)
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._last_used[slot] = now
+            return {**self._entries[slot], "cache_similarity": float(scores[slot])}
+
+    def store(self, embedding, namespace: tuple, query: str, answer: str, contexts: list):
+        """Insert an answer, evicting the least recently used entry when full."""
+        now = time.time()
+        with self._lock:
+            empty = [i for i, e in enumerate(self._entries) if e is None]
+            slot = empty[0] if empty else int(np.argmin(self._last_used))
+            self._vectors[slot] = np.asarray(embedding, dtype=np.float32)
+            self._entries[slot] = {
+                "namespace": namespace,
+                "query": query,
+                "answer": answer,
+                "contexts": list(contexts),
+                "stored_at": now,
+            }
+            self._last_used[slot] = now
+
+    def invalidate(self):
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries = [None] * self.max_size
+            self._last_used[:] = 0
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": sum(e is not None for e in self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Singleton instance
+_answer_cache = None
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get or create the shared SemanticAnswerCache configured from .env."""
+    global _answer_cache
+    if _answer_cache is None:
+        from src.database.queries import get_reviews_fingerprint
+        from src.utils.config import config
+        rag = config.rag
+        _answer_cache = SemanticAnswerCache(
+            config.embedding.dimension,
+            max_size=rag.answer_cache_size,
+            threshold=rag.answer_cache_threshold,
+            ttl=rag.answer_cache_ttl,
+            fingerprint_fn=get_reviews_fingerprint,
+            check_interval=rag.answer_cache_check_interval,
+        )
+    return _answer_cache
@@ -2,51 +2,205 @@
 RAG Pipeline - Orchestrates retrieval → prompt → generation.
 """
 
+import asyncio
 import time
-from src.embeddings.search import semantic_search
-from src.llm.ollama_client import get_ollama_client
-from src.llm.prompts import build_rag_prompt
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import numpy as np
+from src.database.filters import ReviewFilter
+from src.embeddings.generator import get_embedding_generator
+from src.embeddings.search import async_semantic_search, batch_search, semantic_search
+from src.llm.ollama_client import generation_stats, get_ollama_client
+from src.llm.prompts import pack_rag_prompt, PackedPrompt, RAG_PROMPT_VERSION
+from src.llm.scheduler import PRIORITY_BATCH, Ticket
+from src.rag.cache import get_answer_cache
+from src.rag.reranker import get_reranker
+from src.utils.config import config
 
 
 class RAGPipeline:
     """End-to-end RAG pipeline."""
 
-    def __init__(self, top_k: int = 5, temperature: float = 0.3):
+    def __init__(self, top_k: int = 5, temperature: float = 0.3, use_answer_cache: bool = None,
+                 retrieval_mode: str = None, rerank: bool = None):
         self.top_k = top_k
         self.temperature = temperature
+        self.retrieval_mode = retrieval_mode or config.rag.retrieval_mode
         self.llm = get_ollama_client()
+        self.embedder = get_embedding_generator()
+        if use_answer_cache is None:
+            use_answer_cache = config.rag.answer_cache_enabled
+        self.answer_cache = get_answer_cache() if use_answer_cache else None
+        if rerank is None:
+            rerank = config.rag.rerank_enabled
+        self.reranker = get_reranker() if rerank else None
+        # Background warm-up tasks (kept referenced until done)
+        self._background = set()
 
-    def retrieve(self, query: str) -> list[dict]:
-        """Retrieve relevant reviews for a query."""
-        return semantic_search(query, top_k=self.top_k)
+    def _fetch_k(self) -> int:
+        """Candidates to fetch: over-fetch when a reranker will cut them down to top_k."""
+        if self.reranker is None:
+            return self.top_k
+        return max(config.rag.rerank_candidates, self.top_k)
+
+    def retrieve(self, query: str, query_embedding: list = None,
+                 filters: ReviewFilter = None) -> list[dict]:
+        """Retrieve relevant reviews for a query, optionally filtered by metadata."""
+        contexts = semantic_search(query, top_k=self._fetch_k(), query_embedding=query_embedding,
+                                   mode=self.retrieval_mode, filters=filters)
+        if self.reranker is not None:
+            contexts = self.reranker.rerank(query, contexts, self.top_k)
+        return contexts
+
+    async def aretrieve(self, query: str, query_embedding: list = None,
+                        filters: ReviewFilter = None) -> list[dict]:
+        """Asyncio version of ``retrieve`` (asyncpg pool, no thread per request)."""
+        contexts = await async_semantic_search(query, top_k=self._fetch_k(), query_embedding=query_embedding,
+                                               mode=self.retrieval_mode, filters=filters)
+        if self.reranker is not None:
+            contexts = await asyncio.to_thread(self.reranker.rerank, query, contexts, self.top_k)
+        return contexts
+
+    def _cache_namespace(self, filters: ReviewFilter = None) -> tuple:
+        """Cached answers are only reused for the same model, prompt and retrieval settings."""
+        return (self.llm.model, RAG_PROMPT_VERSION, config.ollama.num_ctx, self.top_k,
+                self.retrieval_mode, self.reranker is not None, filters)
+
+    def _store_answer(self, query: str, query_embedding: list, contexts: list, answer: str,
+                      filters: ReviewFilter = None):
+        if answer and not answer.startswith("❌"):
+            self.answer_cache.store(query_embedding, self._cache_namespace(filters), query, answer, contexts)
+
+    def _timed_stream(self, stream, timings: dict, on_answer=None):
+        """
+        Pass tokens through, recording ``first_token`` and ``generate`` in ``timings``.
+
+        ``on_answer`` receives the full answer once the stream completes
+        cleanly: not when it is closed early, and not when the client yielded
+        an error after some tokens (the joined text would be a partial answer).
+        """
+        start = time.time()
+        parts = []
+        failed = False
+        for token in stream:
+            if not parts:
+                timings["first_token"] = time.time() - start
+            parts.append(token)
+            failed = failed or token.startswith("❌")
+            yield token
+        timings["generate"] = time.time() - start
+        if on_answer is not None and not failed:
+            on_answer("".join(parts))
+
+    async def _atimed_stream(self, stream, timings: dict, on_answer=None):
+        """Async version of ``_timed_stream``."""
+        start = time.time()
+        parts = []
+        failed = False
+        async for token in stream:
+            if not parts:
+                timings["first_token"] = time.time() - start
+            parts.append(token)
+            failed = failed or token.startswith("❌")
+            yield token
+        timings["generate"] = time.time() - start
+        if on_answer is not None and not failed:
+            on_answer("".join(parts))
+
+    def _start_warm_up(self, timings: dict):
+        """Load the model on a background thread if it may be cold; records ``warmup`` when done."""
+        if config.ollama.warmup:
+            future = self.llm.warm_up_background()
+            future.add_done_callback(lambda f: timings.__setitem__("warmup", f.result()))
+
+    def _astart_warm_up(self, timings: dict):
+        """Asyncio version of ``_start_warm_up`` (a task on the running loop)."""
+        if not config.ollama.warmup or self.llm.is_warm():
+            return
+        task = asyncio.create_task(self.llm.awarm_up())
+        self._background.add(task)
+
+        def done(t):
+            self._background.discard(t)
+            if not t.cancelled():
+                timings["warmup"] = t.result()
+        task.add_done_callback(done)
 
     def generate(self, query: str, contexts: list[dict],
-                 chat_history: list = None, stream: bool = False):
-        """Generate a response from the LLM."""
-        prompt = build_rag_prompt(query, contexts, chat_history)
+                 chat_history: list = None, stream: bool = False, packed: PackedPrompt = None,
+                 on_done=None):
+        """
+        Generate a response from the LLM (``packed`` reuses an already packed prompt).
+
+        ``on_done`` receives Ollama's final response object (see ``OllamaClient.generate``).
+        """
+        prompt = (packed or pack_rag_prompt(query, contexts, chat_history)).prompt
 
         if stream:
-            return self.llm.generate_stream(prompt, temperature=self.temperature)
+            return self.llm.generate_stream(prompt, temperature=self.temperature, on_done=on_done)
         else:
-            return self.llm.generate(prompt, temperature=self.temperature)
+            return self.llm.generate(prompt, temperature=self.temperature, on_done=on_done)
 
     def query(self, query: str, chat_history: list = None,
-              stream: bool = False, show_context: bool = False) -> dict:
+              stream: bool = False, show_context: bool = False,
+              filters: ReviewFilter = None) -> dict:
         """
         Full RAG pipeline: retrieve → generate.
 
+        If the model may have been unloaded, a warm-up request loads it on a
+        background thread while the query is encoded and reviews are retrieved.
+
         Args:
             query: User's question
             chat_history: Optional conversation history
             stream: If True, returns a generator for streaming
             show_context: If True, prints retrieved context
+            filters: Optional score/product/time/helpfulness filter
 
         Returns:
-            Dict with query, answer, contexts, and timing info
+            Dict with query, answer, contexts, and timing info. ``timings``
+            breaks out the stages in seconds (encode, cache_lookup, retrieve,
+            pack, warmup, first_token, generate). Stages that overlap add up to
+            more than ``total_time``. When streaming, first_token and generate
+            are filled in as the stream is consumed. Without streaming,
+            ``llm_stats`` holds Ollama's token counts and server-side timings
+            (see ``generation_stats``).
         """
-        # Step 1: Retrieve
+        timings = {}
         start = time.time()
-        contexts = self.retrieve(query)
+        self._start_warm_up(timings)
+
+        # Step 1: Encode + answer cache lookup
+        query_embedding = self.embedder.encode_query(query)
+        timings["encode"] = time.time() - start
+        use_cache = self.answer_cache is not None and not chat_history
+
+        if use_cache:
+            stage = time.time()
+            hit = self.answer_cache.lookup(query_embedding, self._cache_namespace(filters))
+            timings["cache_lookup"] = time.time() - stage
+            if hit is not None:
+                retrieval_time = time.time() - start
+                if show_context:
+                    print(f"\n♻️ Answer cache hit (sim {hit['cache_similarity']:.4f}): {hit['query']}")
+                result = {
+                    "query": query,
+                    "contexts": hit["contexts"],
+                    "retrieval_time": retrieval_time,
+                    "cached": True,
+                    "cache_similarity": hit["cache_similarity"],
+                    "timings": timings,
+                }
+                if stream:
+                    result["stream"] = iter([hit["answer"]])
+                else:
+                    result.update({"answer": hit["answer"], "generation_time": 0,
+                                   "total_time": retrieval_time})
+                return result
+
+        # Step 2: Retrieve
+        stage = time.time()
+        contexts = self.retrieve(query, query_embedding=query_embedding, filters=filters)
+        timings["retrieve"] = time.time() - stage
         retrieval_time = time.time() - start
 
         if show_context:
@@ -61,21 +215,44 @@ class RAGPipeline:
                 "contexts": [],
                 "retrieval_time": retrieval_time,
                 "generation_time": 0,
+                "timings": timings,
             }
 
-        # Step 2: Generate
+        # Step 3: Pack the prompt into the token budget; report only the reviews the model sees
+        stage = time.time()
+        packed = pack_rag_prompt(query, contexts, chat_history)
+        contexts = contexts[:packed.contexts_used]
+        timings["pack"] = time.time() - stage
+        if show_context:
+            print(f"🧮 Prompt: {packed.tokens}/{packed.budget} tokens, {packed.contexts_used} reviews "
+                  f"({packed.contexts_trimmed} trimmed), {packed.history_turns} history turns "
+                  f"({packed.history_dropped} dropped)")
+
+        # Step 4: Generate
         if stream:
             # Return generator for streaming use cases
+            token_stream = self.generate(query, contexts, chat_history, stream=True, packed=packed)
+            on_answer = None
+            if use_cache:
+                def on_answer(answer):
+                    self._store_answer(query, query_embedding, contexts, answer, filters)
             return {
                 "query": query,
                 "contexts": contexts,
                 "retrieval_time": retrieval_time,
-                "stream": self.generate(query, contexts, chat_history, stream=True),
+                "prompt_tokens": packed.tokens,
+                "stream": self._timed_stream(token_stream, timings, on_answer),
+                "timings": timings,
             }
 
-        start = time.time()
-        answer = self.generate(query, contexts, chat_history, stream=False)
-        generation_time = time.time() - start
+        stage = time.time()
+        llm_stats = {}
+        answer = self.generate(query, contexts, chat_history, stream=False, packed=packed,
+                               on_done=lambda data: llm_stats.update(generation_stats(data)))
+        generation_time = time.time() - stage
+        timings["generate"] = generation_time
+        if use_cache:
+            self._store_answer(query, query_embedding, contexts, answer, filters)
 
         return {
             "query": query,
@@ -83,17 +260,234 @@ class RAGPipeline:
             "contexts": contexts,
             "retrieval_time": retrieval_time,
             "generation_time": generation_time,
-            "total_time": retrieval_time + generation_time,
+            "total_time": time.time() - start,
+            "prompt_tokens": packed.tokens,
+            "llm_stats": llm_stats,
+            "timings": timings,
+        }
+
+    async def aquery(self, query: str, chat_history: list = None, stream: bool = False,
+                     filters: ReviewFilter = None, ticket: Ticket = None) -> dict:
+        """
+        Asyncio version of ``query``: asyncpg retrieval and httpx generation.
+
+        Model warm-up runs as a task on the loop, concurrently with encoding
+        (in a worker thread) and retrieval. With ``stream=True`` the ``stream``
+        entry is an async generator. Closing it, or cancelling the task that
+        consumes it, stops the generation on the Ollama server. ``ticket`` is a
+        scheduler place taken by the caller and is handed to the generation.
+        """
+        timings = {}
+        start = time.time()
+        self._astart_warm_up(timings)
+
+        query_embedding = await asyncio.to_thread(self.embedder.encode_query, query)
+        timings["encode"] = time.time() - start
+        use_cache = self.answer_cache is not None and not chat_history
+
+        if use_cache:
+            stage = time.time()
+            hit = await asyncio.to_thread(self.answer_cache.lookup, query_embedding,
+                                          self._cache_namespace(filters))
+            timings["cache_lookup"] = time.time() - stage
+            if hit is not None:
+                retrieval_time = time.time() - start
+                result = {
+                    "query": query,
+                    "contexts": hit["contexts"],
+                    "retrieval_time": retrieval_time,
+                    "cached": True,
+                    "cache_similarity": hit["cache_similarity"],
+                    "timings": timings,
+                }
+                if stream:
+                    async def replay(answer=hit["answer"]):
+                        yield answer
+                    result["stream"] = replay()
+                else:
+                    result.update({"answer": hit["answer"], "generation_time": 0,
+                                   "total_time": retrieval_time})
+                return result
+
+        stage = time.time()
+        contexts = await self.aretrieve(query, query_embedding=query_embedding, filters=filters)
+        timings["retrieve"] = time.time() - stage
+        retrieval_time = time.time() - start
+        if not contexts:
+            return {
+                "query": query,
+                "answer": "No relevant reviews found in the database.",
+                "contexts": [],
+                "retrieval_time": retrieval_time,
+                "generation_time": 0,
+                "timings": timings,
+            }
+
+        stage = time.time()
+        packed = pack_rag_prompt(query, contexts, chat_history)
+        contexts = contexts[:packed.contexts_used]
+        timings["pack"] = time.time() - stage
+        result = {
+            "query": query,
+            "contexts": contexts,
+            "retrieval_time": retrieval_time,
+            "prompt_tokens": packed.tokens,
+            "timings": timings,
         }
 
+        if stream:
+            token_stream = self.llm.agenerate_stream(packed.prompt, temperature=self.temperature, ticket=ticket)
+            on_answer = None
+            if use_cache:
+                def on_answer(answer):
+                    self._store_answer(query, query_embedding, contexts, answer, filters)
+            result["stream"] = self._atimed_stream(token_stream, timings, on_answer)
+            return result
+
+        stage = time.time()
+        llm_stats = {}
+        answer = await self.llm.agenerate(packed.prompt, temperature=self.temperature, ticket=ticket,
+                                          on_done=lambda data: llm_stats.update(generation_stats(data)))
+        generation_time = time.time() - stage
+        timings["generate"] = generation_time
+        if use_cache:
+            self._store_answer(query, query_embedding, contexts, answer, filters)
+        result.update({
+            "answer": answer,
+            "generation_time": generation_time,
+            "total_time": time.time() - start,
+            "llm_stats": llm_stats,
+        })
+        return result
+
+    def _prepare_batch(self, queries: list[str], offset: int, filters: ReviewFilter = None) -> list:
+        """
+        Encode and retrieve one chunk of a batch: one model call, one SQL round trip.
+
+        Returns:
+            (result, packed, query_embedding) per query. ``packed`` is None when
+            the result is already final (cache hit or no reviews).
+        """
+        start = time.time()
+        embeddings = np.asarray(self.embedder.encode(queries)).tolist()
+        encode_time = time.time() - start
+
+        prepared, misses = [], []
+        for i, (query, embedding) in enumerate(zip(queries, embeddings)):
+            result = {"index": offset + i, "query": query, "batch_size": len(queries),
+                      "timings": {"encode_batch": encode_time}}
+            hit = None
+            if self.answer_cache is not None:
+                hit = self.answer_cache.lookup(embedding, self._cache_namespace(filters))
+            if hit is not None:
+                result.update({"answer": hit["answer"], "contexts": hit["contexts"], "cached": True,
+                               "cache_similarity": hit["cache_similarity"]})
+            else:
+                misses.append(len(prepared))
+            prepared.append((result, None, embedding))
+
+        start = time.time()
+        hits = batch_search([queries[i] for i in misses], top_k=self._fetch_k(),
+                            query_embeddings=[embeddings[i] for i in misses],
+                            mode=self.retrieval_mode, filters=filters)
+        retrieve_time = time.time() - start
+
+        for i, contexts in zip(misses, hits):
+            result, _, embedding = prepared[i]
+            result["timings"]["retrieve_batch"] = retrieve_time
+            if self.reranker is not None:
+                stage = time.time()
+                contexts = self.reranker.rerank(result["query"], contexts, self.top_k)
+                result["timings"]["rerank"] = time.time() - stage
+            if not contexts:
+                result.update({"answer": "No relevant reviews found in the database.", "contexts": []})
+                continue
+            stage = time.time()
+            packed = pack_rag_prompt(result["query"], contexts)
+            result["timings"]["pack"] = time.time() - stage
+            result.update({"contexts": contexts[:packed.contexts_used], "prompt_tokens": packed.tokens})
+            prepared[i] = (result, packed, embedding)
+        return prepared
+
+    def _answer_batch_item(self, result: dict, packed: PackedPrompt, query_embedding: list,
+                           submitted: float, filters: ReviewFilter = None) -> dict:
+        stage = time.time()
+        result["timings"]["wait"] = stage - submitted
+        llm_stats = {}
+        answer = self.llm.generate(packed.prompt, temperature=self.temperature, priority=PRIORITY_BATCH,
+                                   on_done=lambda data: llm_stats.update(generation_stats(data)))
+        result["timings"]["generate"] = time.time() - stage
+        result.update({"answer": answer, "llm_stats": llm_stats})
+        if self.answer_cache is not None:
+            self._store_answer(result["query"], query_embedding, result["contexts"], answer, filters)
+        return result
+
+    def query_batch(self, queries: list[str], concurrency: int = None, filters: ReviewFilter = None,
+                    chunk_size: int = 256):
+        """
+        Answer many independent questions (no chat history).
+
+        Queries are processed in chunks of ``chunk_size``. Each chunk is
+        encoded in one model call and retrieved in one SQL round trip.
+        Generations run on ``concurrency`` worker threads at batch priority,
+        so interactive requests sharing the scheduler go first. The next chunk
+        is retrieved while earlier generations run, but only once fewer than
+        ``chunk_size + concurrency`` answers are pending. Memory use therefore
+        stays bounded by about two chunks, however many queries there are.
+
+        Args:
+            queries: Questions to answer
+            concurrency: Generations in flight (defaults to ``OLLAMA_MAX_IN_FLIGHT``)
+            filters: Optional metadata filter for every query
+            chunk_size: Queries encoded and retrieved together
+
+        Yields:
+            Result dicts in completion order, each with ``index`` (position in
+            ``queries``), query, answer, contexts, ``batch_size`` (queries in its
+            chunk) and ``timings`` (encode_batch and retrieve_batch are per
+            chunk; rerank, pack, wait and generate are per query)
+        """
+        concurrency = concurrency or max(config.ollama.max_in_flight, 1)
+        self._start_warm_up({})
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rag-batch")
+        pending = set()
+        max_pending = chunk_size + concurrency
+        try:
+            for offset in range(0, len(queries), chunk_size):
+                while len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                for result, packed, embedding in self._prepare_batch(queries[offset:offset + chunk_size],
+                                                                     offset, filters):
+                    if packed is None:
+                        yield result
+                    else:
+                        pending.add(pool.submit(self._answer_batch_item, result, packed, embedding,
+                                                time.time(), filters))
+                done, pending = wait(pending, timeout=0)
+                for future in done:
+                    yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def chat_session(self) -> "ChatSession":
+        """Start a conversation that reuses Ollama's prompt state across turns."""
+        from src.rag.session import ChatSession
+        return ChatSession(self)
+
     def chat_interactive(self):
-        """Interactive chat loop in the terminal."""
+        """Interactive chat loop in the terminal (one ChatSession per run)."""
         print("╔══════════════════════════════════════════════════════════╗")
         print("║   🧠 LocalLLM-RAG: Food Review Assistant                ║")
         print("║   Type 'quit' to exit                                   ║")
         print("╚══════════════════════════════════════════════════════════╝\n")
 
-        history = []
+        session = self.chat_session()
 
         while True:
             query = input("\n💬 You: ").strip()
@@ -103,17 +497,22 @@ class RAGPipeline:
             if not query:
                 continue
 
-            result = self.query(query, chat_history=history, show_context=True)
+            result = session.ask(query, show_context=True)
             print(f"\n🤖 Assistant: {result['answer']}")
             print(f"\n⏱️ Retrieval: {result['retrieval_time']:.2f}s | "
-                  f"Generation: {result['generation_time']:.2f}s")
+                  f"Generation: {result['generation_time']:.2f}s | "
+                  f"Prompt: {result['prompt_tokens']} new tokens ({result['session_tokens']} in session)")
+
 
-            history.append([query, result["answer"]])
+# Pipelines reused by quick_query, one per top_k
+_quick_pipelines = {}
 
 
 # Convenience function
 def quick_query(query: str, top_k: int = 5) -> str:
     """Quick one-shot query."""
-    pipeline = RAGPipeline(top_k=top_k)
+    pipeline = _quick_pipelines.get(top_k)
+    if pipeline is None:
+        pipeline = _quick_pipelines[top_k] = RAGPipeline(top_k=top_k)
     result = pipeline.query(query)
     return result["answer"]
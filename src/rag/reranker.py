@@ -0,0 +1,130 @@
+"""
+Cross-encoder reranking stage.
+
+The pipeline over-fetches candidates from the retriever, and a small
+cross-encoder running on CPU rescores each (query, review) pair. Scores are
+cached per (normalized query, review id), so repeated pairs cost nothing.
+A latency budget caps how many uncached pairs are scored per request, based on
+the recent p95 per-pair cost (at least one pair is always scored, which keeps
+the estimate current). Candidates left unscored keep their retrieval order
+behind the reranked ones.
+"""
+
+import threading
+import time
+from collections import deque
+import numpy as np
+from src.embeddings.cache import normalize_query
+from src.utils.cache import LRUCache
+from src.utils.config import config
+
+
+class CrossEncoderReranker:
+    """Rescores retrieved reviews with a cross-encoder under a latency budget."""
+
+    def __init__(self, model_name: str = None, batch_size: int = None, budget_ms: float = None,
+                 cache_size: int = None, max_chars: int = 1000):
+        rag = config.rag
+        self.model_name = model_name or rag.rerank_model
+        self.batch_size = batch_size or rag.rerank_batch_size
+        self.budget_ms = budget_ms if budget_ms is not None else rag.rerank_budget_ms
+        self.max_chars = max_chars
+        self.model = None
+        self.cache = LRUCache(max_size=cache_size or rag.rerank_cache_size)
+
+        self._pair_ms = deque(maxlen=256)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.truncated = 0
+        self.skipped = 0
+
+    def load_model(self):
+        """Load the cross-encoder on CPU."""
+        if self.model is None:
+            from sentence_transformers import CrossEncoder
+            print(f"Loading reranker: {self.model_name}...")
+            self.model = CrossEncoder(self.model_name, device="cpu", max_length=256)
+            print("✅ Reranker loaded on cpu")
+        return self.model
+
+    def _pair_cost_ms(self) -> float:
+        """Recent p95 cost of scoring one pair (0 until measured)."""
+        with self._lock:
+            return float(np.percentile(self._pair_ms, 95)) if self._pair_ms else 0.0
+
+    def _document(self, ctx: dict) -> str:
+        return f"{ctx.get('summary') or ''}. {ctx.get('review_text') or ''}"[:self.max_chars]
+
+    def rerank(self, query: str, candidates: list[dict], top_k: int) -> list[dict]:
+        """
+        Reorder ``candidates`` by cross-encoder score and keep the best ``top_k``.
+
+        Args:
+            query: User's question
+            candidates: Retrieved review dicts, in retrieval order
+            top_k: Number of reviews to keep
+
+        Returns:
+            Review dicts with an added ``rerank_score`` (None if unscored)
+        """
+        self.requests += 1
+        key = normalize_query(query)
+        scores = {}
+        missing = []
+        for ctx in candidates:
+            cached = self.cache.get((key, ctx["id"]))
+            if cached is None:
+                missing.append(ctx)
+            else:
+                scores[ctx["id"]] = cached
+
+        # Only score as many new pairs as the budget allows; retrieval order decides which.
+        # One pair is always scored as a probe, so a single slow measurement (cold
+        # first predict, GC pause) cannot switch reranking off for good.
+        cost = self._pair_cost_ms()
+        if missing and cost > 0 and self.budget_ms > 0:
+            affordable = int(self.budget_ms // cost)
+            if affordable == 0:
+                self.skipped += 1
+                missing = missing[:1]
+            elif affordable < len(missing):
+                self.truncated += 1
+                missing = missing[:affordable]
+
+        if missing:
+            model = self.load_model()
+            start = time.perf_counter()
+            predicted = model.predict([(query, self._document(c)) for c in missing],
+                                      batch_size=self.batch_size, show_progress_bar=False)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._pair_ms.append(elapsed_ms / len(missing))
+            for ctx, score in zip(missing, predicted):
+                scores[ctx["id"]] = float(score)
+                self.cache.put((key, ctx["id"]), float(score))
+
+        scored = sorted((c for c in candidates if c["id"] in scores),
+                        key=lambda c: scores[c["id"]], reverse=True)
+        unscored = [c for c in candidates if c["id"] not in scores]
+        return [{**c, "rerank_score": scores.get(c["id"])} for c in (scored + unscored)[:top_k]]
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "truncated": self.truncated,
+            "skipped": self.skipped,
+            "pair_p95_ms": self._pair_cost_ms(),
+            "cache": self.cache.stats(),
+        }
+
+
+# Singleton instance
+_reranker = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Get or create the singleton CrossEncoderReranker."""
+    global _reranker
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
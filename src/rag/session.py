@@ -0,0 +1,145 @@
+"""
+Chat sessions that reuse Ollama's KV state across turns.
+
+A stateless follow-up rebuilds the whole prompt (rules, history, fresh
+reviews, question), so it differs from the previous one almost at once and
+Ollama prefills everything again. A ``ChatSession`` instead continues
+Ollama's token ``context`` from the previous response. Each turn sends only
+the reviews not shown yet plus the question, appended after an unchanged
+prefix of earlier prompts and answers, so only the new tokens are
+prefilled. When the session would outgrow the context window, it restarts
+from a freshly packed prompt that carries the recent history.
+"""
+
+import time
+from src.database.filters import ReviewFilter
+from src.llm.budget import prompt_token_budget
+from src.llm.prompts import pack_rag_prompt, pack_session_turn
+
+
+class ChatSession:
+    """One conversation with the RAG pipeline, continued through Ollama's ``context``."""
+
+    def __init__(self, pipeline, max_tokens: int = None):
+        """
+        Args:
+            pipeline: RAGPipeline used for retrieval and generation settings
+            max_tokens: Prompt budget for the whole session (defaults to
+                ``prompt_token_budget()``)
+        """
+        self.pipeline = pipeline
+        self.max_tokens = max_tokens or prompt_token_budget()
+        self.history = []
+        self.last_stats = {}
+        self.reset()
+
+    def reset(self):
+        """Forget the Ollama state; the next turn starts a fresh prompt."""
+        self.context = None
+        self.session_tokens = 0
+        self.shown_ids = set()
+        self.next_index = 1
+
+    def _on_done(self, data: dict):
+        if data.get("context"):
+            self.context = data["context"]
+            self.session_tokens = len(self.context)
+        self.last_stats = {
+            "prompt_eval_count": data.get("prompt_eval_count", 0),
+            "prompt_eval_ms": data.get("prompt_eval_duration", 0) / 1e6,
+            "eval_count": data.get("eval_count", 0),
+        }
+
+    def _turn_prompt(self, query: str, contexts: list):
+        """Pack this turn's prompt, restarting the session when it no longer fits."""
+        if self.context is not None:
+            new = [c for c in contexts if c["id"] not in self.shown_ids]
+            room = self.max_tokens - self.session_tokens
+            packed = pack_session_turn(query, new, self.next_index, opening=False, max_tokens=room)
+            if packed.tokens <= room and (packed.contexts_used or not new):
+                return packed, new[:packed.contexts_used]
+            self.reset()
+
+        if self.history:
+            # Restart: recent history and this turn's reviews in one packed prompt
+            packed = pack_rag_prompt(query, contexts, self.history, max_tokens=self.max_tokens)
+        else:
+            packed = pack_session_turn(query, contexts, 1, opening=True, max_tokens=self.max_tokens)
+        return packed, contexts[:packed.contexts_used]
+
+    def _record(self, query: str, answer: str, shown: list):
+        if answer.startswith("❌"):
+            return
+        self.history.append([query, answer])
+        self.shown_ids.update(c["id"] for c in shown)
+        self.next_index += len(shown)
+
+    def ask(self, query: str, stream: bool = False, filters: ReviewFilter = None,
+            contexts: list[dict] = None, show_context: bool = False) -> dict:
+        """
+        Answer one turn of the conversation.
+
+        Args:
+            query: User's question
+            stream: Return a token generator under ``stream`` instead of ``answer``
+            filters: Optional metadata filter for retrieval
+            contexts: Pre-retrieved reviews (skips retrieval)
+            show_context: If True, prints the retrieved reviews and how the turn was packed
+
+        Returns:
+            Dict with query, answer or stream, contexts (the reviews added this
+            turn), prompt_tokens and session_tokens. When streaming,
+            session_tokens is filled in once the stream ends.
+        """
+        pipeline = self.pipeline
+        start = time.time()
+        if contexts is None:
+            contexts = pipeline.retrieve(query, filters=filters)
+        retrieval_time = time.time() - start
+
+        if show_context:
+            print(f"\n🔍 Retrieved {len(contexts)} reviews ({retrieval_time:.3f}s):")
+            for i, ctx in enumerate(contexts, 1):
+                print(f"   {i}. [{ctx['score']}/5 | Sim: {ctx['similarity']:.4f}] {ctx['summary']}")
+
+        packed, shown = self._turn_prompt(query, contexts)
+        context = self.context
+        if show_context:
+            print(f"🧮 Prompt: {packed.tokens}/{packed.budget} tokens, {packed.contexts_used} new reviews "
+                  f"({packed.contexts_trimmed} trimmed), "
+                  f"{'continuing the session' if context is not None else 'new session prompt'}")
+        result = {
+            "query": query,
+            "contexts": shown,
+            "retrieval_time": retrieval_time,
+            "prompt_tokens": packed.tokens,
+            "continued": context is not None,
+        }
+
+        if stream:
+            def token_stream():
+                parts = []
+                try:
+                    for token in pipeline.llm.generate_stream(packed.prompt, temperature=pipeline.temperature,
+                                                              context=context, on_done=self._on_done):
+                        parts.append(token)
+                        yield token
+                        if token.startswith("❌"):
+                            return  # partial answer + error: not a turn to remember
+                    self._record(query, "".join(parts), shown)
+                finally:
+                    result["session_tokens"] = self.session_tokens
+            result["stream"] = token_stream()
+            return result
+
+        start = time.time()
+        answer = pipeline.llm.generate(packed.prompt, temperature=pipeline.temperature,
+                                       context=context, on_done=self._on_done)
+        self._record(query, answer, shown)
+        result.update({
+            "answer": answer,
+            "generation_time": time.time() - start,
+            "session_tokens": self.session_tokens,
+        })
+        result["total_time"] = retrieval_time + result["generation_time"]
+        return result
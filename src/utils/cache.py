@@ -0,0 +1,82 @@
+"""
+Thread-safe LRU cache with optional TTL and hit/miss counters.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with per-entry expiry."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = None):
+        """
+        Args:
+            max_size: Maximum number of entries kept
+            ttl: Seconds an entry stays valid after insertion (None = forever)
+        """
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key`` and mark it recently used."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and self._expired(entry[1], now):
+                del self._data[key]
+                self.evictions += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, stored_at: float = None):
+        """Insert or refresh ``key``, evicting the least recently used entry if full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, stored_at or time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def items(self) -> list[tuple]:
+        """Snapshot of live (key, value, stored_at) entries, oldest first."""
+        now = time.time()
+        with self._lock:
+            return [(k, v, t) for k, (v, t) in self._data.items() if not self._expired(t, now)]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
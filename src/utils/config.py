@@ -9,6 +9,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Project root (two levels above src/utils/)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 
 @dataclass
 class DatabaseConfig:
@@ -17,6 +20,19 @@ class DatabaseConfig:
     host: str = ""
     port: str = ""
     name: str = ""
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    statement_timeout_ms: int = 0
+    async_pool_min: int = 2
+    async_pool_max: int = 20
+    statement_cache_size: int = 100
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40
+    index_maintenance_work_mem: str = ""
+    index_parallel_workers: int = 0
+    index_concurrently: bool = False
 
     def __post_init__(self):
         self.user = os.getenv("DB_USER", "llmuser")
@@ -24,16 +40,63 @@ class DatabaseConfig:
         self.host = os.getenv("DB_HOST", "127.0.0.1")
         self.port = os.getenv("DB_PORT", "5432")
         self.name = os.getenv("DB_NAME", "llmdb")
+        # Sync SQLAlchemy pool
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        # Server-side statement timeout for every connection (0 = none)
+        self.statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+        # Async (asyncpg) pool; prepared statements are cached per connection
+        self.async_pool_min = int(os.getenv("DB_ASYNC_POOL_MIN", "2"))
+        self.async_pool_max = int(os.getenv("DB_ASYNC_POOL_MAX", "20"))
+        self.statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+        # HNSW build parameters and query-time candidate list size (0 = server default)
+        self.hnsw_m = int(os.getenv("DB_HNSW_M", "16"))
+        self.hnsw_ef_construction = int(os.getenv("DB_HNSW_EF_CONSTRUCTION", "64"))
+        self.hnsw_ef_search = int(os.getenv("DB_HNSW_EF_SEARCH", "40"))
+        # Index builds: memory, parallel workers (0 = server default), CREATE INDEX CONCURRENTLY
+        self.index_maintenance_work_mem = os.getenv("DB_INDEX_MAINTENANCE_WORK_MEM", "1GB")
+        self.index_parallel_workers = int(os.getenv("DB_INDEX_PARALLEL_WORKERS", "0"))
+        self.index_concurrently = os.getenv("DB_INDEX_CONCURRENTLY", "false").lower() in ("1", "true", "yes")
 
 
 @dataclass
 class OllamaConfig:
     host: str = ""
     model: str = ""
+    num_ctx: int = 4096
+    num_predict: int = 1024
+    tokenizer: str = ""
+    keep_alive: str = ""
+    pool_size: int = 10
+    connect_timeout: float = 5.0
+    timeout: float = 120.0
+    max_in_flight: int = 2
+    max_queue: int = 16
+    queue_timeout: float = 60.0
+    warmup: bool = True
 
     def __post_init__(self):
         self.host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
         self.model = os.getenv("OLLAMA_MODEL", "qwen2.5:14b")
+        # Context window; prompts are packed to num_ctx - num_predict tokens
+        self.num_ctx = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+        self.num_predict = int(os.getenv("OLLAMA_NUM_PREDICT", "1024"))
+        # Tokenizer matching the model, for prompt token counting ("" = estimate).
+        # A local path or an already-downloaded Hub id; never fetched at request time
+        self.tokenizer = os.getenv("OLLAMA_TOKENIZER", "")
+        # How long the model (and its KV cache) stays loaded after a request
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        # Pooled keep-alive HTTP connections; timeout is per read, not per answer
+        self.pool_size = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+        self.connect_timeout = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+        self.timeout = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+        # Admission control: match OLLAMA_NUM_PARALLEL on the server (0 = no scheduler)
+        self.max_in_flight = int(os.getenv("OLLAMA_MAX_IN_FLIGHT", "2"))
+        self.max_queue = int(os.getenv("OLLAMA_MAX_QUEUE", "16"))
+        self.queue_timeout = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "60"))
+        # Load the model while retrieval runs when keep_alive may have expired
+        self.warmup = os.getenv("OLLAMA_WARMUP", "true").lower() in ("1", "true", "yes")
 
 
 @dataclass
@@ -41,21 +104,134 @@ class EmbeddingConfig:
     model_name: str = ""
     dimension: int = 384
     batch_size: int = 512
+    chunk_size: int = 4096
+    checkpoint_path: str = ""
+    pipeline_queue_size: int = 4
+    pipeline_writers: int = 0
+    cpu_workers: int = 0
+    cpu_threads_per_worker: int = 1
+    cpu_shard_size: int = 64
+    cpu_start_method: str = "spawn"
+    query_cache_size: int = 1024
+    query_cache_ttl: float = 0
+    query_cache_path: str = ""
+    query_batching: bool = False
+    query_batch_size: int = 16
+    query_batch_wait_ms: float = 5.0
 
     def __post_init__(self):
         self.model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
         self.dimension = int(os.getenv("EMBEDDING_DIMENSION", "384"))
         self.batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "512"))
+        self.chunk_size = int(os.getenv("EMBEDDING_CHUNK_SIZE", "4096"))
+        self.checkpoint_path = os.getenv(
+            "EMBEDDING_CHECKPOINT_PATH",
+            os.path.join(PROJECT_ROOT, "data", "processed", "embedding_checkpoint.json"),
+        )
+        self.pipeline_queue_size = int(os.getenv("EMBEDDING_PIPELINE_QUEUE_SIZE", "4"))
+        # 0 = derive writer count from the SQLAlchemy pool size
+        self.pipeline_writers = int(os.getenv("EMBEDDING_PIPELINE_WRITERS", "0"))
+        # CPU pool mode: >1 worker processes when no GPU is available (0/1 = off)
+        self.cpu_workers = int(os.getenv("EMBEDDING_CPU_WORKERS", "0"))
+        self.cpu_threads_per_worker = int(os.getenv("EMBEDDING_CPU_THREADS", "1"))
+        self.cpu_shard_size = int(os.getenv("EMBEDDING_CPU_SHARD_SIZE", "64"))
+        self.cpu_start_method = os.getenv("EMBEDDING_CPU_START_METHOD", "spawn")
+        # Query embedding cache (size 0 = disabled, TTL 0 = no expiry, empty path = memory only)
+        self.query_cache_size = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "1024"))
+        self.query_cache_ttl = float(os.getenv("EMBEDDING_QUERY_CACHE_TTL", "0"))
+        self.query_cache_path = os.getenv("EMBEDDING_QUERY_CACHE_PATH", "")
+        # Micro-batch concurrent encode_query calls into one model call
+        self.query_batching = os.getenv("EMBEDDING_QUERY_BATCHING", "false").lower() in ("1", "true", "yes")
+        self.query_batch_size = int(os.getenv("EMBEDDING_QUERY_BATCH_SIZE", "16"))
+        self.query_batch_wait_ms = float(os.getenv("EMBEDDING_QUERY_BATCH_WAIT_MS", "5"))
 
 
 @dataclass
 class RAGConfig:
     top_k: int = 5
     similarity_threshold: float = 0.3
+    retrieval_mode: str = "semantic"
+    hybrid_candidates: int = 50
+    rrf_k: int = 60
+    filter_max_scan_tuples: int = 20000
+    context_chars: int = 500
+    review_max_tokens: int = 160
+    history_turns: int = 3
+    history_turn_tokens: int = 150
+    prepared_statements: bool = False
+    rerank_enabled: bool = False
+    rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_candidates: int = 30
+    rerank_batch_size: int = 32
+    rerank_budget_ms: float = 250
+    rerank_cache_size: int = 20000
+    answer_cache_enabled: bool = False
+    answer_cache_size: int = 512
+    answer_cache_threshold: float = 0.95
+    answer_cache_ttl: float = 3600
+    answer_cache_check_interval: float = 60
+    retrieval_backend: str = "pgvector"
+    index_path: str = ""
+    index_dtype: str = "float32"
+    index_nprobe: int = 16
+    index_quantization: str = "none"
+    index_rerank_factor: int = 10
+    index_pq_m: int = 48
 
     def __post_init__(self):
         self.top_k = int(os.getenv("RAG_TOP_K", "5"))
         self.similarity_threshold = float(os.getenv("RAG_SIMILARITY_THRESHOLD", "0.3"))
+        # Retrieval mode: "semantic" (vector), "keyword" (full-text) or "hybrid" (RRF of both)
+        self.retrieval_mode = os.getenv("RAG_RETRIEVAL_MODE", "semantic")
+        self.hybrid_candidates = int(os.getenv("RAG_HYBRID_CANDIDATES", "50"))
+        self.rrf_k = int(os.getenv("RAG_RRF_K", "60"))
+        # Upper bound on tuples an iterative HNSW scan visits for filtered queries
+        self.filter_max_scan_tuples = int(os.getenv("RAG_FILTER_MAX_SCAN_TUPLES", "20000"))
+        # Characters of review_text fetched per hit (truncated server-side; 0 = full text)
+        self.context_chars = int(os.getenv("RAG_CONTEXT_CHARS", "500"))
+        # Prompt packing: tokens per review, history turns kept and tokens per past answer
+        self.review_max_tokens = int(os.getenv("RAG_REVIEW_MAX_TOKENS", "160"))
+        self.history_turns = int(os.getenv("RAG_HISTORY_TURNS", "3"))
+        self.history_turn_tokens = int(os.getenv("RAG_HISTORY_TURN_TOKENS", "150"))
+        # Run the vector query as a per-connection PREPAREd statement
+        self.prepared_statements = os.getenv("RAG_PREPARED_STATEMENTS", "false").lower() in ("1", "true", "yes")
+        # Two-stage retrieval: over-fetch candidates, rerank with a CPU cross-encoder
+        self.rerank_enabled = os.getenv("RAG_RERANK", "false").lower() in ("1", "true", "yes")
+        self.rerank_model = os.getenv("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.rerank_candidates = int(os.getenv("RAG_RERANK_CANDIDATES", "30"))
+        self.rerank_batch_size = int(os.getenv("RAG_RERANK_BATCH_SIZE", "32"))
+        # Per-request time budget for scoring uncached pairs (0 = unlimited)
+        self.rerank_budget_ms = float(os.getenv("RAG_RERANK_BUDGET_MS", "250"))
+        self.rerank_cache_size = int(os.getenv("RAG_RERANK_CACHE_SIZE", "20000"))
+        # Semantic answer cache (reuses answers for near-duplicate questions)
+        self.answer_cache_enabled = os.getenv("RAG_ANSWER_CACHE", "false").lower() in ("1", "true", "yes")
+        self.answer_cache_size = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "512"))
+        self.answer_cache_threshold = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+        self.answer_cache_ttl = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+        self.answer_cache_check_interval = float(os.getenv("RAG_ANSWER_CACHE_CHECK_INTERVAL", "60"))
+        # Retrieval backend: "pgvector" (database) or "memmap" (in-process exported index)
+        self.retrieval_backend = os.getenv("RAG_RETRIEVAL_BACKEND", "pgvector")
+        self.index_path = os.getenv("RAG_INDEX_PATH", os.path.join(PROJECT_ROOT, "data", "processed", "vector_index"))
+        self.index_dtype = os.getenv("RAG_INDEX_DTYPE", "float32")
+        self.index_nprobe = int(os.getenv("RAG_INDEX_NPROBE", "16"))
+        # Compressed scan: "none", "int8" or "pq", reranking rerank_factor * k candidates exactly
+        self.index_quantization = os.getenv("RAG_INDEX_QUANTIZATION", "none")
+        self.index_rerank_factor = int(os.getenv("RAG_INDEX_RERANK_FACTOR", "10"))
+        self.index_pq_m = int(os.getenv("RAG_INDEX_PQ_M", "48"))
+
+
+@dataclass
+class EvalConfig:
+    judge_model: str = ""
+    judge_cache_path: str = ""
+    concurrency: int = 0
+
+    def __post_init__(self):
+        # Judge model ("" = OLLAMA_MODEL) and the on-disk verdict cache ("" = no cache file)
+        self.judge_model = os.getenv("EVAL_JUDGE_MODEL", "")
+        self.judge_cache_path = os.getenv("EVAL_JUDGE_CACHE_PATH", "data/processed/judge_cache.jsonl")
+        # Cases in flight (0 = OLLAMA_MAX_IN_FLIGHT)
+        self.concurrency = int(os.getenv("EVAL_CONCURRENCY", "0"))
 
 
 @dataclass
@@ -64,6 +240,7 @@ class AppConfig:
     ollama: OllamaConfig = field(default_factory=OllamaConfig)
     embedding: EmbeddingConfig = field(default_factory=EmbeddingConfig)
     rag: RAGConfig = field(default_factory=RAGConfig)
+    evaluation: EvalConfig = field(default_factory=EvalConfig)
 
 
 # Global config instance
@@ -0,0 +1,55 @@
+"""Shared fixtures."""
+
+import json
+import os
+import numpy as np
+import pytest
+from src.embeddings.index import TEXT_COLUMNS
+
+
+def random_unit_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Normalized embeddings with some cluster structure, like real review embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 50, 1), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture
+def write_index(tmp_path):
+    """
+    Write an index directory in ``export_index``'s layout and return its path.
+
+    Metadata defaults: score ``1 + i % 5``, review_time ``i``, helpfulness
+    ``i % 10`` and product ``P<i % 7>``. ``groups`` maps a row to the other
+    products its text was posted under.
+    """
+    def write(vectors: np.ndarray, products: list[str] = None, groups: dict = None, nlist: int = 0) -> str:
+        path = str(tmp_path / "index")
+        os.makedirs(path)
+        n = len(vectors)
+        rows = np.arange(n)
+        products = products or [f"P{i % 7}" for i in rows]
+        groups = groups or {}
+
+        np.save(os.path.join(path, "vectors.npy"), vectors.astype(np.float32))
+        np.save(os.path.join(path, "ids.npy"), (rows + 1).astype(np.int32))
+        np.save(os.path.join(path, "score.npy"), (1 + rows % 5).astype(np.int8))
+        np.save(os.path.join(path, "helpfulness_num.npy"), (rows % 10).astype(np.int32))
+        np.save(os.path.join(path, "helpfulness_den.npy"), np.full(n, 10, dtype=np.int32))
+        np.save(os.path.join(path, "review_time.npy"), rows.astype(np.int64))
+        np.save(os.path.join(path, "product_id.npy"), np.array([p.encode() for p in products], dtype="S20"))
+        pairs = [(row, p.encode()) for row, others in sorted(groups.items()) for p in others]
+        np.save(os.path.join(path, "group_rows.npy"), np.array([r for r, _ in pairs], dtype=np.int64))
+        np.save(os.path.join(path, "group_products.npy"), np.array([p for _, p in pairs], dtype="S20"))
+        for column in TEXT_COLUMNS:
+            blobs = [f"{column} {i}".encode() for i in rows]
+            with open(os.path.join(path, f"{column}.bin"), "wb") as f:
+                f.write(b"".join(blobs))
+            np.save(os.path.join(path, f"{column}_offsets.npy"),
+                    np.concatenate([[0], np.cumsum([len(b) for b in blobs])]).astype(np.int64))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"count": n, "dimension": vectors.shape[1], "dtype": "float32", "nlist": nlist}, f)
+        return path
+
+    return write
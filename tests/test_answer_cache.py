@@ -0,0 +1,78 @@
+"""Tests for the semantic answer cache."""
+
+import numpy as np
+import pytest
+from src.rag.cache import SemanticAnswerCache
+
+NAMESPACE = ("qwen2.5:14b", "rag-v1", 8192, 5, "semantic", False, None)
+
+
+def unit(*values) -> list:
+    vector = np.array(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def test_similar_query_hits_within_threshold():
+    cache = SemanticAnswerCache(dimension=3, threshold=0.95)
+    cache.store(unit(1, 0, 0), NAMESPACE, "best coffee?", "Answer", [{"id": 1}])
+
+    hit = cache.lookup(unit(1, 0.1, 0), NAMESPACE)
+    assert hit["answer"] == "Answer"
+    assert hit["contexts"] == [{"id": 1}]
+    assert hit["cache_similarity"] > 0.95
+    assert cache.lookup(unit(0, 1, 0), NAMESPACE) is None
+
+
+def test_namespaces_never_share_answers():
+    cache = SemanticAnswerCache(dimension=3)
+    embedding = unit(1, 0, 0)
+    cache.store(embedding, NAMESPACE, "q", "unfiltered", [])
+
+    other_model = ("llama3:8b",) + NAMESPACE[1:]
+    other_top_k = NAMESPACE[:3] + (10,) + NAMESPACE[4:]
+    filtered = NAMESPACE[:-1] + (("score", 5),)
+    for namespace in (other_model, other_top_k, filtered):
+        assert cache.lookup(embedding, namespace) is None
+
+    cache.store(embedding, filtered, "q", "filtered", [])
+    assert cache.lookup(embedding, NAMESPACE)["answer"] == "unfiltered"
+    assert cache.lookup(embedding, filtered)["answer"] == "filtered"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(dimension=3, max_size=2)
+    a, b, c = unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)
+    cache.store(a, NAMESPACE, "a", "A", [])
+    cache.store(b, NAMESPACE, "b", "B", [])
+    cache.lookup(a, NAMESPACE)  # "b" becomes least recently used
+    cache.store(c, NAMESPACE, "c", "C", [])
+
+    assert cache.lookup(b, NAMESPACE) is None
+    assert cache.lookup(a, NAMESPACE)["answer"] == "A"
+    assert cache.lookup(c, NAMESPACE)["answer"] == "C"
+
+
+def test_fingerprint_change_clears_the_cache():
+    fingerprint = {"value": 1}
+    cache = SemanticAnswerCache(dimension=3, fingerprint_fn=lambda: fingerprint["value"], check_interval=0)
+    embedding = unit(1, 0, 0)
+    cache.lookup(embedding, NAMESPACE)  # records the first fingerprint
+    cache.store(embedding, NAMESPACE, "q", "A", [])
+    assert cache.lookup(embedding, NAMESPACE) is not None
+
+    fingerprint["value"] = 2
+    assert cache.lookup(embedding, NAMESPACE) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_streams_ending_in_an_error_are_not_cached():
+    pipeline_module = pytest.importorskip("src.rag.pipeline")  # needs torch
+    pipeline = object.__new__(pipeline_module.RAGPipeline)
+    stored = []
+
+    clean = pipeline._timed_stream(iter(["Great ", "coffee."]), {}, stored.append)
+    assert "".join(clean) == "Great coffee."
+    broken = pipeline._timed_stream(iter(["Great ", "❌ Error: timed out"]), {}, stored.append)
+    list(broken)
+
+    assert stored == ["Great coffee."]
@@ -0,0 +1,54 @@
+"""Tests for the query micro-batcher."""
+
+import threading
+import numpy as np
+import pytest
+from src.embeddings.batcher import QueryBatcher
+
+
+class RecordingEncoder:
+    """Fake model: one row per text, remembering every batch it was called with."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_concurrent_queries_share_one_model_call():
+    encoder = RecordingEncoder()
+    batcher = QueryBatcher(encoder, max_batch_size=8, max_wait_ms=200)
+
+    futures = [batcher.submit(q) for q in ("tea", "coffee", "tea", "cocoa")]
+    results = [f.result(timeout=5) for f in futures]
+
+    assert results == [[3.0, 1.0], [6.0, 1.0], [3.0, 1.0], [5.0, 1.0]]
+    assert encoder.calls == [["tea", "coffee", "cocoa"]]  # duplicates encoded once
+    assert batcher.stats()["queries"] == 4
+
+
+def test_batch_flushes_at_max_batch_size():
+    encoder = RecordingEncoder()
+    batcher = QueryBatcher(encoder, max_batch_size=2, max_wait_ms=300)
+
+    futures = [batcher.submit(q) for q in ("a", "bb", "ccc")]
+    for f in futures:
+        f.result(timeout=5)
+
+    assert all(len(call) <= 2 for call in encoder.calls)
+    assert sorted(q for call in encoder.calls for q in call) == ["a", "bb", "ccc"]
+
+
+def test_encoder_error_reaches_every_caller():
+    def broken(texts):
+        raise RuntimeError("model crashed")
+
+    batcher = QueryBatcher(broken, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(q) for q in ("a", "b")]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            f.result(timeout=5)
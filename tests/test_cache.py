@@ -0,0 +1,69 @@
+"""Tests for the LRU cache and the query embedding cache."""
+
+import time
+from src.embeddings.cache import QueryEmbeddingCache, normalize_query
+from src.utils.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_ttl_expires_entries():
+    cache = LRUCache(max_size=4, ttl=10)
+    cache.put("fresh", 1)
+    cache.put("stale", 2, stored_at=time.time() - 60)
+
+    assert cache.get("fresh") == 1
+    assert cache.get("stale", "missing") == "missing"
+    assert [k for k, _, _ in cache.items()] == ["fresh"]
+
+
+def test_lru_counts_hits_and_misses():
+    cache = LRUCache(max_size=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_lru_zero_size_stores_nothing():
+    cache = LRUCache(max_size=0)
+    cache.put("a", 1)
+    assert len(cache) == 0
+
+
+def test_normalize_query():
+    assert normalize_query("  Best   ORGANIC\tcoffee? ") == "best organic coffee?"
+    assert normalize_query("ｃｏｆｆｅｅ") == "coffee"  # NFKC folds full-width characters
+
+
+def test_query_embedding_cache_is_keyed_by_model_and_normalized_text():
+    cache = QueryEmbeddingCache(max_size=8)
+    cache.put_embedding("model-a", "Organic  Coffee", [0.1, 0.2])
+
+    assert cache.get_embedding("model-a", "organic coffee") == [0.1, 0.2]
+    assert cache.get_embedding("model-b", "organic coffee") is None
+
+
+def test_query_embedding_cache_round_trips_through_npz(tmp_path):
+    path = str(tmp_path / "query_cache.npz")
+    cache = QueryEmbeddingCache(max_size=8, path=path)
+    cache.put_embedding("model-a", "tea", [1.0, 0.0])
+    cache.put_embedding("model-a", "coffee", [0.0, 1.0])
+    cache.save()
+
+    restored = QueryEmbeddingCache(max_size=8, path=path)
+    assert restored.load() == 2
+    assert restored.get_embedding("model-a", "coffee") == [0.0, 1.0]
@@ -0,0 +1,106 @@
+"""Tests for LLM-judge parsing, the verdict cache and the evaluation summary."""
+
+import pytest
+from src.evaluation.harness import evaluate_case, EvalCase, keyword_precision, summarize
+from src.evaluation.judge import Judge, JudgeCache, parse_verdict
+from src.llm.ollama_client import generation_stats
+
+CONTEXTS = [{"id": 1, "product_id": "P1", "score": 5, "summary": "Great coffee",
+             "review_text": "Smooth and rich.", "similarity": 0.8}]
+
+
+@pytest.mark.parametrize("reply", [
+    "Faithfulness: 5\nRelevance: 4\nCompleteness: 3\nHallucination: no\nReasoning: Grounded.",
+    "**Faithfulness**: 5\n**Relevance**: 4\n**Completeness**: 3\n**Hallucination**: no\n**Reasoning**: Grounded.",
+    "**Faithfulness:** 5\n**Relevance:** 4\n**Completeness:** 3\n**Hallucination:** No\n**Reasoning:** Grounded.",
+    "1. **Faithfulness** = **5**\n2. **Relevance** = 4\n3. **Completeness** = 3\n4. **Hallucination** = no\n"
+    "Reasoning: Grounded.",
+])
+def test_parse_verdict_accepts_the_prompts_own_formats(reply):
+    verdict = parse_verdict(reply)
+    assert verdict == {"faithfulness": 5, "relevance": 4, "completeness": 3, "hallucination": False,
+                       "reasoning": "Grounded.", "parsed": True}
+
+
+def test_parse_verdict_flags_missing_fields():
+    verdict = parse_verdict("Faithfulness: 4\nThe answer looks fine.")
+    assert verdict["faithfulness"] == 4
+    assert verdict["relevance"] is None
+    assert verdict["parsed"] is False
+
+
+class FakeLLM:
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.calls = 0
+
+    def generate(self, prompt, temperature=0.3, priority=0, **kwargs):
+        self.calls += 1
+        return self.reply
+
+
+def judge_with(reply: str, cache: JudgeCache) -> Judge:
+    judge = Judge(model="judge-model", cache=cache)
+    judge.llm = FakeLLM(reply)
+    return judge
+
+
+def test_parsed_verdicts_are_cached_on_disk(tmp_path):
+    path = str(tmp_path / "judge_cache.jsonl")
+    reply = "Faithfulness: 5\nRelevance: 5\nCompleteness: 4\nHallucination: no\nReasoning: ok"
+    judge = judge_with(reply, JudgeCache(path))
+
+    first = judge.judge("best coffee?", CONTEXTS, "It is smooth.")
+    assert first["cached"] is False and first["faithfulness"] == 5
+
+    reloaded = judge_with(reply, JudgeCache(path))
+    second = reloaded.judge("best coffee?", CONTEXTS, "It is smooth.")
+    assert second["cached"] is True
+    assert reloaded.llm.calls == 0
+    assert reloaded.judge("best coffee?", CONTEXTS, "A different answer.")["cached"] is False
+
+
+def test_unparsed_verdicts_are_not_cached(tmp_path):
+    judge = judge_with("I cannot evaluate this.", JudgeCache(str(tmp_path / "judge_cache.jsonl")))
+    judge.judge("q", CONTEXTS, "a")
+    judge.judge("q", CONTEXTS, "a")
+    assert judge.llm.calls == 2
+
+
+def test_summary_counts_unparsed_verdicts():
+    base = {"retrieval_ms": 10.0, "total_time": 1.0}
+    records = [
+        {**base, "faithfulness": 5, "relevance": 4, "completeness": 3, "hallucination": True, "parsed": True},
+        {**base, "faithfulness": 3, "relevance": None, "completeness": None, "hallucination": None,
+         "parsed": False},
+        dict(base),  # not judged (e.g. generation failed)
+    ]
+    summary = summarize(records)
+    assert (summary["judged"], summary["judge_unparsed"]) == (2, 1)
+    assert summary["faithfulness"] == 4.0
+    assert summary["relevance"] == 4.0
+    assert summary["hallucination_rate"] == 1.0
+
+
+def test_tokens_per_sec_comes_from_ollama_decode_counters():
+    stats = generation_stats({"eval_count": 120, "eval_duration": 3_000_000_000, "prompt_eval_count": 900})
+    assert stats["tokens_per_sec"] == 40.0
+    assert stats["prompt_eval_count"] == 900
+    assert generation_stats({})["tokens_per_sec"] is None
+
+    class QueuedPipeline:
+        def query(self, query):
+            # 30s including the queue wait; Ollama decoded at 40 tokens/s
+            return {"contexts": CONTEXTS, "answer": "Smooth.", "retrieval_time": 0.01,
+                    "generation_time": 30.0, "llm_stats": stats}
+
+    record = evaluate_case(QueuedPipeline(), None, EvalCase("best coffee?", ["coffee"]))
+    assert record["tokens_per_sec"] == 40.0
+    assert record["keyword_precision"] == 1.0
+
+
+def test_keyword_precision():
+    contexts = [{"summary": "Dog food", "review_text": "My dog loves it"},
+                {"summary": "Cat treats", "review_text": "Crunchy"}]
+    assert keyword_precision(contexts, ["DOG"]) == 0.5
+    assert keyword_precision(contexts, []) is None
@@ -0,0 +1,61 @@
+"""Tests for retrieval metadata filters."""
+
+import numpy as np
+from conftest import random_unit_vectors
+from src.database.filters import ReviewFilter
+from src.embeddings.index import VectorIndex
+
+
+def test_empty_filter_renders_nothing():
+    assert ReviewFilter().is_empty()
+    assert ReviewFilter().to_sql() == ("", {})
+
+
+def test_single_score_is_an_equality():
+    sql, params = ReviewFilter(min_score=5, max_score=5).to_sql()
+    assert sql == "\n AND r.score = :f_score"
+    assert params == {"f_score": 5}
+
+
+def test_to_sql_binds_every_field():
+    sql, params = ReviewFilter(min_score=3, max_score=4, product_ids=["B001"], time_from=10,
+                               time_to=20, min_helpful=2).to_sql(alias="v")
+
+    assert params == {"f_min_score": 3, "f_max_score": 4, "f_product_ids": ["B001"],
+                      "f_time_from": 10, "f_time_to": 20, "f_min_helpful": 2}
+    for name in params:
+        assert f":{name}" in sql
+    assert all(line.startswith(" AND v.") for line in sql.strip("\n").split("\n"))
+
+
+def test_product_filter_matches_the_duplicate_group_in_sql():
+    sql, _ = ReviewFilter(product_ids=["B001"]).to_sql()
+    assert "r.content_hash IN (SELECT d.content_hash FROM reviews d" in sql
+    assert "d.product_id = ANY(:f_product_ids)" in sql
+
+
+def test_mask_applies_every_field(write_index):
+    index = VectorIndex(write_index(random_unit_vectors(100, 8)), quantization="none")
+    rows = np.arange(len(index))
+
+    mask = ReviewFilter(min_score=4, time_from=10, time_to=60, min_helpful=5).mask(index)
+    expected = (1 + rows % 5 >= 4) & (rows >= 10) & (rows <= 60) & (rows % 10 >= 5)
+    assert mask.tolist() == expected.tolist()
+
+
+def test_mask_matches_products_of_duplicates(write_index):
+    # Row 0's text was also posted under P9, which no canonical row carries
+    path = write_index(random_unit_vectors(14, 8), groups={0: ["P9"], 3: ["P1"]})
+    index = VectorIndex(path, quantization="none")
+
+    assert np.flatnonzero(ReviewFilter(product_ids=["P9"]).mask(index)).tolist() == [0]
+    assert np.flatnonzero(ReviewFilter(product_ids=["P1"]).mask(index)).tolist() == [1, 3, 8]
+
+
+def test_filtered_search_only_returns_matching_rows(write_index):
+    vectors = random_unit_vectors(300, 8)
+    index = VectorIndex(write_index(vectors), quantization="none")
+
+    results = index.search(vectors[0], top_k=10, filters=ReviewFilter(min_score=5))
+    assert len(results) == 10
+    assert all(r["score"] == 5 for r in results)
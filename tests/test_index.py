@@ -0,0 +1,88 @@
+"""Tests for the memory-mapped vector index."""
+
+import os
+import numpy as np
+import pytest
+from conftest import random_unit_vectors
+from src.embeddings.index import VectorIndex, build_ivf
+from src.embeddings.quantization import ProductQuantizer, build_quantizer, evaluate_recall
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(vectors @ query), kind="stable")[:k]
+
+
+def test_exact_search_matches_brute_force(write_index):
+    vectors = random_unit_vectors(500, 16)
+    index = VectorIndex(write_index(vectors), quantization="none")
+    query = vectors[42]
+
+    indices, similarities = index.search_indices(query, top_k=5)
+    assert indices.tolist() == exact_top_k(vectors, query, 5).tolist()
+    assert indices[0] == 42
+    assert np.all(np.diff(similarities) <= 0)
+
+
+def test_search_returns_rows_shaped_like_sql_results(write_index):
+    vectors = random_unit_vectors(20, 8)
+    index = VectorIndex(write_index(vectors), quantization="none")
+
+    best = index.search(vectors[3], top_k=1)[0]
+    assert best["id"] == 4
+    assert best["product_id"] == "P3"
+    assert best["summary"] == "summary 3"
+    assert best["review_text"] == "review_text 3"
+    assert abs(best["similarity"] - 1.0) < 1e-5
+
+
+def test_ivf_probing_every_list_is_exact(write_index):
+    vectors = random_unit_vectors(1000, 16)
+    path = write_index(vectors, nlist=8)
+    build_ivf(path, nlist=8)
+
+    index = VectorIndex(path, nprobe=8, quantization="none")
+    for query in vectors[:20]:
+        assert index.search_indices(query, top_k=10)[0].tolist() == exact_top_k(vectors, query, 10).tolist()
+
+
+def test_ivf_offsets_cover_every_row_once(write_index):
+    vectors = random_unit_vectors(1000, 16)
+    path = write_index(vectors, nlist=8)
+    build_ivf(path, nlist=8)
+
+    order = np.load(os.path.join(path, "ivf_order.npy"))
+    offsets = np.load(os.path.join(path, "ivf_offsets.npy"))
+    assert offsets[-1] == len(vectors)
+    assert sorted(order.tolist()) == list(range(len(vectors)))
+
+
+@pytest.mark.parametrize("kind, pq_m, rerank_factor, min_recall", [
+    ("int8", None, 4, 0.98),
+    ("pq", 8, 10, 0.9),
+])
+def test_quantized_search_recall_against_exact(write_index, kind, pq_m, rerank_factor, min_recall):
+    vectors = random_unit_vectors(2000, 32)
+    path = write_index(vectors)
+    build_quantizer(path, kind, pq_m=pq_m or 48)
+    queries = random_unit_vectors(50, 32, seed=1)
+
+    index = VectorIndex(path, quantization=kind, rerank_factor=rerank_factor)
+    report = evaluate_recall(index, queries, k=10)
+    assert report["recall"] >= min_recall
+    assert report["compression"] == (4 if kind == "int8" else 16)
+
+
+def test_pq_rerank_recovers_recall(write_index):
+    vectors = random_unit_vectors(2000, 32)
+    path = write_index(vectors)
+    build_quantizer(path, "pq", pq_m=8)
+    queries = random_unit_vectors(50, 32, seed=1)
+
+    coarse = evaluate_recall(VectorIndex(path, quantization="pq", rerank_factor=1), queries, k=10)
+    reranked = evaluate_recall(VectorIndex(path, quantization="pq", rerank_factor=10), queries, k=10)
+    assert reranked["recall"] > coarse["recall"]
+
+
+def test_pq_rejects_indivisible_dimension():
+    with pytest.raises(ValueError, match="not divisible"):
+        ProductQuantizer(m=5).train(random_unit_vectors(300, 32))
@@ -0,0 +1,67 @@
+"""Tests for packing RAG prompts into the token budget."""
+
+import pytest
+from src.llm.budget import TokenCounter, trim_to_tokens
+from src.llm.prompts import pack_rag_prompt, pack_session_turn
+from src.utils.config import config
+
+# Character estimate: no tokenizer download, deterministic counts
+COUNTER = TokenCounter("")
+
+
+def review(i: int, sentences: int = 40) -> dict:
+    text = " ".join(f"Review {i} sentence {j} says the coffee is fine." for j in range(sentences))
+    return {"id": i, "product_id": f"P{i}", "score": 5, "summary": f"Summary {i}",
+            "review_text": text, "similarity": 0.9 - i / 100}
+
+
+HISTORY = [[f"question {t}?", "An earlier answer. " * 60] for t in range(6)]
+
+
+@pytest.mark.parametrize("max_tokens", [400, 700, 1200, 4000])
+def test_prompt_never_exceeds_the_budget(max_tokens):
+    packed = pack_rag_prompt("Is the coffee good?", [review(i) for i in range(10)], HISTORY,
+                             max_tokens=max_tokens, counter=COUNTER)
+    assert packed.tokens <= packed.budget == max_tokens
+    assert packed.tokens == COUNTER.count(packed.prompt)
+
+
+@pytest.mark.parametrize("max_tokens", [400, 700, 1200])
+def test_best_review_is_kept_before_history(max_tokens):
+    packed = pack_rag_prompt("Is the coffee good?", [review(i) for i in range(10)], HISTORY,
+                             max_tokens=max_tokens, counter=COUNTER)
+    assert packed.contexts_used >= 1
+    assert "Review 0 sentence 0" in packed.prompt
+
+
+def test_reviews_are_added_in_relevance_order():
+    packed = pack_rag_prompt("q", [review(i) for i in range(10)], max_tokens=1000, counter=COUNTER)
+    assert 0 < packed.contexts_used < 10
+    for i in range(packed.contexts_used):
+        assert f"--- Review {i + 1} ---\nProduct ID: P{i}" in packed.prompt
+    assert f"Product ID: P{packed.contexts_used}\n" not in packed.prompt
+
+
+def test_history_keeps_recent_turns_and_counts_the_rest():
+    packed = pack_rag_prompt("q", [review(0)], HISTORY, max_tokens=100_000, counter=COUNTER)
+    assert packed.history_turns == min(config.rag.history_turns, len(HISTORY))
+    assert packed.history_turns + packed.history_dropped == len(HISTORY)
+    assert "question 5?" in packed.prompt
+    assert "question 0?" not in packed.prompt
+
+
+def test_trim_to_tokens_cuts_at_sentence_boundaries():
+    text = "First sentence. Second sentence. Third sentence."
+    trimmed = trim_to_tokens(text, 12, COUNTER)
+    assert trimmed == "First sentence. …"
+    assert COUNTER.count(trimmed) <= 12
+    assert trim_to_tokens(text, 1000, COUNTER) == text
+
+
+@pytest.mark.parametrize("opening", [True, False])
+def test_session_turn_fits_its_room(opening):
+    packed = pack_session_turn("q", [review(i) for i in range(5)], first_index=4, opening=opening,
+                               max_tokens=500, counter=COUNTER)
+    assert packed.contexts_used >= 1
+    assert packed.tokens <= 500
+    assert "--- Review 4 ---" in packed.prompt
@@ -0,0 +1,62 @@
+"""Tests for the cross-encoder reranker's ordering, cache and latency budget."""
+
+from src.rag.reranker import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the number in its review text; records how many pairs it saw."""
+
+    def __init__(self):
+        self.pairs = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.pairs += len(pairs)
+        return [float(doc.rsplit(" ", 1)[-1]) for _, doc in pairs]
+
+
+def candidates(scores: list[int]) -> list[dict]:
+    return [{"id": i, "summary": "review", "review_text": f"quality {s}"} for i, s in enumerate(scores)]
+
+
+def reranker(budget_ms: float = 0) -> CrossEncoderReranker:
+    reranker = CrossEncoderReranker(model_name="fake", batch_size=8, budget_ms=budget_ms, cache_size=64)
+    reranker.model = FakeCrossEncoder()
+    return reranker
+
+
+def test_rerank_orders_by_score_and_keeps_top_k():
+    result = reranker().rerank("tea", candidates([1, 9, 5, 7]), top_k=2)
+    assert [c["id"] for c in result] == [1, 3]
+    assert [c["rerank_score"] for c in result] == [9.0, 7.0]
+
+
+def test_scores_are_cached_per_normalized_query():
+    r = reranker()
+    r.rerank("Green tea", candidates([1, 2, 3]), top_k=3)
+    r.rerank("  green TEA ", candidates([1, 2, 3]), top_k=3)
+    assert r.model.pairs == 3
+    assert r.cache.stats()["hits"] == 3
+
+
+def test_budget_truncates_and_leaves_the_rest_in_retrieval_order():
+    r = reranker(budget_ms=20)
+    r._pair_ms.append(10.0)  # two pairs fit the budget
+
+    result = r.rerank("tea", candidates([1, 9, 5, 7]), top_k=4)
+    assert [c["id"] for c in result] == [1, 0, 2, 3]
+    assert [c["rerank_score"] for c in result] == [9.0, 1.0, None, None]
+    assert r.truncated == 1
+
+
+def test_one_slow_measurement_does_not_disable_reranking():
+    r = reranker(budget_ms=20)
+    r._pair_ms.append(1000.0)  # e.g. a cold first predict: the budget affords no pair
+
+    result = r.rerank("query 0", candidates([1, 9, 5]), top_k=3)
+    assert r.skipped == 1
+    assert result[0]["rerank_score"] is not None  # a probe pair was still scored
+
+    # Probes add fast samples until the outlier leaves the p95 and full reranking resumes
+    for i in range(1, 40):
+        result = r.rerank(f"query {i}", candidates([1, 9, 5]), top_k=3)
+    assert [c["rerank_score"] for c in result] == [9.0, 5.0, 1.0]
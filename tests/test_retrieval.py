@@ -0,0 +1,11 @@
+"""Tests for the columnar SQL helpers."""
+
+import re
+from src.database.retrieval import REVIEW_COLUMNS, columnar_sql
+
+
+def test_every_aggregate_shares_one_total_order():
+    sql = columnar_sql("hits", order_by="rrf_score DESC", columns=REVIEW_COLUMNS + ("rrf_score",))
+    orders = re.findall(r"ORDER BY ([^)]*)\) AS", sql)
+    assert len(orders) == len(REVIEW_COLUMNS) + 1
+    assert set(orders) == {"rrf_score DESC, hits.id"}
@@ -0,0 +1,114 @@
+"""Tests for the generation scheduler."""
+
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+import pytest
+from src.llm.scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, GenerationScheduler, SchedulerBusy
+
+
+def test_slots_are_granted_up_to_max_in_flight():
+    scheduler = GenerationScheduler(max_in_flight=2, max_queue=4, queue_timeout=0)
+    first, second, third = (scheduler.enqueue() for _ in range(3))
+
+    assert first.granted and second.granted
+    assert not third.granted and third.position == 1
+    first.release()
+    assert third.granted and third.position == 0
+
+
+def test_queue_is_priority_then_fifo():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queue=8, queue_timeout=0)
+    running = scheduler.enqueue()
+    batch = scheduler.enqueue(PRIORITY_BATCH)
+    early, late = scheduler.enqueue(), scheduler.enqueue()
+    assert [early.position, late.position, batch.position] == [1, 2, 3]
+
+    order = []
+    for ticket in (running, early, late):
+        ticket.release()
+        order.append(next(t for t in (early, late, batch) if t.granted and not t.released))
+    assert order == [early, late, batch]
+
+
+def test_interactive_request_is_rejected_when_queue_is_full():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queue=1, queue_timeout=0)
+    scheduler.enqueue()
+    scheduler.enqueue()
+    with pytest.raises(SchedulerBusy):
+        scheduler.enqueue()
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_batch_requests_are_never_shed():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    running = scheduler.enqueue()
+    waiting = [scheduler.enqueue(PRIORITY_BATCH) for _ in range(5)]  # beyond max_queue
+    assert scheduler.stats()["queued"] == 5
+
+    acquired = []
+    worker = threading.Thread(target=lambda: acquired.append(scheduler.acquire(waiting[0])))
+    worker.start()
+    worker.join(0.2)  # well past queue_timeout
+    assert worker.is_alive() and not acquired
+
+    running.release()
+    worker.join(5)
+    assert acquired == [waiting[0]]
+
+
+def test_interactive_wait_is_shed_after_queue_timeout():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queue=4, queue_timeout=0.05)
+    scheduler.enqueue()
+    with pytest.raises(SchedulerBusy):
+        scheduler.acquire(priority=PRIORITY_INTERACTIVE)
+    stats = scheduler.stats()
+    assert (stats["queued"], stats["abandoned"]) == (0, 1)
+
+
+def test_release_is_idempotent():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queue=4, queue_timeout=0)
+    running = scheduler.enqueue()
+    queued = scheduler.enqueue()
+
+    queued.release()
+    queued.release()
+    running.release()
+    running.release()
+
+    stats = scheduler.stats()
+    assert (stats["in_flight"], stats["queued"]) == (0, 0)
+    assert (stats["completed"], stats["abandoned"]) == (1, 1)
+    assert scheduler.enqueue().granted
+
+
+def test_cancelled_async_wait_leaves_the_queue():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queue=4, queue_timeout=0)
+    running = scheduler.enqueue()
+
+    async def main():
+        task = asyncio.create_task(scheduler.aacquire())
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["queued"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert scheduler.stats()["queued"] == 0
+    running.release()
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_grant_racing_the_timeout_is_kept():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queue=4, queue_timeout=0.05)
+    running = scheduler.enqueue()
+    ticket = scheduler.enqueue()
+
+    def grant_then_time_out(timeout=None):
+        running.release()  # the slot is handed over ...
+        raise FutureTimeout()  # ... just as this waiter's timeout fires
+
+    ticket._granted.result = grant_then_time_out
+    assert scheduler.acquire(ticket) is ticket
+    assert scheduler.stats()["in_flight"] == 1
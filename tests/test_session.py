@@ -0,0 +1,37 @@
+"""Tests for KV-reusing chat sessions."""
+
+from types import SimpleNamespace
+from src.rag.session import ChatSession
+
+CONTEXTS = [{"id": 1, "product_id": "P1", "score": 5, "summary": "Great coffee",
+             "review_text": "Smooth and rich.", "similarity": 0.8}]
+
+
+class FakeLLM:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def generate_stream(self, prompt, temperature=0.3, context=None, on_done=None):
+        yield from self.tokens
+        if not self.tokens[-1].startswith("❌"):
+            on_done({"context": list(range(42)), "prompt_eval_count": 10, "eval_count": 2})
+
+
+def session(tokens) -> ChatSession:
+    return ChatSession(SimpleNamespace(llm=FakeLLM(tokens), temperature=0.0), max_tokens=2000)
+
+
+def test_streamed_turn_reports_session_tokens_when_done():
+    chat = session(["Smooth ", "coffee."])
+    result = chat.ask("Is it good?", stream=True, contexts=CONTEXTS)
+    assert "".join(result["stream"]) == "Smooth coffee."
+    assert result["session_tokens"] == 42
+    assert chat.history == [["Is it good?", "Smooth coffee."]]
+
+
+def test_streamed_turn_ending_in_an_error_is_not_recorded():
+    chat = session(["Smooth ", "❌ Error: timed out"])
+    result = chat.ask("Is it good?", stream=True, contexts=CONTEXTS)
+    list(result["stream"])
+    assert chat.history == []
+    assert result["session_tokens"] == 0